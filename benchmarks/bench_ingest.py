@@ -0,0 +1,98 @@
+"""
+Throughput of the source-extract ingestion and join (scripts/ingest.py).
+
+For each dataset size (generated as in bench_suite.py), the three extracts are split
+from the merged CSV once, shuffled and with a few orphaned and duplicated campaigns,
+and kept in data/scale/sources-<rows>-seed<seed>/. Each join strategy then runs in its
+own process (so its peak RSS is its own); the table reports wall time, source rows
+and input MB per second, peak RSS and whether the join report (row, duplicate and
+orphan counts plus an order-independent checksum of the output) matches across
+strategies. `--check` also compares the merged rows with the original CSV:
+
+    python benchmarks/bench_ingest.py --sizes 1000000 10000000 --chunksize 500000
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(PROJECT_DIR, "scripts"))
+
+from bench_suite import DATA_DIR, dataset_path  # noqa: E402
+from ingest import SOURCES, STRATEGIES, source_path, split_sources  # noqa: E402
+
+INGEST = os.path.join(PROJECT_DIR, "scripts", "ingest.py")
+
+
+def sources_dir(rows, seed, orphans, duplicates):
+    """Extracts of the `rows`-row dataset, split on first use."""
+    path = os.path.join(DATA_DIR, f"sources-{rows}-seed{seed}-o{orphans:g}-d{duplicates:g}")
+    if not all(os.path.exists(source_path(path, name)) for name in SOURCES):
+        split_sources(dataset_path(rows, seed), path, orphans, duplicates, seed=seed)
+    return path
+
+
+def run_join(sources, strategy, chunksize, check):
+    """One join in a fresh process; its JSON line (None if it failed)."""
+    with tempfile.TemporaryDirectory(prefix="bench-ingest-", dir=DATA_DIR) as tmp:
+        command = [sys.executable, INGEST, "join", "--sources", sources, "--strategy", strategy,
+                   "--chunksize", str(chunksize), "--out", os.path.join(tmp, "merged.csv"), "--json"]
+        if check:
+            command += ["--check", check]
+        proc = subprocess.run(command, capture_output=True, text=True)
+    if proc.returncode != 0:
+        # A negative code is a signal: the hash join at sizes beyond RAM gets OOM-killed
+        sys.stderr.write(proc.stderr or f"{strategy} join exited with {proc.returncode}\n")
+        return None, False
+    return json.loads(proc.stdout.strip().splitlines()[-1]), True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the hash and sort-merge joins of the source extracts.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000_000])
+    parser.add_argument("--strategies", nargs="+", choices=STRATEGIES, default=list(STRATEGIES))
+    parser.add_argument("--chunksize", type=int, default=1_000_000, help="Rows per sorted run (merge strategy)")
+    parser.add_argument("--orphans", type=float, default=0.001, help="Fraction of campaigns left out of one source")
+    parser.add_argument("--duplicates", type=float, default=0.001, help="Fraction of campaigns exported twice")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--repeat", type=int, default=1, help="Timings are the best of this many runs")
+    parser.add_argument("--check", action="store_true", help="Compare the merged rows with the original CSV")
+    args = parser.parse_args()
+
+    print(f"{'Rows':>12} {'Strategy':>9} {'Wall':>9} {'Rows/s':>12} {'MB/s':>8} {'Peak RSS':>9} "
+          f"{'Merged':>12} {'Orphans':>8} {'Parity':>7}")
+    print("-" * 96)
+    failed = False
+    for rows in args.sizes:
+        sources = sources_dir(rows, args.seed, args.orphans, args.duplicates)
+        check = dataset_path(rows, args.seed) if args.check else None
+        reference = None
+        for strategy in args.strategies:
+            best = None
+            for _ in range(args.repeat):
+                result, ok = run_join(sources, strategy, args.chunksize, check)
+                failed |= not ok
+                if ok and (best is None or result["wall_s"] < best["wall_s"]):
+                    best = result
+            if best is None:
+                print(f"{rows:>12,} {strategy:>9} {'failed':>9}", flush=True)
+                continue
+            report = best["report"]
+            reference = reference or report
+            parity = report == reference
+            failed |= not parity
+            source_rows = sum(report["rows"].values())
+            peak = f"{best['peak_rss_mb']:.0f}MB" if best["peak_rss_mb"] is not None else ""
+            print(f"{rows:>12,} {strategy:>9} {best['wall_s']:>8.2f}s {source_rows / best['wall_s']:>12,.0f} "
+                  f"{best['input_bytes'] / best['wall_s'] / 1e6:>8.1f} {peak:>9} {report['merged']:>12,} "
+                  f"{report['orphans']:>8,} {'yes' if parity else 'NO':>7}", flush=True)
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""
+Load test for the local analytics service (scripts/service.py).
+
+Starts the service on a free port (or targets a running one with --url), builds a
+pool of distinct queries - KPIs, rollups, variance, top campaigns and the SQL-file
+queries, each with random dimension filters - and sends --requests of them, drawn at
+random from the pool, from --concurrency client threads. Latency percentiles are
+reported overall and split by the service's X-Cache header (a miss computes the
+result, a hit is served from the LRU cache, a coalesced request waited for the same
+query in flight), together with the throughput and the cache statistics. A smaller pool means more repeats and so more hits:
+
+    python benchmarks/bench_service.py --requests 5000 --concurrency 16 --pool 300
+    python benchmarks/bench_service.py --rows 1000000 --pool 100
+"""
+
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(PROJECT_DIR, "scripts"))
+
+from bench_suite import dataset_path  # noqa: E402
+
+SERVICE = os.path.join(PROJECT_DIR, "scripts", "service.py")
+FILTER_DIMENSIONS = ["quarter", "industry", "account_tier", "sales_rep", "ad_format", "platform",
+                     "deal_status", "payment_status"]
+GROUP_DIMENSIONS = ["quarter", "industry", "account_tier", "sales_rep", "ad_format", "platform"]
+
+
+def start_service(csv_path, cache_size):
+    """The service in a child process; returns (process, base URL) once it is listening."""
+    proc = subprocess.Popen([sys.executable, SERVICE, "--csv", csv_path, "--port", "0",
+                             "--cache-size", str(cache_size)], stdout=subprocess.PIPE, text=True)
+    line = proc.stdout.readline()
+    if "serving on " not in line:
+        proc.kill()
+        raise RuntimeError(f"Service did not start: {line!r}")
+    print(line.strip())
+    return proc, line.rsplit("serving on ", 1)[1].strip()
+
+
+def get(url):
+    """(seconds, X-Cache header) of one GET; the body is read in full."""
+    start = time.perf_counter()
+    with urllib.request.urlopen(url) as response:
+        response.read()
+        cache = response.headers.get("X-Cache", "")
+    return time.perf_counter() - start, cache
+
+
+def query_pool(base, size, seed):
+    """`size` distinct query URLs with random filters on the service's dimension labels."""
+    with urllib.request.urlopen(f"{base}/dimensions") as response:
+        labels = json.load(response)
+    rng = random.Random(seed)
+    pool = set()
+    while len(pool) < size:
+        params = {}
+        for dim in rng.sample(FILTER_DIMENSIONS, rng.choice([0, 1, 1, 2, 3])):
+            params[dim] = ",".join(sorted(rng.sample(labels[dim], rng.choice([1, 1, 2]))))
+        kind = rng.choice(["kpis", "rollup", "rollup", "variance", "top", "sql"])
+        if kind == "rollup":
+            params["by"] = ",".join(rng.sample(GROUP_DIMENSIONS, rng.choice([1, 1, 2])))
+            params["metrics"] = rng.choice(["actual_revenue", "actual_revenue,budget", "cpm,margin_pct"])
+            params["funcs"] = rng.choice(["sum", "sum,mean", "mean,std"])
+        elif kind == "variance":
+            params["by"] = rng.choice(["sales_rep", "industry", "quarter"])
+        elif kind == "top":
+            params.update(k=rng.choice([5, 10]), by=rng.choice(["industry", "sales_rep", "ad_format"]))
+        elif kind == "sql":
+            params["query"] = rng.randint(1, 7)
+        pool.add(f"{base}/{kind}?{urlencode(params)}")
+    return sorted(pool)
+
+
+def percentiles(timings):
+    ordered = sorted(timings)
+
+    def at(q):
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000
+    return {"n": len(ordered), "p50": at(0.50), "p90": at(0.90), "p99": at(0.99), "max": ordered[-1] * 1000}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the local analytics service.")
+    parser.add_argument("--url", default=None, help="Base URL of a running service (default: start one)")
+    parser.add_argument("--rows", type=int, default=2400, help="Dataset size for the started service")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=8, help="Client threads")
+    parser.add_argument("--pool", type=int, default=200, help="Distinct queries the requests are drawn from")
+    parser.add_argument("--cache-size", type=int, default=256, help="LRU size for the started service")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    proc = None
+    base = args.url
+    if base is None:
+        proc, base = start_service(dataset_path(args.rows), args.cache_size)
+    try:
+        pool = query_pool(base, args.pool, args.seed)
+        rng = random.Random(args.seed + 1)
+        urls = [rng.choice(pool) for _ in range(args.requests)]
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as clients:
+            results = list(clients.map(get, urls))
+        wall = time.perf_counter() - start
+        with urllib.request.urlopen(f"{base}/health") as response:
+            health = json.load(response)
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait()
+
+    print(f"{args.requests:,} requests ({args.pool} distinct) from {args.concurrency} clients in {wall:.2f}s: "
+          f"{args.requests / wall:,.0f} req/s on {health['rows']:,} rows")
+    print(f"\n{'Requests':<10} {'Count':>7} {'p50':>9} {'p90':>9} {'p99':>9} {'max':>9}")
+    print("-" * 57)
+    groups = {"all": [t for t, _ in results],
+              "miss": [t for t, cache in results if cache == "miss"],
+              "hit": [t for t, cache in results if cache == "hit"],
+              "coalesced": [t for t, cache in results if cache == "coalesced"]}
+    for name, timings in groups.items():
+        if timings:
+            p = percentiles(timings)
+            print(f"{name:<10} {p['n']:>7,} {p['p50']:>7.2f}ms {p['p90']:>7.2f}ms {p['p99']:>7.2f}ms {p['max']:>7.1f}ms")
+    cache = health["cache"]
+    print(f"\nCache: {cache['entries']}/{cache['maxsize']} entries, {cache['hits']:,} hits, "
+          f"{cache['misses']:,} misses, {cache['coalesced']:,} coalesced")
+
+
+if __name__ == "__main__":
+    main()
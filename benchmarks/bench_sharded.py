@@ -0,0 +1,94 @@
+"""
+Scaling of the sharded execution mode with the number of worker processes.
+
+For each dataset size (generated as in bench_suite.py), times the single-process fold
+of the Arrow cache into a StreamingAnalysis, then run_sharded with 1, 2, 4, ...
+workers up to the CPU count (one shard per worker). Every sharded result is checked
+against the single-process one, and the speedup and parallel efficiency over the
+single-process time are reported:
+
+    python benchmarks/bench_sharded.py --sizes 1000000 10000000 --repeat 3
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(PROJECT_DIR, "scripts"))
+
+from bench_suite import dataset_path  # noqa: E402
+from data_access import CampaignDataset  # noqa: E402
+from sharded import compare_states, run_sharded  # noqa: E402
+from streaming import STREAM_COLUMNS, compare_with_frame, run_streaming  # noqa: E402
+
+
+def default_workers():
+    cpus = os.cpu_count() or 1
+    counts = [1]
+    while counts[-1] * 2 <= cpus:
+        counts.append(counts[-1] * 2)
+    if counts[-1] != cpus:
+        counts.append(cpus)
+    return counts
+
+
+def best_of(repeat, func):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def _float_diffs(state, reference):
+    """Largest difference of the cube sums/M2 and the co-moments, relative to each array's scale."""
+    def rel(a, b):
+        return float(np.max(np.abs(a - b), initial=0.0) / max(np.max(np.abs(b), initial=0.0), 1e-300))
+
+    return {
+        "cube_sums": rel(state.cube.sums, reference.cube.sums),
+        "cube_m2": rel(state.cube.m2, reference.cube.m2),
+        "comoments": rel(state.comoments.comoment, reference.comoments.comoment),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark sharded execution against one process.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000_000])
+    parser.add_argument("--workers", type=int, nargs="+", default=default_workers(),
+                        help="Worker counts to time (default: powers of two up to the CPU count)")
+    parser.add_argument("--by", choices=["campaign_id", "quarter"], default="campaign_id")
+    parser.add_argument("--repeat", type=int, default=1, help="Timings are the best of this many runs")
+    args = parser.parse_args()
+
+    print(f"{os.cpu_count()} CPUs, shards by {args.by}")
+    print(f"{'Rows':>12} {'Workers':>8} {'Wall':>9} {'Speedup':>8} {'Efficiency':>11} {'Parity':>7}")
+    print("-" * 60)
+    failed = False
+    for rows in args.sizes:
+        dataset = CampaignDataset(dataset_path(rows))
+        cache_path = dataset.ensure()
+        single_s, reference = best_of(args.repeat, lambda: run_streaming(cache_path))
+        print(f"{rows:>12,} {'1 proc':>8} {single_s:>8.3f}s {1.0:>7.2f}x {'':>11} {'ref':>7}", flush=True)
+        if rows <= 1_000_000:
+            # Float results against pandas on the full frame (skipped where that frame is too big)
+            failed |= not all(ok for _, ok in compare_with_frame(reference, dataset.load(STREAM_COLUMNS)).values())
+        for workers in args.workers:
+            wall, state = best_of(args.repeat, lambda: run_sharded(cache_path, workers, args.by, workers))
+            close = {name: diff <= 1e-9 for name, diff in _float_diffs(state, reference).items()}
+            parity = all(compare_states(state, reference).values()) and all(close.values())
+            failed |= not parity
+            speedup = single_s / wall
+            print(f"{rows:>12,} {workers:>8} {wall:>8.3f}s {speedup:>7.2f}x {speedup / workers:>10.0%} "
+                  f"{'yes' if parity else 'NO':>7}", flush=True)
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Exact vs sketched distinct counts and percentiles (scripts/sketches.py).
+
+For each dataset size (generated as in bench_suite.py), the same questions are
+answered twice: distinct advertisers and campaign_ids per rep x format x quarter, and
+p50/p90/p99 of cpm, actual_revenue and delivery_rate per segment (each sketch
+dimension). The exact answer groups the raw rows with pandas; the sketch answer
+folds the rows chunk by chunk into a SketchCube (campaign_id is added as a second,
+high-cardinality distinct column) and rolls the cells up. The first table reports
+build and query time and the memory each needs (the raw columns vs the sketch
+state); the second the errors: relative error of the distinct counts and rank error
+of the quantiles, max and mean over the groups, next to the documented bounds.
+`--shards` also folds the rows as that many interleaved shards and merges them, to
+show the registers match the single pass exactly:
+
+    python benchmarks/bench_sketches.py --sizes 100000 1000000 10000000 --chunksize 1000000
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(PROJECT_DIR, "scripts"))
+
+from bench_suite import dataset_path  # noqa: E402
+from data_access import CampaignDataset  # noqa: E402
+from sketches import (DELTA, PRECISION, QUANTILE_METRICS, QUANTILES, SKETCH_COLUMNS,  # noqa: E402
+                      SKETCH_DIMENSIONS, SketchCube, compare_with_frame)
+
+DISTINCT = ["advertiser", "campaign_id"]
+DISTINCT_BY = ["sales_rep", "ad_format", "quarter"]
+
+
+def exact_answers(df):
+    distinct = df.groupby(DISTINCT_BY, observed=True)[DISTINCT].nunique()
+    quantiles = {dim: df.groupby(dim, observed=True)[QUANTILE_METRICS].quantile(list(QUANTILES))
+                 for dim in SKETCH_DIMENSIONS}
+    return distinct, quantiles
+
+
+def sketch_answers(sketches):
+    distinct = {column: sketches.distinct_counts(DISTINCT_BY, column) for column in DISTINCT}
+    quantiles = {(dim, metric): sketches.quantiles(dim, metric)
+                 for dim in SKETCH_DIMENSIONS for metric in QUANTILE_METRICS}
+    return distinct, quantiles
+
+
+def build(df, chunksize, precision, delta):
+    sketches = SketchCube.empty(distinct=DISTINCT, precision=precision, delta=delta)
+    for start in range(0, len(df), chunksize):
+        sketches.update(df.iloc[start:start + chunksize])
+    return sketches
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark sketched vs exact distinct counts and percentiles.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--chunksize", type=int, default=1_000_000)
+    parser.add_argument("--precision", type=int, default=PRECISION, help="HLL registers per cell = 2^precision")
+    parser.add_argument("--delta", type=float, default=DELTA, help="t-digest compression")
+    parser.add_argument("--shards", type=int, default=4, help="Interleaved shards merged for the parity check")
+    args = parser.parse_args()
+
+    accuracy = []
+    print(f"{'Rows':>12} {'Method':>7} {'Build':>9} {'Query':>9} {'Memory':>10} {'Merge parity':>13}")
+    print("-" * 66)
+    for rows in args.sizes:
+        df = CampaignDataset(dataset_path(rows)).load(list(dict.fromkeys(SKETCH_COLUMNS + DISTINCT)))
+        raw_mb = sum(df[c].memory_usage(index=False, deep=True) for c in df.columns) / 1e6
+        _, exact_s = timed(exact_answers, df)
+        print(f"{rows:>12,} {'exact':>7} {'':>9} {exact_s:>8.2f}s {raw_mb:>8.1f}MB", flush=True)
+
+        sketches, build_s = timed(build, df, args.chunksize, args.precision, args.delta)
+        _, query_s = timed(sketch_answers, sketches)
+        parts = [SketchCube.from_frame(df.iloc[i::args.shards], SKETCH_DIMENSIONS, QUANTILE_METRICS, DISTINCT,
+                                       args.precision, args.delta) for i in range(args.shards)]
+        merged = parts[0]
+        for part in parts[1:]:
+            merged = merged.merge(part)
+        parity = all(np.array_equal(merged.registers[c], sketches.registers[c]) for c in DISTINCT) and \
+            np.array_equal(merged.counts, sketches.counts)
+        print(f"{rows:>12,} {'sketch':>7} {build_s:>8.2f}s {query_s:>8.2f}s {sketches.nbytes / 1e6:>8.1f}MB "
+              f"{'registers =' if parity else 'DIFFERENT':>13}", flush=True)
+
+        errors = compare_with_frame(sketches, df, DISTINCT_BY)
+        for dim in SKETCH_DIMENSIONS:
+            for name, values in compare_with_frame(sketches, df, dim).items():
+                if name.endswith("rank"):
+                    errors[name] = np.concatenate([errors[name], values])
+        accuracy.append((rows, errors))
+
+    print(f"\nAccuracy (distinct: relative error per {' x '.join(DISTINCT_BY)}, bound = 2 standard errors; "
+          f"quantiles: rank error over that rollup and every segment, bound = one cluster)")
+    print(f"{'Rows':>12} {'Check':<26} {'Max':>9} {'Mean':>9} {'Bound':>9}")
+    print("-" * 69)
+    for rows, errors in accuracy:
+        for name, values in errors.items():
+            if name.endswith("distinct"):
+                bound = 2 * 1.04 / np.sqrt(2 ** args.precision)  # ~95% of estimates
+            else:
+                q = float(name.split(" p")[1].split()[0]) / 100
+                bound = 2 * np.pi * np.sqrt(q * (1 - q)) / args.delta
+            print(f"{rows:>12,} {name:<26} {values.max():>8.3%} {values.mean():>8.3%} {bound:>8.2%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+SQLite engine vs pandas on the seven queries of ad_sales_queries.sql.
+
+For each dataset size, generates the data in memory, bulk-loads an in-memory SQLite
+store, checks every query against pandas, and reports load and query times:
+
+    python benchmarks/bench_sql.py --sizes 2400 100000 1000000
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import pyarrow as pa
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(PROJECT_DIR, "scripts"))
+
+from data_access import DEFAULT_CSV, SCHEMA, read_csv_typed  # noqa: E402
+from generate_data import generate_chunk  # noqa: E402
+from sql_engine import SQLiteStore, compare_results, pandas_queries  # noqa: E402
+
+
+def make_frame(rows, seed=42):
+    """The 2,400-row project CSV for its own size, otherwise freshly generated rows."""
+    if rows == 2400:
+        return read_csv_typed(DEFAULT_CSV)
+    return generate_chunk(seed, 0, rows, rows).astype(SCHEMA)
+
+
+def best_of(repeat, func):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def bench_size(rows, repeat):
+    df = make_frame(rows)
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    store = SQLiteStore(":memory:")
+    try:
+        load_s, _ = best_of(1, lambda: store.load_table(table))
+        sql_s, sql_results = best_of(repeat, store.run_queries)
+        pandas_s, expected = best_of(repeat, lambda: pandas_queries(df))
+        parity = all(compare_results(got, exp) for (_, got), exp in zip(sql_results, expected))
+    finally:
+        store.close()
+    return {"rows": rows, "load_s": load_s, "sql_s": sql_s, "pandas_s": pandas_s, "parity": parity}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the SQLite engine against pandas.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[2400, 100_000, 1_000_000])
+    parser.add_argument("--repeat", type=int, default=3, help="Query timings are the best of this many runs")
+    args = parser.parse_args()
+
+    print(f"{'Rows':>12} {'SQL load':>10} {'SQL queries':>12} {'pandas':>10} {'Ratio':>7}  Parity")
+    print("-" * 64)
+    ok = True
+    for rows in args.sizes:
+        r = bench_size(rows, args.repeat)
+        print(f"{r['rows']:>12,} {r['load_s']:>9.3f}s {r['sql_s']:>11.3f}s {r['pandas_s']:>9.3f}s "
+              f"{r['sql_s'] / r['pandas_s']:>6.1f}x  {'ok' if r['parity'] else 'MISMATCH'}")
+        ok &= r["parity"]
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Cold-start benchmark for the text-only KPI command.
+
+Runs `python notebooks/ad_sales_analysis.py kpis` in fresh interpreters, reports the
+wall time distribution, and checks that none of the heavy libraries were imported.
+Exits non-zero when the median exceeds the budget or a heavy module leaks in:
+
+    python benchmarks/bench_startup.py --runs 10 --budget 0.5
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPT = os.path.join(PROJECT_DIR, "notebooks", "ad_sales_analysis.py")
+HEAVY_MODULES = ["pandas", "scipy", "matplotlib", "seaborn"]
+
+_PROBE = """
+import contextlib, io, json, runpy, sys
+sys.argv = [{script!r}, "kpis"]
+with contextlib.redirect_stdout(io.StringIO()):
+    runpy.run_path({script!r}, run_name="__main__")
+print(json.dumps([m for m in {heavy!r} if m in sys.modules]))
+"""
+
+
+def time_command(runs):
+    """Wall seconds of `runs` cold invocations of the kpis command."""
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, SCRIPT, "kpis"], check=True, stdout=subprocess.DEVNULL)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def imported_heavy_modules():
+    """Heavy modules present in sys.modules after running the kpis command."""
+    probe = _PROBE.format(script=SCRIPT, heavy=HEAVY_MODULES)
+    out = subprocess.run([sys.executable, "-c", probe], check=True, capture_output=True, text=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Startup benchmark for the kpis command.")
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--budget", type=float, default=0.5, help="Maximum median wall time in seconds")
+    args = parser.parse_args()
+
+    # Warm-up run builds the Arrow cache if needed so it is not timed
+    subprocess.run([sys.executable, SCRIPT, "kpis"], check=True, stdout=subprocess.DEVNULL)
+    timings = time_command(args.runs)
+    median = statistics.median(timings)
+    print(f"kpis cold start over {args.runs} runs: median {median * 1000:.0f} ms, "
+          f"min {min(timings) * 1000:.0f} ms, max {max(timings) * 1000:.0f} ms")
+
+    leaked = imported_heavy_modules()
+    print(f"Heavy modules imported: {', '.join(leaked) if leaked else 'none'}")
+
+    if leaked or median > args.budget:
+        print(f"FAIL: budget {args.budget * 1000:.0f} ms")
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
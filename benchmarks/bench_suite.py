@@ -0,0 +1,250 @@
+"""
+Benchmark suite for ad_sales_analysis.py, parameterized by dataset size.
+
+For each size, a dataset with the generate_data.py schema is generated once under
+data/scale/ (the 2,400-row size uses the project CSV), then every stage is run in a
+fresh worker process: the load (CSV parse + Arrow cache build + typed frame),
+sections 1-7, chart rendering and the SQL query file, with every pipeline stage
+recomputed rather than loaded from the stage cache and the stores derived from the
+Arrow cache (the SQLite copy, the bitmap index) deleted first, so every repetition
+of --repeat pays for building them as a cold run would. Each stage records wall time,
+CPU time (including child processes), peak RSS and how far the stage grew RSS above
+what the worker held before it started. Heavy libraries are imported before the
+clock starts, so the numbers are the stage's own work.
+
+Every run is appended to benchmarks/results/history.jsonl. With a baseline saved
+(--save-baseline), the run fails when any stage is slower or larger than the
+baseline by more than --threshold:
+
+    python benchmarks/bench_suite.py --sizes 2400 100000 1000000 --save-baseline
+    python benchmarks/bench_suite.py --sizes 2400 100000 1000000 --threshold 0.25
+
+The 10M and 50M sizes need tens of GB of disk and several GB of RAM; pass them
+explicitly with --sizes.
+"""
+
+import argparse
+import glob
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(PROJECT_DIR, "scripts"))
+
+from data_access import DEFAULT_CSV, CampaignDataset  # noqa: E402
+
+SCRIPT = os.path.join(PROJECT_DIR, "notebooks", "ad_sales_analysis.py")
+RESULTS_DIR = os.path.join(PROJECT_DIR, "benchmarks", "results")
+HISTORY_PATH = os.path.join(RESULTS_DIR, "history.jsonl")
+BASELINE_PATH = os.path.join(RESULTS_DIR, "baseline.json")
+DATA_DIR = os.path.join(PROJECT_DIR, "data", "scale")
+
+DEFAULT_SIZES = [2400, 100_000, 1_000_000]
+ALL_SIZES = [2400, 100_000, 1_000_000, 10_000_000, 50_000_000]
+# Stage name -> analysis command ("load" is handled by the worker itself)
+STAGES = {
+    "load": None,
+    "1_overview": "overview",
+    "2_industry": "industry",
+    "3_formats": "formats",
+    "4_variance": "variance",
+    "5_dashboard": "dashboard",
+    "6_statistics": "stats",
+    "7_findings": "findings",
+    "charts": "charts",
+    "sql": "sql",
+}
+PRELOAD = ["numpy", "pandas", "pyarrow", "pyarrow.compute", "scipy.stats", "rollups", "comoments",
+           "significance", "sql_engine", "dashboards", "concurrent.futures"]
+# Regressions smaller than these are treated as noise
+MIN_DELTA = {"wall_s": 0.05, "peak_rss_mb": 10.0}
+
+
+# ---- Datasets ----
+
+def dataset_path(rows, seed=42, chunk_size=1_000_000):
+    """CSV with `rows` rows, generated on first use (the project CSV for 2,400 rows)."""
+    if rows == 2400:
+        return DEFAULT_CSV
+    from generate_data import generate_chunk
+
+    path = os.path.join(DATA_DIR, f"bench-{rows}-seed{seed}.csv")
+    if not os.path.exists(path):
+        os.makedirs(DATA_DIR, exist_ok=True)
+        tmp_path = path + ".tmp"
+        for i in range((rows + chunk_size - 1) // chunk_size):
+            generate_chunk(seed, i, chunk_size, rows).to_csv(tmp_path, mode="w" if i == 0 else "a",
+                                                             header=i == 0, index=False)
+        os.replace(tmp_path, path)
+    return path
+
+
+# ---- Worker: runs one stage in this process and prints its measurements as JSON ----
+
+def _rss_mb(field):
+    """VmRSS / VmHWM from /proc (Linux); falls back to ru_maxrss elsewhere."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxrss / (1024 * 1024) if sys.platform == "darwin" else maxrss / 1024
+
+
+def _cpu_seconds():
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime
+
+
+def run_worker(stage, csv_path, output_dir):
+    import contextlib
+    import importlib
+    import io
+    import runpy
+
+    for module in PRELOAD:
+        importlib.import_module(module)
+    namespace = runpy.run_path(SCRIPT, run_name="bench_worker")
+    command = STAGES[stage]
+    if command is not None:
+        args = namespace["build_parser"]().parse_args(
+            [command, "--csv", csv_path, "--output-dir", output_dir, "--force-charts", "--no-cache"])
+        analysis = namespace["Analysis"](args)
+        section = namespace["COMMANDS"][command]
+        # A store left by the previous repetition would make every run after the first a warm one
+        base = os.path.splitext(analysis.dataset.cache_path)[0]
+        for path in glob.glob(base + ".sqlite*") + glob.glob(base + ".bitmaps.*"):
+            os.remove(path)
+
+    rss_before = _rss_mb("VmRSS")
+    cpu_start, wall_start = _cpu_seconds(), time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        if command is None:
+            dataset = CampaignDataset(csv_path)
+            dataset.build()
+            rows = len(dataset.load())
+        else:
+            analysis.prepare(getattr(section, "needs", ()))
+            section(analysis)
+            rows = analysis.dataset.num_rows
+    wall = time.perf_counter() - wall_start
+    cpu = _cpu_seconds() - cpu_start
+    children_peak = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+    peak = max(_rss_mb("VmHWM"), children_peak)
+    print(json.dumps({
+        "wall_s": wall,
+        "cpu_s": cpu,
+        "peak_rss_mb": peak,
+        "stage_growth_mb": max(peak - rss_before, 0.0),
+        "rows": rows,
+    }))
+
+
+# ---- Driver ----
+
+def measure(stage, csv_path, output_dir, repeat):
+    """Best-of-`repeat` wall time for one stage; memory and CPU from that run."""
+    best = None
+    for _ in range(repeat):
+        out = subprocess.run(
+            [sys.executable, __file__, "--worker", stage, "--csv", csv_path, "--output-dir", output_dir],
+            check=True, capture_output=True, text=True,
+        ).stdout
+        result = json.loads(out.strip().splitlines()[-1])
+        if best is None or result["wall_s"] < best["wall_s"]:
+            best = result
+    return best
+
+
+def machine_info():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=PROJECT_DIR,
+                                capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {"commit": commit, "python": platform.python_version(), "platform": platform.platform(),
+            "cpus": os.cpu_count()}
+
+
+def compare(results, baseline, threshold):
+    """Stages whose wall time or peak memory exceeds the baseline by more than `threshold`."""
+    base = {(r["rows"], r["stage"]): r for r in baseline["results"]}
+    regressions = []
+    for r in results:
+        ref = base.get((r["rows"], r["stage"]))
+        if ref is None:
+            continue
+        for key in ("wall_s", "peak_rss_mb"):
+            if r[key] > ref[key] * (1 + threshold) and r[key] - ref[key] > MIN_DELTA[key]:
+                regressions.append((r["rows"], r["stage"], key, ref[key], r[key]))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-stage time and memory benchmarks for the analysis.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES,
+                        help=f"Row counts (suite sizes: {', '.join(f'{s:,}' for s in ALL_SIZES)})")
+    parser.add_argument("--stages", nargs="+", choices=list(STAGES), default=list(STAGES))
+    parser.add_argument("--repeat", type=int, default=1, help="Runs per stage; the fastest is kept")
+    parser.add_argument("--threshold", type=float, default=0.25, help="Allowed relative regression vs baseline")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true", help="Store this run as the new baseline")
+    parser.add_argument("--worker", choices=list(STAGES), help=argparse.SUPPRESS)
+    parser.add_argument("--csv", help=argparse.SUPPRESS)
+    parser.add_argument("--output-dir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.worker, args.csv, args.output_dir)
+        return
+
+    results = []
+    print(f"{'Rows':>12} {'Stage':<14} {'Wall':>9} {'CPU':>9} {'Peak RSS':>10} {'Growth':>9}")
+    print("-" * 68)
+    with tempfile.TemporaryDirectory() as output_dir:
+        for rows in args.sizes:
+            csv_path = dataset_path(rows)
+            for stage in args.stages:
+                r = {"rows": rows, "stage": stage, **measure(stage, csv_path, output_dir, args.repeat)}
+                results.append(r)
+                print(f"{rows:>12,} {stage:<14} {r['wall_s']:>8.3f}s {r['cpu_s']:>8.3f}s "
+                      f"{r['peak_rss_mb']:>8.0f}MB {r['stage_growth_mb']:>7.0f}MB", flush=True)
+
+    record = {"timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+              "machine": machine_info(), "results": results}
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    with open(HISTORY_PATH, "a") as f:
+        f.write(json.dumps(record) + "\n")
+    print(f"\nAppended to {os.path.relpath(HISTORY_PATH, PROJECT_DIR)}")
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(record, f, indent=2)
+        print(f"Saved baseline to {os.path.relpath(args.baseline, PROJECT_DIR)}")
+        return
+    if not os.path.exists(args.baseline):
+        print("No baseline to compare against (run with --save-baseline)")
+        return
+    with open(args.baseline) as f:
+        regressions = compare(results, json.load(f), args.threshold)
+    if regressions:
+        print(f"\nREGRESSIONS (> {args.threshold:.0%} over baseline):")
+        for rows, stage, key, before, after in regressions:
+            print(f"  {rows:>12,} {stage:<14} {key:<12} {before:.3f} -> {after:.3f}")
+        sys.exit(1)
+    print(f"No stage regressed by more than {args.threshold:.0%}")
+
+
+if __name__ == "__main__":
+    main()
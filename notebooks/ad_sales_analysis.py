@@ -5,366 +5,695 @@ Financial analysis of 2,400 advertising campaigns merged from Sales CRM,
 Ad Platform, and Finance systems. Covers: revenue performance, budget variance,
 forecasting, KPI tracking, and strategic recommendations.
 
+Usage:
+    python notebooks/ad_sales_analysis.py [command] [options]
+
+Commands: kpis, overview, industry, formats, variance, forecast, dashboard, stats,
+segments, distributions, top, drilldown, findings, charts, sql, all (default). Heavy libraries (pandas, scipy, matplotlib, seaborn) are
+imported only by the commands that use them; `kpis` reads the Arrow cache with
+pyarrow.compute alone and answers in a few hundred milliseconds.
+
 Author: Deepanshi Behal
 """
 
-import pandas as pd
-import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
-from scipy import stats
+import argparse
+import glob
 import os
+import sys
+import threading
 
-sns.set_theme(style="whitegrid")
-plt.rcParams["figure.figsize"] = (10, 6)
-plt.rcParams["figure.dpi"] = 150
-
-output_dir = "C:/Users/Deepanshi/Desktop/ad-sales-revenue-analytics/dashboards"
-os.makedirs(output_dir, exist_ok=True)
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(PROJECT_DIR, "scripts"))
 
-df = pd.read_csv("C:/Users/Deepanshi/Desktop/ad-sales-revenue-analytics/data/ad_sales_data.csv")
+from data_access import CampaignDataset  # noqa: E402  (pyarrow only; pandas is imported lazily)
+from pipeline import Pipeline  # noqa: E402  (stdlib only)
+from profiling import PROFILER, traced  # noqa: E402  (stdlib only; no-op unless --profile/--trace)
 
-print("=" * 60)
-print("AD SALES REVENUE ANALYTICS")
-print("=" * 60)
-print(f"\nDataset: {len(df)} campaigns across {df['advertiser'].nunique()} advertisers")
-print(f"Industries: {df['industry'].nunique()} | Ad Formats: {df['ad_format'].nunique()}")
-print(f"Data Sources Merged: Sales CRM, Ad Platform, Finance System")
-
-# ============================================================
-# 1. REVENUE PERFORMANCE OVERVIEW
-# ============================================================
-print("\n" + "=" * 60)
-print("1. REVENUE PERFORMANCE OVERVIEW")
-print("=" * 60)
-
-total_booked = df["booked_revenue"].sum()
-total_actual = df["actual_revenue"].sum()
-total_budget = df["budget"].sum()
-total_margin = df["gross_margin"].sum()
-avg_margin_pct = df["margin_pct"].mean()
-avg_cpm = df["cpm"].mean()
-
-print(f"\nTotal Booked Revenue:  ${total_booked:>14,.2f}")
-print(f"Total Actual Revenue:  ${total_actual:>14,.2f}")
-print(f"Total Budget:          ${total_budget:>14,.2f}")
-print(f"Total Gross Margin:    ${total_margin:>14,.2f}")
-print(f"Avg Margin %:          {avg_margin_pct:>14.1f}%")
-print(f"Avg CPM:               ${avg_cpm:>14.2f}")
-print(f"Budget Variance:       ${total_actual - total_budget:>14,.2f} ({(total_actual - total_budget) / total_budget * 100:+.1f}%)")
-
-# Revenue by quarter
-rev_by_q = df.groupby("quarter").agg(
-    booked=("booked_revenue", "sum"),
-    actual=("actual_revenue", "sum"),
-    budget=("budget", "sum"),
-    campaigns=("campaign_id", "count"),
-).round(2)
-
-print(f"\nQuarterly Revenue Summary:")
-print(f"{'Quarter':<10} {'Booked':>14} {'Actual':>14} {'Budget':>14} {'Variance %':>12}")
-print("-" * 68)
-for q, row in rev_by_q.iterrows():
-    var_pct = (row["actual"] - row["budget"]) / row["budget"] * 100
-    print(f"{q:<10} ${row['booked']:>13,.0f} ${row['actual']:>13,.0f} ${row['budget']:>13,.0f} {var_pct:>+11.1f}%")
-
-# Chart: Quarterly Revenue - Budget vs Actual
-fig, ax = plt.subplots(figsize=(10, 5))
-quarters = rev_by_q.index.tolist()
-x = range(len(quarters))
-width = 0.3
-
-ax.bar([i - width/2 for i in x], rev_by_q["budget"] / 1e6, width, label="Budget", color="#90CAF9", edgecolor="white")
-ax.bar([i + width/2 for i in x], rev_by_q["actual"] / 1e6, width, label="Actual Revenue", color="#1565C0", edgecolor="white")
-
-for i, q in enumerate(quarters):
-    var = (rev_by_q.loc[q, "actual"] - rev_by_q.loc[q, "budget"]) / rev_by_q.loc[q, "budget"] * 100
-    color = "#4CAF50" if var >= 0 else "#F44336"
-    ax.text(i + width/2, rev_by_q.loc[q, "actual"] / 1e6 + 0.1, f"{var:+.1f}%", ha="center", fontsize=9, color=color, fontweight="bold")
-
-ax.set_ylabel("Revenue ($M)")
-ax.set_xticks(x)
-ax.set_xticklabels(quarters)
-ax.set_title("Quarterly Revenue: Budget vs Actual", fontsize=14, fontweight="bold")
-ax.legend()
-plt.tight_layout()
-plt.savefig(f"{output_dir}/01_quarterly_budget_vs_actual.png", bbox_inches="tight")
-plt.close()
-print("\nSaved: 01_quarterly_budget_vs_actual.png")
+CSV_PATH = os.path.join(PROJECT_DIR, "data", "ad_sales_data.csv")
+OUTPUT_DIR = os.path.join(PROJECT_DIR, "dashboards")
+QUERIES_PATH = os.path.join(PROJECT_DIR, "scripts", "ad_sales_queries.sql")
+CORR_COLS = ["impressions", "clicks", "ctr", "cpm", "booked_revenue", "actual_revenue",
+             "delivery_rate", "cost_of_sale", "gross_margin", "margin_pct"]
 
-# ============================================================
-# 2. REVENUE BY INDUSTRY & ACCOUNT TIER
-# ============================================================
-print("\n" + "=" * 60)
-print("2. REVENUE BY INDUSTRY & ACCOUNT TIER")
-print("=" * 60)
-
-# By industry
-rev_industry = df.groupby("industry").agg(
-    campaigns=("campaign_id", "count"),
-    total_revenue=("actual_revenue", "sum"),
-    avg_revenue=("actual_revenue", "mean"),
-    avg_margin=("margin_pct", "mean"),
-    avg_cpm=("cpm", "mean"),
-).round(2).sort_values("total_revenue", ascending=False)
-
-print(f"\n{'Industry':<15} {'Campaigns':>10} {'Total Rev':>14} {'Avg Rev':>12} {'Margin %':>10} {'Avg CPM':>10}")
-print("-" * 75)
-for ind, row in rev_industry.iterrows():
-    print(f"{ind:<15} {row['campaigns']:>10} ${row['total_revenue']:>13,.0f} ${row['avg_revenue']:>10,.0f} {row['avg_margin']:>9.1f}% ${row['avg_cpm']:>8.2f}")
-
-# By account tier
-rev_tier = df.groupby("account_tier").agg(
-    campaigns=("campaign_id", "count"),
-    total_revenue=("actual_revenue", "sum"),
-    avg_margin=("margin_pct", "mean"),
-).round(2).sort_values("total_revenue", ascending=False)
-
-print(f"\nRevenue by Account Tier:")
-for tier, row in rev_tier.iterrows():
-    print(f"  {tier:<15} {row['campaigns']:>5} campaigns  ${row['total_revenue']:>14,.2f}  Margin: {row['avg_margin']:.1f}%")
-
-# Chart: Revenue by industry
-fig, axes = plt.subplots(1, 2, figsize=(14, 5))
-
-colors_ind = ["#1565C0", "#1976D2", "#1E88E5", "#42A5F5", "#64B5F6", "#90CAF9"]
-axes[0].barh(rev_industry.index, rev_industry["total_revenue"] / 1e6, color=colors_ind, edgecolor="white")
-axes[0].set_xlabel("Total Revenue ($M)")
-axes[0].set_title("Revenue by Industry", fontsize=12, fontweight="bold")
-for i, (ind, row) in enumerate(rev_industry.iterrows()):
-    axes[0].text(row["total_revenue"] / 1e6 + 0.05, i, f"${row['total_revenue']/1e6:.1f}M", va="center", fontsize=9)
-
-tier_colors = ["#1565C0", "#42A5F5", "#90CAF9"]
-axes[1].pie(rev_tier["total_revenue"], labels=rev_tier.index, autopct="%1.1f%%",
-            colors=tier_colors, startangle=90, textprops={"fontsize": 10})
-axes[1].set_title("Revenue Share by Account Tier", fontsize=12, fontweight="bold")
-
-plt.suptitle("Revenue Breakdown: Industry & Account Tier", fontsize=14, fontweight="bold", y=1.02)
-plt.tight_layout()
-plt.savefig(f"{output_dir}/02_revenue_by_industry_tier.png", bbox_inches="tight")
-plt.close()
-print("\nSaved: 02_revenue_by_industry_tier.png")
 
-# ============================================================
-# 3. AD FORMAT PERFORMANCE & CPM ANALYSIS
-# ============================================================
-print("\n" + "=" * 60)
-print("3. AD FORMAT PERFORMANCE & CPM ANALYSIS")
-print("=" * 60)
-
-format_perf = df.groupby("ad_format").agg(
-    campaigns=("campaign_id", "count"),
-    avg_cpm=("cpm", "mean"),
-    avg_ctr=("ctr", "mean"),
-    total_revenue=("actual_revenue", "sum"),
-    avg_margin=("margin_pct", "mean"),
-    avg_delivery=("delivery_rate", "mean"),
-).round(4).sort_values("avg_cpm", ascending=False)
-
-print(f"\n{'Ad Format':<20} {'CPM':>8} {'CTR':>8} {'Revenue':>14} {'Margin %':>10} {'Delivery':>10}")
-print("-" * 75)
-for fmt, row in format_perf.iterrows():
-    print(f"{fmt:<20} ${row['avg_cpm']:>6.2f} {row['avg_ctr']*100:>7.2f}% ${row['total_revenue']:>12,.0f} {row['avg_margin']:>9.1f}% {row['avg_delivery']*100:>8.1f}%")
-
-# Chart: CPM and CTR by format
-fig, ax1 = plt.subplots(figsize=(10, 5))
-
-x = range(len(format_perf))
-bars = ax1.bar(x, format_perf["avg_cpm"], color="#1565C0", edgecolor="white", width=0.5, label="Avg CPM ($)")
-ax1.set_ylabel("Avg CPM ($)", color="#1565C0")
-ax1.set_xticks(x)
-ax1.set_xticklabels(format_perf.index, rotation=25, ha="right")
-
-ax2 = ax1.twinx()
-ax2.plot(x, format_perf["avg_ctr"] * 100, "o-", color="#FF5722", linewidth=2, markersize=8, label="Avg CTR (%)")
-ax2.set_ylabel("Avg CTR (%)", color="#FF5722")
-
-for i, (cpm, ctr) in enumerate(zip(format_perf["avg_cpm"], format_perf["avg_ctr"])):
-    ax1.text(i, cpm + 0.3, f"${cpm:.1f}", ha="center", fontsize=9)
-
-ax1.set_title("Ad Format Performance: CPM vs CTR", fontsize=14, fontweight="bold")
-lines1, labels1 = ax1.get_legend_handles_labels()
-lines2, labels2 = ax2.get_legend_handles_labels()
-ax1.legend(lines1 + lines2, labels1 + labels2, loc="upper right")
-plt.tight_layout()
-plt.savefig(f"{output_dir}/03_ad_format_performance.png", bbox_inches="tight")
-plt.close()
-print("\nSaved: 03_ad_format_performance.png")
+def banner(title):
+    print("\n" + "=" * 60)
+    print(title)
+    print("=" * 60)
 
-# ============================================================
-# 4. BUDGET VARIANCE & FORECASTING ANALYSIS
-# ============================================================
-print("\n" + "=" * 60)
-print("4. BUDGET VARIANCE & FORECASTING ANALYSIS")
-print("=" * 60)
-
-df["budget_variance"] = df["actual_revenue"] - df["budget"]
-df["variance_pct"] = (df["budget_variance"] / df["budget"] * 100).round(1)
-
-# Variance by quarter and industry
-var_by_q_ind = df.groupby(["quarter", "industry"]).agg(
-    total_actual=("actual_revenue", "sum"),
-    total_budget=("budget", "sum"),
-).reset_index()
-var_by_q_ind["variance_pct"] = ((var_by_q_ind["total_actual"] - var_by_q_ind["total_budget"]) / var_by_q_ind["total_budget"] * 100).round(1)
-
-# Variance by sales rep
-var_by_rep = df.groupby("sales_rep").agg(
-    campaigns=("campaign_id", "count"),
-    total_actual=("actual_revenue", "sum"),
-    total_budget=("budget", "sum"),
-    avg_margin=("margin_pct", "mean"),
-).round(2)
-var_by_rep["variance_pct"] = ((var_by_rep["total_actual"] - var_by_rep["total_budget"]) / var_by_rep["total_budget"] * 100).round(1)
-var_by_rep = var_by_rep.sort_values("total_actual", ascending=False)
-
-print(f"\nSales Rep Performance:")
-print(f"{'Rep':<12} {'Campaigns':>10} {'Actual Rev':>14} {'Budget':>14} {'Var %':>8} {'Margin':>8}")
-print("-" * 70)
-for rep, row in var_by_rep.iterrows():
-    print(f"{rep:<12} {row['campaigns']:>10} ${row['total_actual']:>13,.0f} ${row['total_budget']:>13,.0f} {row['variance_pct']:>+7.1f}% {row['avg_margin']:>6.1f}%")
-
-# Forecasting: Q4 trend
-q4 = df[df["quarter"] == "Q4 2025"]
-q4_monthly = q4.groupby("month")["actual_revenue"].sum().reindex(["Oct", "Nov", "Dec"])
-print(f"\nQ4 2025 Monthly Revenue:")
-for m, rev in q4_monthly.items():
-    print(f"  {m}: ${rev:,.2f}")
-
-# Chart: Budget variance by sales rep
-fig, ax = plt.subplots(figsize=(10, 5))
-colors = ["#4CAF50" if v >= 0 else "#F44336" for v in var_by_rep["variance_pct"]]
-bars = ax.bar(var_by_rep.index, var_by_rep["variance_pct"], color=colors, edgecolor="white", width=0.5)
-ax.axhline(y=0, color="black", linewidth=0.5)
-ax.set_ylabel("Budget Variance (%)")
-ax.set_title("Budget Variance by Sales Rep", fontsize=14, fontweight="bold")
-for bar, val in zip(bars, var_by_rep["variance_pct"]):
-    color = "#4CAF50" if val >= 0 else "#F44336"
-    ax.text(bar.get_x() + bar.get_width()/2, bar.get_height() + 0.1, f"{val:+.1f}%",
-            ha="center", fontsize=10, color=color, fontweight="bold")
-plt.tight_layout()
-plt.savefig(f"{output_dir}/04_budget_variance_by_rep.png", bbox_inches="tight")
-plt.close()
-print("\nSaved: 04_budget_variance_by_rep.png")
 
 # ============================================================
-# 5. KPI DASHBOARD METRICS
+# STAGES: the summary tables the sections read, as a DAG
 # ============================================================
-print("\n" + "=" * 60)
-print("5. KPI DASHBOARD METRICS")
-print("=" * 60)
-
-# Key financial KPIs
-total_impressions = df["impressions"].sum()
-total_clicks = df["clicks"].sum()
-overall_ctr = total_clicks / total_impressions * 100
-revenue_per_campaign = df["actual_revenue"].mean()
-win_rate = (df["deal_status"] == "Closed Won").mean() * 100
-overdue_pct = (df["payment_status"] == "Overdue").mean() * 100
-avg_delivery = df["delivery_rate"].mean() * 100
-
-print(f"\nFinancial KPIs:")
-print(f"  Revenue per Campaign:    ${revenue_per_campaign:>10,.2f}")
-print(f"  Overall CTR:             {overall_ctr:>10.2f}%")
-print(f"  Avg Delivery Rate:       {avg_delivery:>10.1f}%")
-print(f"  Avg Gross Margin:        {avg_margin_pct:>10.1f}%")
-print(f"  Win Rate:                {win_rate:>10.1f}%")
-print(f"  Overdue Payments:        {overdue_pct:>10.1f}%")
-
-print(f"\nScale Metrics:")
-print(f"  Total Impressions:       {total_impressions:>14,}")
-print(f"  Total Clicks:            {total_clicks:>14,}")
-print(f"  Total Campaigns:         {len(df):>14,}")
-print(f"  Unique Advertisers:      {df['advertiser'].nunique():>14,}")
-
-# Platform performance
-platform_perf = df.groupby("platform").agg(
-    revenue=("actual_revenue", "sum"),
-    avg_ctr=("ctr", "mean"),
-    avg_cpm=("cpm", "mean"),
-).round(4).sort_values("revenue", ascending=False)
-
-print(f"\nPlatform Performance:")
-for plat, row in platform_perf.iterrows():
-    print(f"  {plat:<18} Rev: ${row['revenue']:>12,.0f}  CTR: {row['avg_ctr']*100:.2f}%  CPM: ${row['avg_cpm']:.2f}")
-
-# Chart: KPI summary with platform breakdown
-fig, axes = plt.subplots(1, 2, figsize=(14, 5))
-
-# Platform revenue pie
-plat_colors = ["#1565C0", "#42A5F5", "#90CAF9", "#BBDEFB"]
-axes[0].pie(platform_perf["revenue"], labels=platform_perf.index, autopct="%1.1f%%",
-            colors=plat_colors, startangle=90, textprops={"fontsize": 10})
-axes[0].set_title("Revenue by Platform", fontsize=12, fontweight="bold")
-
-# Deal status bar
-deal_counts = df["deal_status"].value_counts()
-deal_colors = {"Closed Won": "#4CAF50", "In Flight": "#FF9800", "Renewal Pending": "#2196F3"}
-axes[1].bar(deal_counts.index, deal_counts.values,
-            color=[deal_colors.get(d, "#9E9E9E") for d in deal_counts.index], edgecolor="white")
-axes[1].set_title("Campaign Deal Status", fontsize=12, fontweight="bold")
-axes[1].set_ylabel("Number of Campaigns")
-for i, (status, count) in enumerate(deal_counts.items()):
-    axes[1].text(i, count + 10, str(count), ha="center", fontsize=11, fontweight="bold")
-
-plt.suptitle("Ad Sales KPI Dashboard", fontsize=14, fontweight="bold", y=1.02)
-plt.tight_layout()
-plt.savefig(f"{output_dir}/05_kpi_dashboard.png", bbox_inches="tight")
-plt.close()
-print("\nSaved: 05_kpi_dashboard.png")
+# Each stage names the stages it reads and the options it depends on; results are
+# memoized under data/.cache/stages/ and independent stages run concurrently.
+
+PIPELINE = Pipeline()
+stage = PIPELINE.stage
+STREAM_PARAMS = ("streaming", "source_stamp", "chunksize", "shards", "shard_by")
+
+
+@stage(params=STREAM_PARAMS, modules=("streaming", "sharded", "rollups", "comoments"))
+def stream(ctx):
+    """Streaming/sharded mode: cube and KPI counters merged chunk by chunk or shard by shard
+    (None in memory mode)."""
+    if ctx.args.shards:
+        from sharded import run_sharded
+        state = run_sharded(ctx.dataset.ensure(), ctx.args.shards, ctx.args.shard_by, chunksize=ctx.args.chunksize)
+        PROFILER.add_rows(state.n)
+        return state
+    if not ctx.args.streaming:
+        return None
+    from streaming import run_streaming
+    state = run_streaming(ctx.args.source or ctx.dataset.ensure(), ctx.args.chunksize)
+    PROFILER.add_rows(state.n)
+    return state
+
+
+@stage(params=("compact",), modules=("compact",), cache=False)
+def compact_frame(ctx):
+    """Compact mode: the whole dataset with fixed-point money and coded dimensions (None otherwise)."""
+    if not ctx.args.compact:
+        return None
+    from compact import CompactFrame
+    frame = CompactFrame.from_table(ctx.dataset.table())
+    PROFILER.add_rows(len(frame))
+    return frame
+
+
+@stage(inputs=("stream", "compact_frame"), params=("engine",), modules=("rollups", "sql_engine", "compact"))
+def cube(ctx, stream, compact_frame):
+    """All rollups are read from one cube built in a single scan.
+
+    With --engine sql the same named aggregations run as GROUP BY queries instead; with
+    --compact the cube keeps exact integer sums and sums of squares.
+    """
+    if stream is not None:
+        return stream.cube
+    if compact_frame is not None:
+        from compact import FixedPointCube
+        return FixedPointCube.from_compact(compact_frame)
+    if ctx.args.engine == "sql":
+        return ctx.store
+    from rollups import DIMENSIONS, METRICS, RollupCube
+    return RollupCube.from_frame(ctx.load(DIMENSIONS + METRICS))
+
+
+@stage(inputs=("stream", "compact_frame"), params=("engine",))
+def counts(ctx, stream, compact_frame):
+    if stream is not None:
+        return {"campaigns": stream.n, "advertisers": stream.nunique("advertiser"),
+                "industries": stream.nunique("industry"), "formats": stream.nunique("ad_format")}
+    if compact_frame is not None:
+        return {"campaigns": len(compact_frame), "advertisers": compact_frame.nunique("advertiser"),
+                "industries": compact_frame.nunique("industry"), "formats": compact_frame.nunique("ad_format")}
+    if ctx.args.engine == "sql":
+        distinct = ctx.store.count_distinct("advertiser", "industry", "ad_format")
+        return {"campaigns": ctx.store.num_rows(), "advertisers": distinct["advertiser"],
+                "industries": distinct["industry"], "formats": distinct["ad_format"]}
+    entities = ctx.load(["advertiser", "industry", "ad_format"])
+    return {"campaigns": ctx.dataset.num_rows, "advertisers": entities["advertiser"].nunique(),
+            "industries": entities["industry"].nunique(), "formats": entities["ad_format"].nunique()}
+
+
+@stage(inputs=("cube",))
+def totals(ctx, cube):
+    return cube.agg(
+        [],
+        booked=("booked_revenue", "sum"),
+        actual=("actual_revenue", "sum"),
+        budget=("budget", "sum"),
+        margin=("gross_margin", "sum"),
+        avg_margin_pct=("margin_pct", "mean"),
+        avg_cpm=("cpm", "mean"),
+    ).iloc[0]
+
+
+@stage(inputs=("cube",))
+def rev_by_q(ctx, cube):
+    return cube.agg("quarter",
+        booked=("booked_revenue", "sum"),
+        actual=("actual_revenue", "sum"),
+        budget=("budget", "sum"),
+        campaigns=("campaign_id", "count"),
+    ).round(2)
+
+
+@stage(inputs=("cube",))
+def rev_industry(ctx, cube):
+    return cube.agg("industry",
+        campaigns=("campaign_id", "count"),
+        total_revenue=("actual_revenue", "sum"),
+        avg_revenue=("actual_revenue", "mean"),
+        avg_margin=("margin_pct", "mean"),
+        avg_cpm=("cpm", "mean"),
+    ).round(2).sort_values("total_revenue", ascending=False)
+
+
+@stage(inputs=("cube",))
+def rev_tier(ctx, cube):
+    return cube.agg("account_tier",
+        campaigns=("campaign_id", "count"),
+        total_revenue=("actual_revenue", "sum"),
+        avg_margin=("margin_pct", "mean"),
+    ).round(2).sort_values("total_revenue", ascending=False)
+
+
+@stage(inputs=("cube",))
+def format_perf(ctx, cube):
+    return cube.agg("ad_format",
+        campaigns=("campaign_id", "count"),
+        avg_cpm=("cpm", "mean"),
+        avg_ctr=("ctr", "mean"),
+        total_revenue=("actual_revenue", "sum"),
+        avg_margin=("margin_pct", "mean"),
+        avg_delivery=("delivery_rate", "mean"),
+    ).round(4).sort_values("avg_cpm", ascending=False)
+
+
+@stage(inputs=("cube",))
+def var_by_q_ind(ctx, cube):
+    var_by_q_ind = cube.agg(["quarter", "industry"],
+        total_actual=("actual_revenue", "sum"),
+        total_budget=("budget", "sum"),
+    ).reset_index()
+    var_by_q_ind["variance_pct"] = ((var_by_q_ind["total_actual"] - var_by_q_ind["total_budget"]) / var_by_q_ind["total_budget"] * 100).round(1)
+    return var_by_q_ind
+
+
+@stage(inputs=("cube",))
+def var_by_rep(ctx, cube):
+    var_by_rep = cube.agg("sales_rep",
+        campaigns=("campaign_id", "count"),
+        total_actual=("actual_revenue", "sum"),
+        total_budget=("budget", "sum"),
+        avg_margin=("margin_pct", "mean"),
+    ).round(2)
+    var_by_rep["variance_pct"] = ((var_by_rep["total_actual"] - var_by_rep["total_budget"]) / var_by_rep["total_budget"] * 100).round(1)
+    return var_by_rep.sort_values("total_actual", ascending=False)
+
+
+@stage(inputs=("cube",))
+def q4_monthly(ctx, cube):
+    return cube.agg(["quarter", "month"], actual=("actual_revenue", "sum")).loc["Q4 2025", "actual"].reindex(["Oct", "Nov", "Dec"])
+
+
+@stage(modules=("forecasting",))
+def series_panel(ctx):
+    """advertiser x ad_format x platform monthly revenue/budget panel for the forecasts."""
+    from forecasting import FORECAST_COLUMNS, SeriesPanel
+    return SeriesPanel.from_frame(ctx.load(FORECAST_COLUMNS))
+
+
+@stage(inputs=("series_panel",), params=("horizon",), modules=("forecasting",))
+def backtest(ctx, series_panel):
+    """Every model scored on the last --horizon months (at most half the history), against the
+    budget as a forecast; no scores when the history is too short to hold any out."""
+    from forecasting import backtest, backtest_holdout
+    holdout = backtest_holdout(len(series_panel.periods), ctx.args.horizon)
+    return {"holdout": holdout, "scores": backtest(series_panel, holdout) if holdout else None}
+
+
+@stage(inputs=("series_panel", "backtest"), params=("horizon", "forecast_model"), modules=("forecasting",))
+def forecast(ctx, series_panel, backtest):
+    """The --forecast-model forecast; with auto, the lowest-error forecast of the backtest."""
+    from forecasting import choose_model, forecast
+    model = ctx.args.forecast_model
+    if model == "auto":
+        model = choose_model(backtest["scores"])
+    return {"model": model, "table": forecast(series_panel, ctx.args.horizon, model)}
+
+
+@stage(inputs=("stream", "compact_frame"), modules=("compact", "bitmaps"))
+def kpi(ctx, stream, compact_frame):
+    if stream is not None:
+        kpis = stream.kpis()
+        kpis["deal_counts"] = stream.deal_status_counts()
+        return kpis
+    if compact_frame is not None:
+        from compact import compact_kpis
+        return compact_kpis(compact_frame)
+    # Status shares and counts are popcounts of the bitmap index; only the measures are read
+    index = ctx.bitmaps
+    kpi = ctx.load(["impressions", "clicks", "actual_revenue", "delivery_rate"])
+    total_impressions = kpi["impressions"].sum()
+    total_clicks = kpi["clicks"].sum()
+    return {
+        "total_impressions": total_impressions,
+        "total_clicks": total_clicks,
+        "overall_ctr": total_clicks / total_impressions * 100,
+        "revenue_per_campaign": kpi["actual_revenue"].mean(),
+        "win_rate": index.bitmap("deal_status", "Closed Won").count() / index.rows * 100,
+        "overdue_pct": index.bitmap("payment_status", "Overdue").count() / index.rows * 100,
+        "avg_delivery": kpi["delivery_rate"].mean() * 100,
+        "deal_counts": index.count_by("deal_status").sort_values(ascending=False),
+    }
+
+
+@stage(inputs=("cube",))
+def platform_perf(ctx, cube):
+    return cube.agg("platform",
+        revenue=("actual_revenue", "sum"),
+        avg_ctr=("ctr", "mean"),
+        avg_cpm=("cpm", "mean"),
+    ).round(4).sort_values("revenue", ascending=False)
+
+
+@stage(inputs=("stream", "compact_frame"), modules=("compact", "streaming", "bitmaps"))
+def ttest(ctx, stream, compact_frame):
+    """Enterprise vs Growth tier revenue t-test."""
+    if stream is not None:
+        # Same pooled t-test from per-tier n/mean/variance
+        return stream.tier_ttest("Enterprise", "Growth")
+    if compact_frame is not None:
+        # Per-tier n/mean/variance from exact integer moments
+        from compact import FixedPointCube
+        from streaming import tier_ttest
+        return tier_ttest(FixedPointCube.from_compact(compact_frame, ["account_tier"], ["actual_revenue"]))
+    from scipy import stats
+    index = ctx.bitmaps
+    enterprise = index.select(index.bitmap("account_tier", "Enterprise"), ["actual_revenue"])["actual_revenue"]
+    growth = index.select(index.bitmap("account_tier", "Growth"), ["actual_revenue"])["actual_revenue"]
+    t_stat, p_val = stats.ttest_ind(enterprise, growth)
+    return {"mean_a": enterprise.mean(), "mean_b": growth.mean(), "t_stat": t_stat, "p_val": p_val}
+
+
+@stage(params=STREAM_PARAMS + ("top_by", "rank_by", "top_k"), modules=("topk", "sharded"))
+def top_campaigns(ctx):
+    """Top-k campaigns per group by partial selection; chunk by chunk in streaming mode,
+    shard by shard in sharded mode."""
+    from topk import TOPK_COLUMNS, TopK
+    if ctx.args.shards:
+        from sharded import sharded_top
+        return sharded_top(ctx.dataset.ensure(), ctx.args.top_k, ctx.args.top_by, ctx.args.rank_by,
+                           ctx.args.shards, ctx.args.shard_by, chunksize=ctx.args.chunksize)
+    top = TopK(ctx.args.top_k, ctx.args.top_by, ctx.args.rank_by)
+    if ctx.args.streaming:
+        from streaming import iter_chunks
+        source = ctx.args.source or ctx.dataset.ensure()
+        for chunk in iter_chunks(source, TOPK_COLUMNS, ctx.args.chunksize):
+            top.update(chunk)
+        return top.result()
+    return top.update(ctx.load(TOPK_COLUMNS)).result()
+
+
+@stage(params=STREAM_PARAMS, modules=("sketches", "sharded"))
+def sketches(ctx):
+    """HyperLogLog and t-digest sketches per cell for distinct counts and percentiles; chunk by
+    chunk in streaming mode, shard by shard in sharded mode."""
+    from sketches import SKETCH_COLUMNS, SketchCube
+    if ctx.args.shards:
+        from sharded import sharded_sketches
+        return sharded_sketches(ctx.dataset.ensure(), ctx.args.shards, ctx.args.shard_by,
+                                chunksize=ctx.args.chunksize)
+    if ctx.args.streaming:
+        from streaming import iter_chunks
+        cube = SketchCube.empty()
+        for chunk in iter_chunks(ctx.args.source or ctx.dataset.ensure(), SKETCH_COLUMNS, ctx.args.chunksize):
+            cube.update(chunk)
+        return cube
+    return SketchCube.from_frame(ctx.load(SKETCH_COLUMNS))
+
+
+@stage(params=("filter", "drill_by"), modules=("bitmaps", "rollups"))
+def filtered_rollup(ctx):
+    """Revenue, budget and margin per --drill-by over the rows matching every --filter,
+    resolved on the bitmap index before any column is read."""
+    from bitmaps import parse_filters
+    index = ctx.bitmaps
+    rows = index.where(parse_filters(ctx.args.filter))
+    table = index.agg(rows, ctx.args.drill_by,
+        campaigns=("campaign_id", "count"),
+        revenue=("actual_revenue", "sum"),
+        budget=("budget", "sum"),
+        avg_margin=("margin_pct", "mean"),
+    )
+    table["variance_pct"] = (table["revenue"] - table["budget"]) / table["budget"] * 100
+    return {"campaigns": rows.count(), "table": table.sort_values("revenue", ascending=False)}
+
+
+@stage(inputs=("cube",), modules=("significance",))
+def segment_tests(ctx, cube):
+    """Pairwise Welch tests across segments from the engine's per-group n/mean/var."""
+    from significance import segment_tests
+    return segment_tests(cube)
+
+
+@stage(inputs=("stream",), modules=("comoments",))
+def comoments(ctx, stream):
+    """Mean vector and co-moment matrix of the correlation columns, from one pass."""
+    if stream is not None:
+        return stream.comoments
+    from comoments import CoMoments
+    table = ctx.dataset.table(CORR_COLS)
+    PROFILER.add_rows(table.num_rows)
+    return CoMoments(CORR_COLS).update_table(table)
+
+
+@stage(inputs=("comoments",))
+def corr(ctx, comoments):
+    return comoments.corr()
+
+
+@stage(modules=("sql_engine",), files=(QUERIES_PATH,))
+def sql_results(ctx):
+    """Every query of scripts/ad_sales_queries.sql, run on the SQLite copy."""
+    return ctx.store.run_queries(QUERIES_PATH)
+
+
+class Analysis:
+    """Run context for the sections: options, the dataset and the stage results computed so far.
+
+    Stage results are read as attributes (`a.totals`); a missing one is computed (or
+    loaded from the stage cache) on first use. `prepare` resolves the stages several
+    sections need in one pipeline run, so independent ones run concurrently.
+    """
+
+    def __init__(self, args):
+        self.args = args
+        # Typed, memory-mapped columnar cache of the CSV (rebuilt only when the CSV changes).
+        # Each stage projects just the columns it needs.
+        self.dataset = CampaignDataset(args.csv)
+        self.results = {}
+        self.params = dict(vars(args), source_stamp=source_stamp(args.source) if args.streaming else None)
+        self.cache_dir = None if args.no_cache else os.path.join(os.path.dirname(self.dataset.cache_path), "stages")
+        self._store_lock = threading.Lock()
+        self._store = None
+        self._bitmaps_lock = threading.Lock()
+        self._bitmaps = None
+
+    def load(self, columns):
+        """Typed DataFrame of `columns` from the cache, counted as one profiled step."""
+        with PROFILER.span(f"load {len(columns)} columns") as step:
+            df = self.dataset.load(columns)
+            step.add_rows(len(df))
+        return df
+
+    @property
+    def store(self):
+        """Indexed SQLite copy of the data, loaded from the Arrow cache when stale."""
+        with self._store_lock:
+            if self._store is None:
+                from sql_engine import SQLiteStore
+                with PROFILER.span("sql store"):
+                    # Kept next to the Arrow cache, one database per source CSV
+                    path = os.path.splitext(self.dataset.cache_path)[0] + ".sqlite"
+                    self._store = SQLiteStore(path).ensure(self.dataset)
+            return self._store
+
+    @property
+    def bitmaps(self):
+        """Per-value bitmap index of the dimensions, built from the Arrow cache when stale."""
+        with self._bitmaps_lock:
+            if self._bitmaps is None:
+                from bitmaps import BitmapIndex
+                with PROFILER.span("bitmap index"):
+                    self._bitmaps = BitmapIndex(self.dataset).ensure()
+            return self._bitmaps
+
+    def prepare(self, stages):
+        """Resolve `stages` (and what they read) in one concurrent, memoized pipeline run."""
+        missing = [s for s in stages if s not in self.results]
+        if not missing:
+            return
+        # Built up front so concurrent stages never race to write the Arrow cache
+        self.dataset.ensure()
+        self.results = PIPELINE.run(missing, self, self.params, self.dataset.fingerprint(),
+                                    self.cache_dir, self.args.jobs, done=self.results)
+
+    def __getattr__(self, name):
+        if name in PIPELINE.stages:
+            self.prepare([name])
+            return self.results[name]
+        raise AttributeError(name)
+
+
+def source_stamp(source):
+    """Size and mtime of a streaming source (a file or a directory of part-*.csv files)."""
+    if source is None:
+        return None
+    paths = sorted(glob.glob(os.path.join(source, "part-*.csv"))) if os.path.isdir(source) else [source]
+    return [(os.path.basename(p), os.stat(p).st_size, os.stat(p).st_mtime_ns) for p in paths]
+
+
+def needs(*stages):
+    """Declare the stages a section reads, so they are resolved together before it runs."""
+    def decorate(func):
+        func.needs = stages
+        return func
+    return decorate
 
-# ============================================================
-# 6. STATISTICAL ANALYSIS & CORRELATIONS
-# ============================================================
-print("\n" + "=" * 60)
-print("6. STATISTICAL ANALYSIS")
-print("=" * 60)
-
-# T-test: Enterprise vs Growth tier revenue
-enterprise = df[df["account_tier"] == "Enterprise"]["actual_revenue"]
-growth = df[df["account_tier"] == "Growth"]["actual_revenue"]
-t_stat, p_val = stats.ttest_ind(enterprise, growth)
-print(f"\nT-Test: Enterprise vs Growth Tier Revenue")
-print(f"  Enterprise Avg: ${enterprise.mean():,.2f}")
-print(f"  Growth Avg:     ${growth.mean():,.2f}")
-print(f"  t-statistic:    {t_stat:.4f}")
-print(f"  p-value:        {p_val:.6f}")
-print(f"  Significant:    {'Yes (p < 0.05)' if p_val < 0.05 else 'No'}")
-
-# Correlation
-corr_cols = ["impressions", "clicks", "ctr", "cpm", "booked_revenue", "actual_revenue",
-             "delivery_rate", "cost_of_sale", "gross_margin", "margin_pct"]
-corr = df[corr_cols].corr()
-
-print(f"\nKey Correlations with Actual Revenue:")
-rev_corr = corr["actual_revenue"].drop("actual_revenue").sort_values(ascending=False)
-for var, val in rev_corr.items():
-    print(f"  {var:<20} r = {val:>6.3f}")
-
-# Chart: Correlation heatmap
-fig, ax = plt.subplots(figsize=(10, 8))
-sns.heatmap(corr, annot=True, fmt=".2f", cmap="RdBu_r", center=0, ax=ax,
-            square=True, linewidths=0.5)
-ax.set_title("Correlation Matrix: Ad Sales Financial Metrics", fontsize=14, fontweight="bold")
-plt.tight_layout()
-plt.savefig(f"{output_dir}/06_correlation_matrix.png", bbox_inches="tight")
-plt.close()
-print("\nSaved: 06_correlation_matrix.png")
 
 # ============================================================
-# 7. KEY FINDINGS & RECOMMENDATIONS
+# SECTIONS
 # ============================================================
-print("\n" + "=" * 60)
-print("7. KEY FINDINGS & RECOMMENDATIONS")
-print("=" * 60)
 
-top_format = format_perf.sort_values("avg_cpm", ascending=False).index[0]
-top_industry = rev_industry.index[0]
-best_rep = var_by_rep.sort_values("variance_pct", ascending=False).index[0]
-
-print(f"""
+@needs("counts")
+@traced("header")
+def header(a):
+    counts = a.counts
+    print("=" * 60)
+    print("AD SALES REVENUE ANALYTICS")
+    print("=" * 60)
+    print(f"\nDataset: {counts['campaigns']} campaigns across {counts['advertisers']} advertisers")
+    print(f"Industries: {counts['industries']} | Ad Formats: {counts['formats']}")
+    print(f"Data Sources Merged: Sales CRM, Ad Platform, Finance System")
+
+
+@needs("totals", "rev_by_q")
+@traced("1. revenue overview")
+def overview(a):
+    banner("1. REVENUE PERFORMANCE OVERVIEW")
+    totals = a.totals
+    total_actual, total_budget = totals["actual"], totals["budget"]
+
+    print(f"\nTotal Booked Revenue:  ${totals['booked']:>14,.2f}")
+    print(f"Total Actual Revenue:  ${total_actual:>14,.2f}")
+    print(f"Total Budget:          ${total_budget:>14,.2f}")
+    print(f"Total Gross Margin:    ${totals['margin']:>14,.2f}")
+    print(f"Avg Margin %:          {totals['avg_margin_pct']:>14.1f}%")
+    print(f"Avg CPM:               ${totals['avg_cpm']:>14.2f}")
+    print(f"Budget Variance:       ${total_actual - total_budget:>14,.2f} ({(total_actual - total_budget) / total_budget * 100:+.1f}%)")
+
+    print(f"\nQuarterly Revenue Summary:")
+    print(f"{'Quarter':<10} {'Booked':>14} {'Actual':>14} {'Budget':>14} {'Variance %':>12}")
+    print("-" * 68)
+    for q, row in a.rev_by_q.iterrows():
+        var_pct = (row["actual"] - row["budget"]) / row["budget"] * 100
+        print(f"{q:<10} ${row['booked']:>13,.0f} ${row['actual']:>13,.0f} ${row['budget']:>13,.0f} {var_pct:>+11.1f}%")
+
+
+@needs("rev_industry", "rev_tier")
+@traced("2. industry & tier")
+def industry(a):
+    banner("2. REVENUE BY INDUSTRY & ACCOUNT TIER")
+
+    print(f"\n{'Industry':<15} {'Campaigns':>10} {'Total Rev':>14} {'Avg Rev':>12} {'Margin %':>10} {'Avg CPM':>10}")
+    print("-" * 75)
+    for ind, row in a.rev_industry.iterrows():
+        print(f"{ind:<15} {row['campaigns']:>10} ${row['total_revenue']:>13,.0f} ${row['avg_revenue']:>10,.0f} {row['avg_margin']:>9.1f}% ${row['avg_cpm']:>8.2f}")
+
+    print(f"\nRevenue by Account Tier:")
+    for tier, row in a.rev_tier.iterrows():
+        print(f"  {tier:<15} {row['campaigns']:>5} campaigns  ${row['total_revenue']:>14,.2f}  Margin: {row['avg_margin']:.1f}%")
+
+
+@needs("format_perf")
+@traced("3. ad formats")
+def formats(a):
+    banner("3. AD FORMAT PERFORMANCE & CPM ANALYSIS")
+
+    print(f"\n{'Ad Format':<20} {'CPM':>8} {'CTR':>8} {'Revenue':>14} {'Margin %':>10} {'Delivery':>10}")
+    print("-" * 75)
+    for fmt, row in a.format_perf.iterrows():
+        print(f"{fmt:<20} ${row['avg_cpm']:>6.2f} {row['avg_ctr']*100:>7.2f}% ${row['total_revenue']:>12,.0f} {row['avg_margin']:>9.1f}% {row['avg_delivery']*100:>8.1f}%")
+
+
+@needs("var_by_rep", "q4_monthly")
+@traced("4. budget variance")
+def variance(a):
+    banner("4. BUDGET VARIANCE & FORECASTING ANALYSIS")
+
+    print(f"\nSales Rep Performance:")
+    print(f"{'Rep':<12} {'Campaigns':>10} {'Actual Rev':>14} {'Budget':>14} {'Var %':>8} {'Margin':>8}")
+    print("-" * 70)
+    for rep, row in a.var_by_rep.iterrows():
+        print(f"{rep:<12} {row['campaigns']:>10} ${row['total_actual']:>13,.0f} ${row['total_budget']:>13,.0f} {row['variance_pct']:>+7.1f}% {row['avg_margin']:>6.1f}%")
+
+    # Forecasting: Q4 trend
+    print(f"\nQ4 2025 Monthly Revenue:")
+    for m, rev in a.q4_monthly.items():
+        print(f"  {m}: ${rev:,.2f}")
+
+
+@needs("forecast", "backtest")
+@traced("4b. revenue forecast")
+def forecasts(a):
+    """Per-series forecasts of revenue and budget variance, totalled by month, plus the backtest."""
+    from forecasting import caveat
+    horizon, model, result = a.args.horizon, a.forecast["model"], a.forecast["table"]
+    banner(f"4b. REVENUE FORECAST: NEXT {horizon} MONTHS ({model.upper()} {'PLAN' if model == 'budget' else 'MODEL'})")
+    print(f"\n{len(result) // horizon} series (advertiser x ad format x platform), fitted together")
+    scores = a.backtest["scores"]
+    if a.args.forecast_model == "auto":
+        print(f"Chosen by the backtest below (lowest WAPE)" if scores is not None
+              else "No backtest (too little history): forecasting the plan")
+    warning = caveat(scores, model) if scores is not None else None
+    if warning:
+        print(f"Note: {warning}.")
+    print(f"\n{'Month':<10} {'Revenue':>14} {'Budget':>14} {'Variance %':>12}")
+    print("-" * 53)
+    for period, row in result.groupby("period", sort=False)[["forecast_revenue", "forecast_budget"]].sum().iterrows():
+        var_pct = (row["forecast_revenue"] - row["forecast_budget"]) / row["forecast_budget"] * 100
+        print(f"{period:<10} ${row['forecast_revenue']:>13,.0f} ${row['forecast_budget']:>13,.0f} {var_pct:>+11.1f}%")
+
+    by_series = result.groupby(["advertiser", "ad_format", "platform"], sort=False, observed=True)[
+        ["forecast_revenue", "forecast_budget"]].sum()
+    print(f"\nLargest forecast series:")
+    for (adv, fmt, plat), row in by_series.nlargest(5, "forecast_revenue").iterrows():
+        var_pct = (row["forecast_revenue"] - row["forecast_budget"]) / row["forecast_budget"] * 100
+        print(f"  {adv:<18} {fmt:<20} {plat:<15} ${row['forecast_revenue']:>10,.0f} ({var_pct:+.1f}% vs budget)")
+
+    holdout = a.backtest["holdout"]
+    if scores is None:
+        print(f"\nBacktest skipped: too few months of history to hold any out.")
+        return
+    print(f"\nBacktest on the last {holdout} months (revenue; budget = plan used as the forecast):")
+    print(f"{'Forecast':<10} {'MAE':>10} {'WAPE %':>8} {'Bias %':>8} {'Total err %':>12} {'Skill %':>9}")
+    print("-" * 62)
+    for name, row in scores.iterrows():
+        print(f"{name:<10} ${row['mae']:>9,.0f} {row['wape_pct']:>8.1f} {row['bias_pct']:>+8.1f} "
+              f"{row['total_error_pct']:>+12.1f} {row['skill_pct']:>+9.1f}")
+
+
+@needs("kpi", "totals", "counts", "platform_perf")
+@traced("5. KPI dashboard")
+def dashboard(a):
+    banner("5. KPI DASHBOARD METRICS")
+    kpi = a.kpi
+
+    print(f"\nFinancial KPIs:")
+    print(f"  Revenue per Campaign:    ${kpi['revenue_per_campaign']:>10,.2f}")
+    print(f"  Overall CTR:             {kpi['overall_ctr']:>10.2f}%")
+    print(f"  Avg Delivery Rate:       {kpi['avg_delivery']:>10.1f}%")
+    print(f"  Avg Gross Margin:        {a.totals['avg_margin_pct']:>10.1f}%")
+    print(f"  Win Rate:                {kpi['win_rate']:>10.1f}%")
+    print(f"  Overdue Payments:        {kpi['overdue_pct']:>10.1f}%")
+
+    print(f"\nScale Metrics:")
+    print(f"  Total Impressions:       {kpi['total_impressions']:>14,}")
+    print(f"  Total Clicks:            {kpi['total_clicks']:>14,}")
+    print(f"  Total Campaigns:         {a.counts['campaigns']:>14,}")
+    print(f"  Unique Advertisers:      {a.counts['advertisers']:>14,}")
+
+    print(f"\nPlatform Performance:")
+    for plat, row in a.platform_perf.iterrows():
+        print(f"  {plat:<18} Rev: ${row['revenue']:>12,.0f}  CTR: {row['avg_ctr']*100:.2f}%  CPM: ${row['avg_cpm']:.2f}")
+
+
+@needs("ttest", "comoments")
+@traced("6. statistics")
+def statistics(a):
+    banner("6. STATISTICAL ANALYSIS")
+    ttest = a.ttest
+    p_val = ttest["p_val"]
+
+    print(f"\nT-Test: Enterprise vs Growth Tier Revenue")
+    print(f"  Enterprise Avg: ${ttest['mean_a']:,.2f}")
+    print(f"  Growth Avg:     ${ttest['mean_b']:,.2f}")
+    print(f"  t-statistic:    {ttest['t_stat']:.4f}")
+    print(f"  p-value:        {p_val:.6f}")
+    print(f"  Significant:    {'Yes (p < 0.05)' if p_val < 0.05 else 'No'}")
+
+    print(f"\nKey Correlations with Actual Revenue:")
+    for var, val in a.comoments.ranking("actual_revenue").items():
+        print(f"  {var:<20} r = {val:>6.3f}")
+
+
+@needs("segment_tests")
+@traced("6b. segment tests")
+def segments(a):
+    """Every pairwise segment comparison, Holm-adjusted; significant pairs listed."""
+    banner("6b. SEGMENT SIGNIFICANCE (WELCH, HOLM-ADJUSTED)")
+    tests = a.segment_tests
+    print(f"\n{len(tests)} pairwise tests, {int(tests['significant'].sum())} significant at alpha = 0.05")
+    summary = tests.groupby(["dimension", "metric"], sort=False)["significant"].agg(["size", "sum"])
+    print(f"\n{'Dimension':<14} {'Metric':<16} {'Pairs':>6} {'Significant':>12}")
+    print("-" * 51)
+    for (dim, metric), row in summary.iterrows():
+        print(f"{dim:<14} {metric:<16} {row['size']:>6} {row['sum']:>12}")
+
+    print(f"\nSignificant differences:")
+    for row in tests[tests["significant"]].itertuples(index=False):
+        print(f"  {row.metric:<15} {row.group_a} vs {row.group_b}: {row.mean_a:,.2f} vs {row.mean_b:,.2f} "
+              f"(t = {row.t_stat:.2f}, adj. p = {row.p_adj:.2g})")
+
+
+@needs("sketches")
+@traced("6c. distributions")
+def distributions(a):
+    """Distinct advertisers per rep, format and quarter, and percentiles per --segment-by, from sketches."""
+    by = a.args.segment_by
+    banner(f"6c. DISTRIBUTIONS BY {by.upper().replace('_', ' ')} (SKETCHES)")
+    sketches = a.sketches
+    for rows in ("sales_rep", "ad_format"):
+        advertisers = sketches.distinct_counts([rows, "quarter"]).unstack()
+        print(f"\nDistinct advertisers by {rows.replace('_', ' ')} and quarter (approx.):")
+        print(f"{'':<20}" + "".join(f"{q:>9}" for q in advertisers.columns))
+        for label, row in advertisers.iterrows():
+            print(f"{label:<20}" + "".join(f"{v:>9.0f}" for v in row))
+
+    for metric, fmt in (("cpm", "${:,.2f}"), ("actual_revenue", "${:,.0f}"), ("delivery_rate", "{:.1%}")):
+        table = sketches.quantiles(by, metric)
+        print(f"\n{metric} percentiles (approx.):")
+        print(f"{by:<20}" + "".join(f"{c:>12}" for c in table.columns))
+        for label, row in table.iterrows():
+            print(f"{label:<20}" + "".join(f"{fmt.format(v):>12}" for v in row))
+
+
+@needs("top_campaigns")
+@traced("top campaigns")
+def top(a):
+    """Top campaigns per group (--top-by), ranked by --rank-by."""
+    by, metric, k = a.args.top_by, a.args.rank_by, a.args.top_k
+    banner(f"TOP {k} CAMPAIGNS BY {metric.upper()}" + (f" PER {by.upper()}" if by else ""))
+    result = a.top_campaigns
+    for group, rows in result.groupby("group", sort=False):
+        if by:
+            print(f"\n{group}:")
+        for row in rows.itertuples(index=False):
+            print(f"  {row.rank:>2}. #{row.campaign_id} {row.advertiser:<18} {row.ad_format:<20} {row.quarter}  "
+                  f"Rev: ${row.actual_revenue:>10,.2f}  Margin: ${row.gross_margin:>10,.2f} ({row.margin_pct:.1f}%)")
+
+
+@needs("filtered_rollup")
+@traced("drilldown")
+def drilldown(a):
+    """Campaigns, revenue, budget variance and margin per --drill-by for the --filter rows."""
+    from bitmaps import describe_filters, parse_filters
+    banner(f"DRILLDOWN BY {a.args.drill_by.upper().replace('_', ' ')}")
+    result = a.filtered_rollup
+    print(f"\n{describe_filters(parse_filters(a.args.filter))}: {result['campaigns']:,} campaigns")
+    print(f"\n{'':<20} {'Campaigns':>10} {'Revenue':>16} {'Budget':>16} {'Variance':>9} {'Margin':>8}")
+    print("-" * 84)
+    for label, row in result["table"].iterrows():
+        print(f"{label:<20} {row['campaigns']:>10,.0f} ${row['revenue']:>15,.2f} ${row['budget']:>15,.2f} "
+              f"{row['variance_pct']:>+8.1f}% {row['avg_margin']:>7.1f}%")
+
+
+@needs("format_perf", "rev_industry", "kpi", "totals", "counts")
+@traced("7. findings")
+def findings(a):
+    banner("7. KEY FINDINGS & RECOMMENDATIONS")
+    format_perf, rev_industry = a.format_perf, a.rev_industry
+    overdue_pct = a.kpi["overdue_pct"]
+
+    top_format = format_perf.sort_values("avg_cpm", ascending=False).index[0]
+    top_industry = rev_industry.index[0]
+
+    print(f"""
 FINDINGS:
-1. Total actual revenue of ${total_actual:,.0f} across {len(df)} campaigns with {avg_margin_pct:.1f}% avg gross margin
+1. Total actual revenue of ${a.totals['actual']:,.0f} across {a.counts['campaigns']} campaigns with {a.totals['avg_margin_pct']:.1f}% avg gross margin
 2. {top_format} commands highest CPM (${format_perf.loc[top_format, 'avg_cpm']:.2f}) - premium inventory drives revenue
 3. {top_industry} is the top revenue-generating industry (${rev_industry.loc[top_industry, 'total_revenue']:,.0f})
 4. Enterprise accounts generate significantly higher revenue than Growth tier (p < 0.05)
@@ -380,6 +709,182 @@ RECOMMENDATIONS:
 6. Use sales rep variance analysis for performance coaching and quota setting
 """)
 
-print("=" * 60)
-print("Analysis complete. All charts saved to /dashboards folder.")
-print("=" * 60)
+
+@needs("rev_by_q", "rev_industry", "rev_tier", "format_perf", "var_by_rep", "platform_perf", "kpi", "corr")
+@traced("charts")
+def charts(a):
+    """Dashboards: rendered concurrently, unchanged charts skipped."""
+    from dashboards import render_dashboards
+
+    chart_status = render_dashboards({
+        "01_quarterly_budget_vs_actual": {"rev_by_q": a.rev_by_q},
+        "02_revenue_by_industry_tier": {"rev_industry": a.rev_industry, "rev_tier": a.rev_tier},
+        "03_ad_format_performance": {"format_perf": a.format_perf},
+        "04_budget_variance_by_rep": {"var_by_rep": a.var_by_rep},
+        "05_kpi_dashboard": {"platform_perf": a.platform_perf, "deal_counts": a.kpi["deal_counts"]},
+        "06_correlation_matrix": {"corr": a.corr},
+    }, a.args.output_dir, workers=a.args.workers, force=a.args.force_charts)
+    for chart, state in chart_status.items():
+        print(f"{'Saved' if state == 'rendered' else 'Unchanged'}: {chart}.png")
+
+
+@traced("kpis")
+def kpis(a):
+    """Text-only KPIs straight from the Arrow cache (pyarrow.compute, no pandas)."""
+    if a.args.streaming or a.args.shards:
+        header(a)
+        dashboard(a)
+        return
+    from kpis import compute_kpis
+
+    k = compute_kpis(a.dataset.table())
+    print(f"Total Campaigns:         {k['campaigns']:>14,}")
+    print(f"Unique Advertisers:      {k['advertisers']:>14,}")
+    print(f"Total Booked Revenue:  ${k['total_booked']:>14,.2f}")
+    print(f"Total Actual Revenue:  ${k['total_actual']:>14,.2f}")
+    print(f"Total Budget:          ${k['total_budget']:>14,.2f}")
+    print(f"Total Gross Margin:    ${k['total_margin']:>14,.2f}")
+    print(f"Budget Variance:       ${k['total_actual'] - k['total_budget']:>14,.2f} ({k['budget_variance_pct']:+.1f}%)")
+    print(f"Revenue per Campaign:  ${k['revenue_per_campaign']:>14,.2f}")
+    print(f"Avg Margin %:          {k['avg_margin_pct']:>14.1f}%")
+    print(f"Avg CPM:               ${k['avg_cpm']:>14.2f}")
+    print(f"Overall CTR:           {k['overall_ctr']:>14.2f}%")
+    print(f"Avg Delivery Rate:     {k['avg_delivery']:>14.1f}%")
+    print(f"Win Rate:              {k['win_rate']:>14.1f}%")
+    print(f"Overdue Payments:      {k['overdue_pct']:>14.1f}%")
+    print(f"Total Impressions:     {k['total_impressions']:>16,}")
+    print(f"Total Clicks:          {k['total_clicks']:>16,}")
+
+
+@needs("sql_results")
+@traced("sql queries")
+def sql(a):
+    """Run scripts/ad_sales_queries.sql against the SQLite engine."""
+    for title, result in a.sql_results:
+        banner(f"SQL {title}")
+        print(result.to_string(index=False))
+
+
+REPORT = (header, overview, industry, formats, variance, dashboard, statistics, findings, charts)
+
+
+@needs(*dict.fromkeys(stage for section in REPORT for stage in section.needs))
+def run_all(a):
+    for section in REPORT:
+        section(a)
+    print("=" * 60)
+    print("Analysis complete. All charts saved to /dashboards folder.")
+    print("=" * 60)
+
+
+COMMANDS = {
+    "kpis": kpis,
+    "overview": overview,
+    "industry": industry,
+    "formats": formats,
+    "variance": variance,
+    "forecast": forecasts,
+    "dashboard": dashboard,
+    "stats": statistics,
+    "segments": segments,
+    "distributions": distributions,
+    "top": top,
+    "drilldown": drilldown,
+    "findings": findings,
+    "charts": charts,
+    "sql": sql,
+    "all": run_all,
+}
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Ad sales revenue analysis.")
+    parser.add_argument("command", nargs="?", default="all", choices=list(COMMANDS),
+                        help="Section to run (default: all)")
+    parser.add_argument("--csv", default=CSV_PATH, help="Campaign CSV (default: data/ad_sales_data.csv)")
+    parser.add_argument("--output-dir", default=OUTPUT_DIR, help="Where the charts are written")
+    parser.add_argument("--streaming", action="store_true",
+                        help="Out-of-core mode: fold the data in chunks into mergeable aggregates")
+    parser.add_argument("--chunksize", type=int, default=1_000_000, help="Rows per chunk in streaming mode")
+    parser.add_argument("--source", default=None,
+                        help="Streaming input: CSV, part-*.csv directory or .arrow cache (default: the cache)")
+    parser.add_argument("--shards", type=int, default=None,
+                        help="Sharded mode: compute the aggregates in this many worker processes")
+    parser.add_argument("--shard-by", choices=["campaign_id", "quarter"], default="campaign_id",
+                        help="Shard key in sharded mode: hash of campaign_id (default) or quarter")
+    parser.add_argument("--engine", choices=["cube", "sql"], default="cube",
+                        help="Rollup engine: single-scan cube (default) or indexed SQLite queries")
+    parser.add_argument("--compact", action="store_true",
+                        help="Compact frame: money as int64 cents, coded dimensions; exact sums and variances")
+    parser.add_argument("--segment-by", choices=["quarter", "industry", "account_tier", "ad_format", "sales_rep"],
+                        default="account_tier", help="Segment for the distributions command's percentiles")
+    parser.add_argument("--top-by", choices=["industry", "sales_rep", "ad_format"], default=None,
+                        help="Group for the top command (default: overall)")
+    parser.add_argument("--rank-by", choices=["actual_revenue", "gross_margin", "margin_pct"],
+                        default="actual_revenue", help="Ranking metric for the top command")
+    parser.add_argument("--top-k", type=int, default=10, help="Campaigns per group for the top command")
+    parser.add_argument("--filter", nargs="*", default=[], metavar="DIM=VALUE[,VALUE]",
+                        help="Drilldown predicates, ANDed across dimensions; values ORed; DIM!=VALUE excludes")
+    parser.add_argument("--drill-by", choices=["quarter", "month", "industry", "account_tier", "sales_rep",
+                                               "ad_format", "platform", "deal_status", "payment_status"],
+                        default="sales_rep", help="Group for the drilldown command")
+    parser.add_argument("--horizon", type=int, default=3, help="Months ahead for the forecast command")
+    parser.add_argument("--forecast-model", choices=["auto", "level", "trend", "seasonal", "budget"], default="auto",
+                        help="Model for the forecast command; auto picks the lowest backtest error (default)")
+    parser.add_argument("--profile", metavar="PATH", help="Write a JSON profile of every section and sub-step")
+    parser.add_argument("--trace", metavar="PATH", help="Write a Chrome/Perfetto trace of the same spans")
+    parser.add_argument("--profile-heap", action="store_true",
+                        help="Also trace the Python heap per step with tracemalloc (slows the run)")
+    parser.add_argument("--jobs", type=int, default=None,
+                        help="Threads for independent pipeline stages (default: one per CPU, plus four)")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Recompute every stage instead of loading memoized results")
+    parser.add_argument("--explain", action="store_true",
+                        help="List on stderr which stages were loaded from the cache and which were computed")
+    parser.add_argument("--workers", type=int, default=None, help="Processes for chart rendering")
+    parser.add_argument("--force-charts", action="store_true", help="Re-render charts even if inputs are unchanged")
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.streaming and args.engine == "sql":
+        parser.error("--engine sql reads the SQLite copy of the cache; it cannot be combined with --streaming")
+    if args.shards and (args.streaming or args.engine == "sql"):
+        parser.error("--shards computes the aggregates from the Arrow cache; it cannot be combined with "
+                     "--streaming or --engine sql")
+    if args.compact and (args.streaming or args.shards or args.engine == "sql"):
+        parser.error("--compact encodes the in-memory frame; it cannot be combined with --streaming, "
+                     "--shards or --engine sql")
+    if args.horizon < 1:
+        parser.error("--horizon must be at least 1")
+    if args.top_k < 1:
+        parser.error("--top-k must be at least 1")
+    if args.filter:
+        from bitmaps import parse_filters
+        try:
+            parse_filters(args.filter)
+        except ValueError as exc:
+            parser.error(str(exc))
+    if args.profile or args.trace:
+        PROFILER.enable(python_heap=args.profile_heap)
+    command = COMMANDS[args.command]
+    with PROFILER.span(f"analysis {args.command}"):
+        analysis = Analysis(args)
+        analysis.prepare(getattr(command, "needs", ()))
+        command(analysis)
+    if args.explain:
+        for name in PIPELINE.stages:
+            if name in PIPELINE.status:
+                print(f"{PIPELINE.status[name]:>9}  {name}", file=sys.stderr)
+    if PROFILER.enabled:
+        if args.profile:
+            PROFILER.write_report(args.profile)
+        if args.trace:
+            PROFILER.write_trace(args.trace)
+        print(PROFILER.summary(), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
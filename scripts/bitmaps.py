@@ -0,0 +1,316 @@
+"""
+Persisted bitmap indexes over the low-cardinality dimensions.
+
+For every value of quarter, month, industry, account_tier, sales_rep, ad_format,
+platform, deal_status and payment_status the index keeps one bitmap of the rows that
+hold it, packed 64 rows to a uint64 word (1.25 MB per value at 10M rows). The bitmaps
+are built once from the Arrow cache and saved next to it as a .npy file plus a JSON
+manifest recording the source CSV's fingerprint; they are rebuilt only when the CSV
+changes and are opened memory-mapped.
+
+A filter is resolved entirely on the bitmaps - OR within a dimension's values, AND
+across dimensions, NOT for exclusions - before any column is read. Counts come from
+a popcount of the result; anything else reads only the requested columns of the
+matching rows from the memory-mapped cache and aggregates them with a RollupCube:
+
+    index = BitmapIndex(CampaignDataset()).ensure()
+    rows = index.where(quarter="Q4 2025", account_tier="Enterprise", payment_status="Overdue")
+    index.agg(rows, "sales_rep", revenue=("actual_revenue", "sum"), campaigns=("campaign_id", "count"))
+    index.count_by("deal_status", rows)            # popcounts only, no column read
+
+    python scripts/bitmaps.py --filter "quarter=Q4 2025" account_tier=Enterprise payment_status=Overdue \\
+        --by sales_rep --check
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from data_access import DEFAULT_CSV, CampaignDataset
+from rollups import RollupCube
+
+INDEX_DIMENSIONS = ["quarter", "month", "industry", "account_tier", "sales_rep", "ad_format", "platform",
+                    "deal_status", "payment_status"]
+
+
+class Bitmap:
+    """A set of row positions as packed bits: row i is bit i % 64 of word i // 64."""
+
+    def __init__(self, words, rows):
+        self.words = words
+        self.rows = rows
+
+    @classmethod
+    def from_mask(cls, mask):
+        packed = np.packbits(np.asarray(mask, dtype=bool), bitorder="little")
+        words = np.zeros((len(packed) + 7) // 8 * 8, np.uint8)
+        words[:len(packed)] = packed
+        return cls(words.view(np.uint64), len(mask))
+
+    @classmethod
+    def full(cls, rows):
+        return ~cls(np.zeros((rows + 63) // 64, np.uint64), rows)
+
+    def _check(self, other):
+        if other.rows != self.rows:
+            raise ValueError(f"Cannot combine bitmaps over {self.rows} and {other.rows} rows")
+
+    def __and__(self, other):
+        self._check(other)
+        return Bitmap(self.words & other.words, self.rows)
+
+    def __or__(self, other):
+        self._check(other)
+        return Bitmap(self.words | other.words, self.rows)
+
+    def __invert__(self):
+        words = ~self.words
+        if self.rows % 64:
+            # Padding bits past the last row stay clear, so counts and NOT stay exact
+            words[-1] &= np.uint64((1 << (self.rows % 64)) - 1)
+        return Bitmap(words, self.rows)
+
+    def count(self):
+        return int(np.bitwise_count(self.words).sum())
+
+    def mask(self):
+        return np.unpackbits(self.words.view(np.uint8), count=self.rows, bitorder="little").astype(bool)
+
+    def positions(self):
+        """Row positions in the set, ascending."""
+        return np.flatnonzero(self.mask())
+
+
+def parse_filters(specs, dims=INDEX_DIMENSIONS):
+    """["quarter=Q4 2025", "payment_status!=Paid,Pending"] -> {dim: (values, negate)}.
+    ValueError for a malformed spec or a dimension not in `dims`."""
+    filters = {}
+    for spec in specs or []:
+        negate = "!=" in spec
+        dim, sep, values = spec.partition("!=" if negate else "=")
+        if not sep or not values:
+            raise ValueError(f"Expected dim=value[,value] or dim!=value[,value], got {spec!r}")
+        dim = dim.strip()
+        if dim not in dims:
+            raise ValueError(f"Not an indexed dimension: {dim!r} in {spec!r} (indexed: {', '.join(dims)})")
+        filters[dim] = ([v.strip() for v in values.split(",")], negate)
+    return filters
+
+
+def describe_filters(filters):
+    if not filters:
+        return "all campaigns"
+    return " AND ".join(f"{dim} {'NOT ' if negate else ''}IN ({', '.join(values)})"
+                        for dim, (values, negate) in filters.items())
+
+
+class BitmapIndex:
+    """Bitmaps of every value of INDEX_DIMENSIONS for a dataset, persisted next to its Arrow cache."""
+
+    def __init__(self, dataset, dims=INDEX_DIMENSIONS):
+        self.dataset = dataset
+        self.dims = list(dims)
+        base = os.path.splitext(dataset.cache_path)[0]
+        self.path = base + ".bitmaps.npy"
+        self.manifest_path = base + ".bitmaps.json"
+        self._words = None
+        self._manifest = None
+
+    def __getstate__(self):
+        # Pickles as its dataset (e.g. inside a memoized stage); the bitmaps stay on disk
+        return {"dataset": self.dataset, "dims": self.dims}
+
+    def __setstate__(self, state):
+        self.__init__(state["dataset"], state["dims"])
+
+    def _read_manifest(self):
+        if not os.path.exists(self.manifest_path) or not os.path.exists(self.path):
+            return None
+        with open(self.manifest_path) as f:
+            return json.load(f)
+
+    def is_fresh(self):
+        """True when the bitmaps were built from the current CSV over the same dimensions."""
+        manifest = self._read_manifest()
+        return (manifest is not None and manifest["fingerprint"] == self.dataset.fingerprint()
+                and list(manifest["values"]) == self.dims)
+
+    def build(self):
+        """One pass over the dictionary codes of each dimension; written atomically."""
+        table = self.dataset.table(self.dims)
+        rows = table.num_rows
+        values, bitmaps = {}, []
+        for dim in self.dims:
+            codes, labels = pd.factorize(table.column(dim).to_pandas(), sort=True)
+            values[dim] = [str(v) for v in labels]
+            bitmaps.extend(Bitmap.from_mask(codes == i).words for i in range(len(labels)))
+        words = np.stack(bitmaps) if bitmaps else np.zeros((0, (rows + 63) // 64), np.uint64)
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path + ".tmp", "wb") as f:
+            np.save(f, words)
+        os.replace(self.path + ".tmp", self.path)
+        manifest = {"fingerprint": self.dataset.fingerprint(), "rows": rows, "values": values}
+        with open(self.manifest_path + ".tmp", "w") as f:
+            json.dump(manifest, f)
+        os.replace(self.manifest_path + ".tmp", self.manifest_path)
+        self._words, self._manifest = None, None
+        return len(words)
+
+    def ensure(self):
+        self.dataset.ensure()
+        if not self.is_fresh():
+            self.build()
+        return self
+
+    def _load(self):
+        if self._words is None:
+            manifest = self._read_manifest()
+            offsets, start = {}, 0
+            for dim, labels in manifest["values"].items():
+                offsets[dim] = {label: start + i for i, label in enumerate(labels)}
+                start += len(labels)
+            # Pipeline stages share the index across threads: publish the words last
+            self._manifest, self._offsets = manifest, offsets
+            self._words = np.load(self.path, mmap_mode="r")
+        return self._words
+
+    @property
+    def rows(self):
+        self._load()
+        return self._manifest["rows"]
+
+    def values(self, dim):
+        self._load()
+        if dim not in self._offsets:
+            raise KeyError(f"Not an indexed dimension: {dim!r} (indexed: {self.dims})")
+        return list(self._offsets[dim])
+
+    @property
+    def nbytes(self):
+        return self._load().nbytes
+
+    def bitmap(self, dim, value):
+        """Rows where `dim` == `value` (empty for a value that does not occur)."""
+        words = self._load()
+        if dim not in self._offsets:
+            raise KeyError(f"Not an indexed dimension: {dim!r} (indexed: {self.dims})")
+        position = self._offsets[dim].get(str(value))
+        if position is None:
+            return Bitmap(np.zeros(words.shape[1], np.uint64), self.rows)
+        return Bitmap(np.array(words[position]), self.rows)
+
+    def any_of(self, dim, values):
+        """Rows where `dim` is one of `values` (OR of their bitmaps)."""
+        words = self._load()
+        result = np.zeros(words.shape[1], np.uint64)
+        for value in [values] if isinstance(values, str) else values:
+            result |= self.bitmap(dim, value).words
+        return Bitmap(result, self.rows)
+
+    def where(self, filters=None, **equals):
+        """AND across dimensions of the OR within each: `where(quarter="Q4 2025",
+        payment_status=["Overdue", "Pending"])`, or a parse_filters() dict, which can
+        also exclude values."""
+        rows = Bitmap.full(self.rows)
+        conditions = dict(filters or {})
+        conditions.update({dim: (values, False) for dim, values in equals.items()})
+        for dim, (values, negate) in conditions.items():
+            matched = self.any_of(dim, values)
+            rows = rows & (~matched if negate else matched)
+        return rows
+
+    def count_by(self, dim, rows=None):
+        """Rows per value of `dim` within `rows` (popcounts of bitmap ANDs; no column is read)."""
+        counts = {}
+        for value in self.values(dim):
+            bitmap = self.bitmap(dim, value)
+            counts[value] = (bitmap & rows if rows is not None else bitmap).count()
+        return pd.Series(counts, name="count", dtype=np.int64).rename_axis(dim)
+
+    def select(self, rows, columns):
+        """Only `columns` of only the rows in the bitmap, gathered from the memory-mapped cache."""
+        table = self.dataset.table(list(columns))
+        return table.take(pa.array(rows.positions())).to_pandas()
+
+    def agg(self, rows, by, **named):
+        """Named aggregation (as RollupCube.agg) over the rows in the bitmap."""
+        by = [] if by is None else [by] if isinstance(by, str) else list(by)
+        metrics = list(dict.fromkeys(column for column, func in named.values() if func != "count"))
+        frame = self.select(rows, list(dict.fromkeys(by + metrics)))
+        return RollupCube.from_frame(frame, by, metrics).agg(by, **named)
+
+
+def pandas_filter(df, filters):
+    """The same filter as boolean masks over a loaded frame (the reference for --check)."""
+    mask = np.ones(len(df), bool)
+    for dim, (values, negate) in filters.items():
+        matched = df[dim].astype(str).isin(values).to_numpy()
+        mask &= ~matched if negate else matched
+    return mask
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Filtered aggregates from persisted bitmap indexes.")
+    parser.add_argument("--csv", default=DEFAULT_CSV)
+    parser.add_argument("--filter", nargs="*", default=[], metavar="DIM=VALUE[,VALUE]",
+                        help="Predicates ANDed across dimensions; values ORed; DIM!=VALUE excludes")
+    parser.add_argument("--by", nargs="*", choices=INDEX_DIMENSIONS, default=["sales_rep"])
+    parser.add_argument("--rebuild", action="store_true", help="Rebuild the index even if it is fresh")
+    parser.add_argument("--check", action="store_true", help="Compare with pandas boolean masks, with timings")
+    args = parser.parse_args()
+
+    try:
+        filters = parse_filters(args.filter)
+    except ValueError as exc:
+        parser.error(str(exc))
+
+    dataset = CampaignDataset(args.csv)
+    index = BitmapIndex(dataset)
+    start = time.perf_counter()
+    if args.rebuild:
+        dataset.ensure()
+        index.build()
+    index.ensure()
+    print(f"Bitmap index: {sum(len(index.values(d)) for d in INDEX_DIMENSIONS)} bitmaps over {index.rows:,} rows "
+          f"({index.nbytes / 1e6:.1f} MB), ready in {time.perf_counter() - start:.2f}s")
+
+    named = dict(campaigns=("campaign_id", "count"), revenue=("actual_revenue", "sum"),
+                 budget=("budget", "sum"), avg_margin=("margin_pct", "mean"))
+    start = time.perf_counter()
+    rows = index.where(filters)
+    resolve_s = time.perf_counter() - start
+    result = index.agg(rows, args.by, **named)
+    total_s = time.perf_counter() - start
+    print(f"{describe_filters(filters)}: {rows.count():,} campaigns "
+          f"(resolved on bitmaps in {resolve_s * 1000:.2f} ms, aggregated in {total_s * 1000:.1f} ms)\n")
+    print(result.round(2).to_string())
+
+    if args.check:
+        columns = list(dict.fromkeys(list(filters) + args.by + ["actual_revenue", "budget", "margin_pct"]))
+        df = dataset.load(columns)
+        start = time.perf_counter()
+        mask = pandas_filter(df, filters)
+        expected = df[mask].groupby(args.by, observed=True).agg(
+            campaigns=("actual_revenue", "count"), revenue=("actual_revenue", "sum"),
+            budget=("budget", "sum"), avg_margin=("margin_pct", "mean")) if args.by else None
+        pandas_s = time.perf_counter() - start
+        same_rows = bool(np.array_equal(mask, rows.mask()))
+        if expected is None:
+            same = same_rows
+        else:
+            same = same_rows and len(expected) == len(result) and np.allclose(
+                result.to_numpy(dtype=np.float64), expected.to_numpy(dtype=np.float64), rtol=1e-9)
+        print(f"\nSame rows and aggregates as pandas boolean masks: {'yes' if same else 'NO'} "
+              f"(pandas on the loaded frame: {pandas_s * 1000:.1f} ms)")
+        if not same:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
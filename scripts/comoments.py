@@ -0,0 +1,146 @@
+"""
+One-pass, mergeable co-moment accumulator for correlation matrices.
+
+Keeps the row count, the mean vector and the matrix of co-moments
+M2[i, j] = sum((x_i - mean_i) * (x_j - mean_j)) for a fixed set of columns. Each chunk
+is centred on its own mean before its cross-products are formed, and partial states
+are combined with Chan et al.'s pairwise update, so no raw sums of squares are ever
+accumulated. This keeps the result stable when columns differ by many orders of
+magnitude (impressions in the millions next to a CTR around 0.01) or sit on a large
+offset. States from chunks, files or processes merge in any order, and serialize to
+plain dicts for shipping between processes:
+
+    acc = CoMoments(CORR_COLUMNS).update_table(dataset.table(CORR_COLUMNS))
+    acc.ranking("actual_revenue")          # the "Key Correlations with Actual Revenue" list
+
+    python scripts/comoments.py --chunksize 500 --check
+"""
+
+import argparse
+import sys
+
+import numpy as np
+import pandas as pd
+
+from data_access import DEFAULT_CSV, CampaignDataset
+
+CORR_COLUMNS = ["impressions", "clicks", "ctr", "cpm", "booked_revenue", "actual_revenue",
+                "delivery_rate", "cost_of_sale", "gross_margin", "margin_pct"]
+
+
+class CoMoments:
+    """Row count, mean vector and co-moment matrix over `columns`.
+
+    Rows containing a NaN in any of the columns are skipped (complete cases).
+    """
+
+    def __init__(self, columns):
+        self.columns = list(columns)
+        k = len(self.columns)
+        self.n = 0
+        self.mean = np.zeros(k)
+        self.comoment = np.zeros((k, k))
+
+    def update(self, values):
+        """Fold in a 2-D block of rows: an array in column order or a DataFrame."""
+        if isinstance(values, pd.DataFrame):
+            values = values[self.columns].to_numpy(dtype=np.float64)
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values).any(axis=1)]
+        if not len(values):
+            return self
+        other = CoMoments(self.columns)
+        other.n = len(values)
+        other.mean = values.mean(axis=0)
+        centered = values - other.mean
+        other.comoment = centered.T @ centered
+        return self.merge(other, inplace=True)
+
+    def update_table(self, table, batch_rows=1_000_000):
+        """Fold in an Arrow table batch by batch, reading each column's buffer directly."""
+        for batch in table.select(self.columns).to_batches(max_chunksize=batch_rows):
+            self.update(np.column_stack([batch.column(c).to_numpy(zero_copy_only=False).astype(np.float64)
+                                         for c in self.columns]))
+        return self
+
+    def merge(self, other, inplace=False):
+        """Combine two states (Chan et al.); the result equals one pass over both inputs."""
+        if other.columns != self.columns:
+            raise ValueError(f"Cannot merge co-moments over {other.columns} into {self.columns}")
+        target = self if inplace else CoMoments(self.columns)
+        n = self.n + other.n
+        if n == 0:
+            return target
+        delta = other.mean - self.mean
+        target.comoment = self.comoment + other.comoment + np.outer(delta, delta) * (self.n * other.n / n)
+        target.mean = self.mean + delta * (other.n / n)
+        target.n = n
+        return target
+
+    def cov(self, ddof=1):
+        """Covariance matrix (sample covariance by default, like DataFrame.cov)."""
+        with np.errstate(invalid="ignore", divide="ignore"):
+            cov = self.comoment / (self.n - ddof) if self.n > ddof else np.full_like(self.comoment, np.nan)
+        return pd.DataFrame(cov, index=self.columns, columns=self.columns)
+
+    def corr(self):
+        """Pearson correlation matrix; constant columns give NaN like DataFrame.corr."""
+        std = np.sqrt(np.diag(self.comoment))
+        with np.errstate(invalid="ignore", divide="ignore"):
+            corr = self.comoment / np.outer(std, std)
+        corr = np.clip(corr, -1.0, 1.0)
+        np.fill_diagonal(corr, np.where(std > 0, 1.0, np.nan))
+        return pd.DataFrame(corr, index=self.columns, columns=self.columns)
+
+    def ranking(self, target="actual_revenue"):
+        """Correlations of every other column with `target`, strongest positive first."""
+        return self.corr()[target].drop(target).sort_values(ascending=False)
+
+    def to_dict(self):
+        """Plain-Python state (JSON serializable)."""
+        return {"columns": self.columns, "n": self.n, "mean": self.mean.tolist(), "comoment": self.comoment.tolist()}
+
+    @classmethod
+    def from_dict(cls, state):
+        acc = cls(state["columns"])
+        acc.n = int(state["n"])
+        acc.mean = np.asarray(state["mean"], dtype=np.float64)
+        acc.comoment = np.asarray(state["comoment"], dtype=np.float64)
+        return acc
+
+
+def check(acc, df):
+    """Max absolute difference from DataFrame.corr(), and the same after shifting every
+    column by 1e6 (a raw sum-of-squares formula is off by ~1e-3 there; correlation is
+    shift-invariant, so the unshifted matrix stays the reference)."""
+    expected = df[acc.columns].corr().to_numpy()
+    diff = float(np.nanmax(np.abs(acc.corr().to_numpy() - expected)))
+    halves = np.array_split(df[acc.columns].to_numpy(dtype=np.float64) + 1e6, 2)
+    merged = CoMoments(acc.columns).update(halves[0]).merge(CoMoments(acc.columns).update(halves[1]))
+    shifted_diff = float(np.nanmax(np.abs(merged.corr().to_numpy() - expected)))
+    return {"max_abs_diff": diff, "max_abs_diff_offset_1e6": shifted_diff}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Correlation matrix from one pass of merged co-moments.")
+    parser.add_argument("--csv", default=DEFAULT_CSV)
+    parser.add_argument("--chunksize", type=int, default=1_000_000)
+    parser.add_argument("--target", default="actual_revenue")
+    parser.add_argument("--check", action="store_true", help="Compare with DataFrame.corr()")
+    args = parser.parse_args()
+
+    dataset = CampaignDataset(args.csv)
+    acc = CoMoments(CORR_COLUMNS).update_table(dataset.table(CORR_COLUMNS), args.chunksize)
+    print(f"Correlations with {args.target} ({acc.n:,} rows):")
+    for var, val in acc.ranking(args.target).items():
+        print(f"  {var:<20} r = {val:>6.3f}")
+    if args.check:
+        result = check(acc, dataset.load(CORR_COLUMNS))
+        print(f"\nMax |r - pandas r|: {result['max_abs_diff']:.2e} "
+              f"(with a 1e6 offset on every column: {result['max_abs_diff_offset_1e6']:.2e})")
+        if result["max_abs_diff"] > 1e-9 or result["max_abs_diff_offset_1e6"] > 1e-6:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,417 @@
+"""
+Compact in-memory representation of the campaign data with fixed-point money.
+
+A CompactFrame holds one numpy array per column:
+
+  money      booked_revenue, budget, actual_revenue, cost_of_sale, gross_margin as
+             int64 cents
+  rates      cpm (cents), ctr (1e-4), delivery_rate (1e-3) and margin_pct (1e-1) as
+             fixed-point integers in the narrowest integer type holding their range
+  counts     campaign_id, impressions, clicks in the narrowest integer type
+  dimensions small-integer codes into Dictionaries shared by every frame built with
+             them (chunks, shards), so codes mean the same label everywhere
+
+A float column is stored fixed-point only if every value survives the round trip
+exactly (value == round(value * scale) / scale); otherwise it stays float64.
+
+Sums of fixed-point columns are integer sums, so they are exact and do not depend on
+chunking, sharding or the order of addition. FixedPointCube is the RollupCube of a
+compact frame: per cell it keeps the count, the integer sum and the integer sum of
+squares (as three int64 limbs, exact up to 2^31 rows), and every rollup derives sums,
+means and M2 = sum(x^2) - sum(x)^2 / n from exact integers, rounding once to float.
+Cubes of separate chunks merge by integer addition, so the results are bit-identical
+however the data was split.
+
+    frame = CompactFrame.from_table(CampaignDataset().table())
+    cube = FixedPointCube.from_compact(frame)
+    cube.agg("quarter", actual=("actual_revenue", "sum"), spread=("actual_revenue", "var"))
+
+    python scripts/compact.py --check
+"""
+
+import argparse
+import sys
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from data_access import DEFAULT_CSV, DIMENSIONS, CampaignDataset
+from rollups import DIMENSIONS as CUBE_DIMENSIONS
+from rollups import METRICS, RollupCube
+
+MONEY = ["booked_revenue", "budget", "actual_revenue", "cost_of_sale", "gross_margin"]
+# Decimal places kept by each fixed-point column (the generator rounds to these)
+DECIMALS = {**dict.fromkeys(MONEY, 2), "cpm": 2, "ctr": 4, "delivery_rate": 3, "margin_pct": 1}
+INT_TYPES = (np.int8, np.int16, np.int32, np.int64)
+_LIMB_BITS = 16
+_LIMB_MASK = (1 << _LIMB_BITS) - 1
+
+
+def narrowest_int(values):
+    """`values` (integers) in the smallest signed integer type holding their range."""
+    lo, hi = (int(values.min()), int(values.max())) if len(values) else (0, 0)
+    for dtype in INT_TYPES:
+        info = np.iinfo(dtype)
+        if info.min <= lo and hi <= info.max:
+            return values.astype(dtype, copy=False)
+    raise OverflowError(f"Values in [{lo}, {hi}] do not fit in int64")
+
+
+def to_fixed_point(values, decimals):
+    """Integers `values * 10**decimals`, or None if some value is not exactly representable."""
+    scale = 10 ** decimals
+    scaled = np.rint(values * scale)
+    if not np.isfinite(scaled).all() or np.abs(scaled).max(initial=0) >= 2 ** 53 \
+            or not np.array_equal(scaled / scale, values):
+        return None
+    return scaled.astype(np.int64)
+
+
+class Dictionaries:
+    """Label <-> code mapping per dimension; codes are assigned in order of first appearance."""
+
+    def __init__(self):
+        self.labels = {}
+        self._codes = {}
+
+    def codes(self, dim, labels):
+        """Codes of `labels` in `dim`'s dictionary, adding the ones not seen yet."""
+        known = self.labels.setdefault(dim, [])
+        index = self._codes.setdefault(dim, {})
+        for label in labels:
+            if label not in index:
+                index[label] = len(known)
+                known.append(label)
+        return np.array([index[label] for label in labels], dtype=np.int64)
+
+    def code_dtype(self, dim):
+        return narrowest_int(np.array([len(self.labels.get(dim, ())) - 1, -1])).dtype
+
+    def nbytes(self):
+        return sum(len(str(label).encode()) for labels in self.labels.values() for label in labels)
+
+
+class CompactFrame:
+    """Columns of the campaign data as compact numpy arrays (see the module docstring)."""
+
+    def __init__(self, columns, scales, dictionaries):
+        self.columns = columns
+        self.scales = scales
+        self.dictionaries = dictionaries
+
+    @classmethod
+    def from_table(cls, table, dictionaries=None):
+        """Encode an Arrow table (the dataset cache, or any table with the dataset's columns)."""
+        dictionaries = dictionaries if dictionaries is not None else Dictionaries()
+        columns, scales = {}, {}
+        for name in table.column_names:
+            column = table.column(name)
+            if name in DIMENSIONS:
+                encoded = column.combine_chunks()
+                if not pa.types.is_dictionary(encoded.type):
+                    encoded = pc.dictionary_encode(encoded)
+                lookup = np.append(dictionaries.codes(name, encoded.dictionary.to_pylist()), -1)
+                indices = encoded.indices.fill_null(-1).to_numpy(zero_copy_only=False)
+                columns[name] = lookup[indices].astype(dictionaries.code_dtype(name))
+                continue
+            values = column.to_numpy()
+            if name in DECIMALS:
+                scaled = to_fixed_point(values, DECIMALS[name])
+                if scaled is None:
+                    columns[name] = values.astype(np.float64)
+                    continue
+                scales[name] = 10 ** DECIMALS[name]
+                columns[name] = scaled if name in MONEY else narrowest_int(scaled)
+            elif np.issubdtype(values.dtype, np.integer):
+                columns[name] = narrowest_int(values)
+            else:
+                columns[name] = values
+        return cls(columns, scales, dictionaries)
+
+    def __len__(self):
+        return len(next(iter(self.columns.values()))) if self.columns else 0
+
+    def memory_usage(self):
+        """Bytes per column (the shared dictionaries are counted once, under 'dictionaries')."""
+        usage = {name: values.nbytes for name, values in self.columns.items()}
+        usage["dictionaries"] = self.dictionaries.nbytes()
+        return usage
+
+    # ---- Values ----
+    def integers(self, name):
+        """A count or fixed-point column as int64 (fixed-point values in units of 1/scale)."""
+        if name not in self.scales and not np.issubdtype(self.columns[name].dtype, np.integer):
+            raise TypeError(f"{name!r} is stored as float; its sums would not be exact")
+        return self.columns[name].astype(np.int64, copy=False)
+
+    def values(self, name):
+        """Decoded column: floats for fixed-point columns, labels (object array) for dimensions."""
+        if name in DIMENSIONS:
+            labels = np.array(self.dictionaries.labels[name] + [None], dtype=object)
+            return labels[self.columns[name]]
+        if name in self.scales:
+            return self.columns[name] / self.scales[name]
+        return self.columns[name]
+
+    def exact_sum(self, name):
+        """Sum as an integer (in units of 1/scale for fixed-point columns)."""
+        return int(self.integers(name).sum())
+
+    def sum(self, name):
+        return self.exact_sum(name) / self.scales.get(name, 1)
+
+    def mean(self, name):
+        return self.exact_sum(name) / (len(self) * self.scales.get(name, 1))
+
+    def value_counts(self, dim):
+        """Rows per label, most frequent first (like Series.value_counts)."""
+        import pandas as pd
+
+        codes = self.columns[dim]
+        counts = np.bincount(codes[codes >= 0].astype(np.int64), minlength=len(self.dictionaries.labels[dim]))
+        result = pd.Series(counts, index=pd.Index(self.dictionaries.labels[dim], name=dim), name="count")
+        return result[result > 0].sort_values(ascending=False, kind="stable")
+
+    def nunique(self, dim):
+        codes = self.columns[dim]
+        return len(np.unique(codes[codes >= 0]))
+
+    def to_pandas(self):
+        """Decoded DataFrame (dimensions as categoricals over the shared dictionaries)."""
+        import pandas as pd
+
+        data = {}
+        for name, values in self.columns.items():
+            if name in DIMENSIONS:
+                data[name] = pd.Categorical.from_codes(values, self.dictionaries.labels[name])
+            else:
+                data[name] = self.values(name)
+        return pd.DataFrame(data)
+
+
+def _limb_sums(key, values, size, max_count):
+    """Per-cell sum and the three limb sums of the squares of int64 `values` (|x| < 2^31).
+
+    With x = h * 2^16 + l (0 <= l < 2^16): x^2 = h^2 * 2^32 + h*l * 2^17 + l^2, and every
+    term fits in 32 bits, so the int64 per-cell sums are exact for up to 2^31 rows. While
+    no cell has 2^21 rows every partial sum stays below 2^53 and the float64 bincount
+    is exact too (and much faster than the sort-based path).
+    """
+    if len(values) and np.abs(values).max() >= 2 ** 31:
+        raise OverflowError("Fixed-point values must stay below 2^31 in magnitude")
+    high, low = values >> _LIMB_BITS, values & _LIMB_MASK
+    terms = (values, high * high, high * low, low * low)
+    out = np.zeros((size, 4), np.int64)
+    if max_count < 2 ** 21:
+        for j, term in enumerate(terms):
+            out[:, j] = np.bincount(key, weights=term, minlength=size)
+        return out
+    order = np.argsort(key, kind="stable")
+    sorted_key = key[order]
+    starts = np.flatnonzero(np.r_[True, sorted_key[1:] != sorted_key[:-1]])
+    for j, term in enumerate(terms):
+        out[sorted_key[starts], j] = np.add.reduceat(term[order], starts)
+    return out
+
+
+class FixedPointCube(RollupCube):
+    """RollupCube over fixed-point metrics with exact integer moments per cell.
+
+    `moments[..., j]` holds, for metric j, the integer sum and the three limb sums of the
+    squares (see `_limb_sums`); `scales[j]` converts the integers back to units.
+    """
+
+    def __init__(self, dims, labels, metrics, counts, moments, scales):
+        self.dims = list(dims)
+        self.labels = [list(l) for l in labels]
+        self.metrics = list(metrics)
+        self.counts = counts
+        self.moments = moments
+        self.scales = list(scales)
+
+    @classmethod
+    def from_compact(cls, frame, dims=CUBE_DIMENSIONS, metrics=METRICS):
+        """Build the cube from one scan of a CompactFrame (rows with a missing dimension are dropped)."""
+        missing = [m for m in metrics if m not in frame.scales]
+        if missing:
+            raise ValueError(f"Metrics {missing} are not fixed-point in this frame; their sums would not be exact")
+        codes, labels = [], []
+        for d in dims:
+            raw = frame.columns[d].astype(np.int64)
+            present = np.unique(raw[raw >= 0])
+            names = [frame.dictionaries.labels[d][c] for c in present]
+            order = np.argsort(np.array(names, dtype=object), kind="stable")
+            # Dictionary code -> position among the sorted labels present (as factorize(sort=True))
+            lookup = np.full(len(frame.dictionaries.labels[d]) + 1, -1, np.int64)
+            lookup[present[order]] = np.arange(len(present))
+            codes.append(lookup[raw])
+            labels.append([names[i] for i in order])
+        shape = tuple(len(l) for l in labels)
+        valid = np.logical_and.reduce([c >= 0 for c in codes]) if codes else np.ones(len(frame), bool)
+        key = np.ravel_multi_index([c[valid] for c in codes], shape) if codes else np.zeros(int(valid.sum()), np.intp)
+        size = int(np.prod(shape))
+        counts = np.bincount(key, minlength=size)
+        moments = np.empty((size, len(metrics), 4), np.int64)
+        for j, m in enumerate(metrics):
+            moments[:, j] = _limb_sums(key, frame.integers(m)[valid], size, counts.max(initial=0))
+        return cls(dims, labels, metrics, counts.reshape(shape), moments.reshape(shape + (len(metrics), 4)),
+                   [frame.scales[m] for m in metrics])
+
+    @classmethod
+    def empty(cls, dims=CUBE_DIMENSIONS, metrics=METRICS, scales=None):
+        shape = (0,) * len(dims)
+        scales = scales or [10 ** DECIMALS[m] for m in metrics]
+        return cls(dims, [[] for _ in dims], metrics, np.zeros(shape, np.int64),
+                   np.zeros(shape + (len(metrics), 4), np.int64), scales)
+
+    def _aligned(self, labels):
+        shape = tuple(len(l) for l in labels)
+        positions = [np.searchsorted(np.asarray(new, dtype=object), np.asarray(old, dtype=object))
+                     if old else np.zeros(0, np.intp)
+                     for new, old in zip(labels, self.labels)]
+        counts = np.zeros(shape, np.int64)
+        moments = np.zeros(shape + self.moments.shape[-2:], np.int64)
+        if self.counts.size:
+            idx = np.ix_(*positions)
+            counts[idx] = self.counts
+            moments[idx] = self.moments
+        return counts, moments
+
+    def merge(self, other):
+        """Combine two cubes by integer addition (exact, independent of the order of merging)."""
+        if other.dims != self.dims or other.metrics != self.metrics or other.scales != self.scales:
+            raise ValueError("Cannot merge cubes with different dimensions, metrics or scales")
+        if self.labels == other.labels:
+            a, b, labels = (self.counts, self.moments), (other.counts, other.moments), self.labels
+        else:
+            labels = [sorted(set(x) | set(y)) for x, y in zip(self.labels, other.labels)]
+            a, b = self._aligned(labels), other._aligned(labels)
+        return FixedPointCube(self.dims, labels, self.metrics, a[0] + b[0], a[1] + b[1], self.scales)
+
+    def _reduce(self, by):
+        """Counts, sums and M2 per group of `by`: integer totals, converted to float once."""
+        by, axes = self._axes(by)
+        drop = tuple(i for i in range(len(self.dims)) if i not in axes)
+        order = tuple(np.argsort(np.argsort(axes)))
+        counts = np.transpose(self.counts.sum(axis=drop), order).reshape(-1)
+        moments = np.transpose(self.moments.sum(axis=drop), order + (len(order), len(order) + 1))
+        moments = moments.reshape(-1, len(self.metrics), 4)
+        keep = counts > 0
+        counts, moments = counts[keep], moments[keep].astype(object)
+        total = moments[..., 0]
+        squares = (moments[..., 1] << 2 * _LIMB_BITS) + (moments[..., 2] << (_LIMB_BITS + 1)) + moments[..., 3]
+        n = counts.astype(object)[:, None]
+        scales = np.array(self.scales, dtype=object)[None, :]
+        # Python int / int is correctly rounded: each float is the exact result, rounded once
+        sums = (total / scales).astype(np.float64)
+        m2 = ((n * squares - total * total) / (n * scales * scales)).astype(np.float64)
+        return self._group_index(by, axes)[keep], counts, sums, m2
+
+    @property
+    def sums(self):
+        """Per-cell metric sums as floats."""
+        return self.moments[..., 0] / np.array(self.scales, dtype=np.float64)
+
+
+def compact_kpis(frame):
+    """The `kpi` stage's dictionary from a CompactFrame, with exact integer sums."""
+    total_impressions = frame.exact_sum("impressions")
+    total_clicks = frame.exact_sum("clicks")
+    n = len(frame)
+    deal_counts = frame.value_counts("deal_status")
+    payment_counts = frame.value_counts("payment_status")
+    return {
+        "total_impressions": total_impressions,
+        "total_clicks": total_clicks,
+        "overall_ctr": total_clicks / total_impressions * 100,
+        "revenue_per_campaign": frame.mean("actual_revenue"),
+        "win_rate": int(deal_counts.get("Closed Won", 0)) / n * 100,
+        "overdue_pct": int(payment_counts.get("Overdue", 0)) / n * 100,
+        "avg_delivery": frame.mean("delivery_rate") * 100,
+        "deal_counts": deal_counts,
+    }
+
+
+def memory_report(dataset):
+    """Bytes per row by column: pandas defaults (object strings), the typed frame, the compact frame."""
+    import pandas as pd
+
+    plain = pd.read_csv(dataset.csv_path)
+    typed = dataset.load()
+    frame = CompactFrame.from_table(dataset.table())
+    n = len(frame)
+    compact = frame.memory_usage()
+    rows = {name: (plain[name].memory_usage(index=False, deep=True) / n,
+                   typed[name].memory_usage(index=False, deep=True) / n,
+                   compact[name] / n, str(frame.columns[name].dtype))
+            for name in typed.columns}
+    rows["dictionaries"] = (0.0, 0.0, compact["dictionaries"] / n, "shared")
+    return rows, frame
+
+
+def check(frame, dataset, chunks=7):
+    """Exactness checks: decoding round trip, integer sums, chunk invariance, agreement with RollupCube."""
+    df = dataset.load()
+    results = {}
+    results["round trip"] = all(
+        np.array_equal(frame.values(c), df[c].to_numpy()) if c not in DIMENSIONS
+        else np.array_equal(frame.values(c).astype(str), df[c].astype(str).to_numpy())
+        for c in frame.columns
+    )
+    # Integer sums vs the decimal sums of the values as printed in the CSV
+    from decimal import Decimal
+
+    results["exact sums"] = all(
+        frame.exact_sum(m) == sum(int(Decimal(repr(v)).scaleb(DECIMALS[m])) for v in df[m].tolist())
+        for m in MONEY
+    )
+    whole = FixedPointCube.from_compact(frame)
+    table = dataset.table()
+    step = -(-table.num_rows // chunks)
+    dictionaries = Dictionaries()
+    merged = FixedPointCube.empty()
+    for start in reversed(range(0, table.num_rows, step)):
+        merged = merged.merge(FixedPointCube.from_compact(CompactFrame.from_table(table.slice(start, step), dictionaries)))
+    reference = RollupCube.from_frame(df)
+    identical, max_rel = True, 0.0
+    for dim in ["quarter", "industry", "account_tier", "ad_format", "sales_rep", "platform", ["quarter", "month"]]:
+        a, b, c = whole.rollup(dim), merged.rollup(dim), reference.rollup(dim)
+        identical &= a.equals(b)
+        max_rel = max(max_rel, float(np.nanmax(np.abs(a.to_numpy() - c.to_numpy()) /
+                                               np.maximum(np.abs(c.to_numpy()), 1e-12))))
+    results[f"chunks x{chunks} bit-identical"] = identical
+    results["float cube rel diff <= 1e-9"] = max_rel <= 1e-9
+    return results, max_rel
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compact, fixed-point representation of the campaign data.")
+    parser.add_argument("--csv", default=DEFAULT_CSV)
+    parser.add_argument("--check", action="store_true",
+                        help="Verify the round trip, exact sums and chunk-invariant rollups")
+    args = parser.parse_args()
+
+    dataset = CampaignDataset(args.csv)
+    rows, frame = memory_report(dataset)
+    print(f"Memory per row ({len(frame):,} campaigns), bytes:")
+    print(f"{'Column':<16} {'Object strs':>12} {'Typed':>8} {'Compact':>8}  {'Compact dtype':<14}")
+    print("-" * 64)
+    for name, (plain, typed, compact, dtype) in rows.items():
+        print(f"{name:<16} {plain:>12.1f} {typed:>8.1f} {compact:>8.1f}  {dtype:<14}")
+    totals = [sum(r[i] for r in rows.values()) for i in range(3)]
+    print("-" * 64)
+    print(f"{'total':<16} {totals[0]:>12.1f} {totals[1]:>8.1f} {totals[2]:>8.1f}  "
+          f"({totals[1] / totals[2]:.1f}x smaller than typed, {totals[0] / totals[2]:.1f}x than object strings)")
+
+    if args.check:
+        results, max_rel = check(frame, dataset)
+        print(f"\nChecks (max rel diff vs the float cube: {max_rel:.2e}):")
+        for name, ok in results.items():
+            print(f"  {name:<28} {'ok' if ok else 'FAIL'}")
+        if not all(results.values()):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,233 @@
+"""
+Dashboard rendering stage for the six ad sales charts.
+
+Takes the already-computed summary tables, renders each chart in its own process on
+the headless Agg backend, and skips charts whose inputs are unchanged. A chart's
+fingerprint covers its input tables, the shared style parameters and the source of
+its drawing function. The manifest next to the PNGs records each chart's fingerprint
+and the hash of the file it produced, so a PNG replaced on disk is re-rendered too.
+
+    results = render_dashboards({"01_quarterly_budget_vs_actual": {"rev_by_q": rev_by_q}, ...}, output_dir)
+"""
+
+import hashlib
+import inspect
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import matplotlib
+
+matplotlib.use("Agg")
+
+import matplotlib.pyplot as plt  # noqa: E402
+import pandas as pd  # noqa: E402
+import seaborn as sns  # noqa: E402
+
+STYLE = {"theme": "whitegrid", "figsize": (10, 6), "dpi": 150}
+MANIFEST_NAME = ".render_manifest.json"
+
+
+def apply_style(style=STYLE):
+    sns.set_theme(style=style["theme"])
+    plt.rcParams["figure.figsize"] = style["figsize"]
+    plt.rcParams["figure.dpi"] = style["dpi"]
+
+
+# ---- Chart definitions: each draws onto a fresh figure from summary tables ----
+
+def quarterly_budget_vs_actual(rev_by_q):
+    fig, ax = plt.subplots(figsize=(10, 5))
+    quarters = rev_by_q.index.tolist()
+    x = range(len(quarters))
+    width = 0.3
+
+    ax.bar([i - width/2 for i in x], rev_by_q["budget"] / 1e6, width, label="Budget", color="#90CAF9", edgecolor="white")
+    ax.bar([i + width/2 for i in x], rev_by_q["actual"] / 1e6, width, label="Actual Revenue", color="#1565C0", edgecolor="white")
+
+    for i, q in enumerate(quarters):
+        var = (rev_by_q.loc[q, "actual"] - rev_by_q.loc[q, "budget"]) / rev_by_q.loc[q, "budget"] * 100
+        color = "#4CAF50" if var >= 0 else "#F44336"
+        ax.text(i + width/2, rev_by_q.loc[q, "actual"] / 1e6 + 0.1, f"{var:+.1f}%", ha="center", fontsize=9, color=color, fontweight="bold")
+
+    ax.set_ylabel("Revenue ($M)")
+    ax.set_xticks(x)
+    ax.set_xticklabels(quarters)
+    ax.set_title("Quarterly Revenue: Budget vs Actual", fontsize=14, fontweight="bold")
+    ax.legend()
+
+
+def revenue_by_industry_tier(rev_industry, rev_tier):
+    fig, axes = plt.subplots(1, 2, figsize=(14, 5))
+
+    colors_ind = ["#1565C0", "#1976D2", "#1E88E5", "#42A5F5", "#64B5F6", "#90CAF9"]
+    axes[0].barh(rev_industry.index, rev_industry["total_revenue"] / 1e6, color=colors_ind, edgecolor="white")
+    axes[0].set_xlabel("Total Revenue ($M)")
+    axes[0].set_title("Revenue by Industry", fontsize=12, fontweight="bold")
+    for i, (ind, row) in enumerate(rev_industry.iterrows()):
+        axes[0].text(row["total_revenue"] / 1e6 + 0.05, i, f"${row['total_revenue']/1e6:.1f}M", va="center", fontsize=9)
+
+    tier_colors = ["#1565C0", "#42A5F5", "#90CAF9"]
+    axes[1].pie(rev_tier["total_revenue"], labels=rev_tier.index, autopct="%1.1f%%",
+                colors=tier_colors, startangle=90, textprops={"fontsize": 10})
+    axes[1].set_title("Revenue Share by Account Tier", fontsize=12, fontweight="bold")
+
+    plt.suptitle("Revenue Breakdown: Industry & Account Tier", fontsize=14, fontweight="bold", y=1.02)
+
+
+def ad_format_performance(format_perf):
+    fig, ax1 = plt.subplots(figsize=(10, 5))
+
+    x = range(len(format_perf))
+    ax1.bar(x, format_perf["avg_cpm"], color="#1565C0", edgecolor="white", width=0.5, label="Avg CPM ($)")
+    ax1.set_ylabel("Avg CPM ($)", color="#1565C0")
+    ax1.set_xticks(x)
+    ax1.set_xticklabels(format_perf.index, rotation=25, ha="right")
+
+    ax2 = ax1.twinx()
+    ax2.plot(x, format_perf["avg_ctr"] * 100, "o-", color="#FF5722", linewidth=2, markersize=8, label="Avg CTR (%)")
+    ax2.set_ylabel("Avg CTR (%)", color="#FF5722")
+
+    for i, (cpm, ctr) in enumerate(zip(format_perf["avg_cpm"], format_perf["avg_ctr"])):
+        ax1.text(i, cpm + 0.3, f"${cpm:.1f}", ha="center", fontsize=9)
+
+    ax1.set_title("Ad Format Performance: CPM vs CTR", fontsize=14, fontweight="bold")
+    lines1, labels1 = ax1.get_legend_handles_labels()
+    lines2, labels2 = ax2.get_legend_handles_labels()
+    ax1.legend(lines1 + lines2, labels1 + labels2, loc="upper right")
+
+
+def budget_variance_by_rep(var_by_rep):
+    fig, ax = plt.subplots(figsize=(10, 5))
+    colors = ["#4CAF50" if v >= 0 else "#F44336" for v in var_by_rep["variance_pct"]]
+    bars = ax.bar(var_by_rep.index, var_by_rep["variance_pct"], color=colors, edgecolor="white", width=0.5)
+    ax.axhline(y=0, color="black", linewidth=0.5)
+    ax.set_ylabel("Budget Variance (%)")
+    ax.set_title("Budget Variance by Sales Rep", fontsize=14, fontweight="bold")
+    for bar, val in zip(bars, var_by_rep["variance_pct"]):
+        color = "#4CAF50" if val >= 0 else "#F44336"
+        ax.text(bar.get_x() + bar.get_width()/2, bar.get_height() + 0.1, f"{val:+.1f}%",
+                ha="center", fontsize=10, color=color, fontweight="bold")
+
+
+def kpi_dashboard(platform_perf, deal_counts):
+    fig, axes = plt.subplots(1, 2, figsize=(14, 5))
+
+    # Platform revenue pie
+    plat_colors = ["#1565C0", "#42A5F5", "#90CAF9", "#BBDEFB"]
+    axes[0].pie(platform_perf["revenue"], labels=platform_perf.index, autopct="%1.1f%%",
+                colors=plat_colors, startangle=90, textprops={"fontsize": 10})
+    axes[0].set_title("Revenue by Platform", fontsize=12, fontweight="bold")
+
+    # Deal status bar
+    deal_colors = {"Closed Won": "#4CAF50", "In Flight": "#FF9800", "Renewal Pending": "#2196F3"}
+    axes[1].bar(deal_counts.index, deal_counts.values,
+                color=[deal_colors.get(d, "#9E9E9E") for d in deal_counts.index], edgecolor="white")
+    axes[1].set_title("Campaign Deal Status", fontsize=12, fontweight="bold")
+    axes[1].set_ylabel("Number of Campaigns")
+    for i, (status, count) in enumerate(deal_counts.items()):
+        axes[1].text(i, count + 10, str(count), ha="center", fontsize=11, fontweight="bold")
+
+    plt.suptitle("Ad Sales KPI Dashboard", fontsize=14, fontweight="bold", y=1.02)
+
+
+def correlation_matrix(corr):
+    fig, ax = plt.subplots(figsize=(10, 8))
+    sns.heatmap(corr, annot=True, fmt=".2f", cmap="RdBu_r", center=0, ax=ax,
+                square=True, linewidths=0.5)
+    ax.set_title("Correlation Matrix: Ad Sales Financial Metrics", fontsize=14, fontweight="bold")
+
+
+CHARTS = {
+    "01_quarterly_budget_vs_actual": quarterly_budget_vs_actual,
+    "02_revenue_by_industry_tier": revenue_by_industry_tier,
+    "03_ad_format_performance": ad_format_performance,
+    "04_budget_variance_by_rep": budget_variance_by_rep,
+    "05_kpi_dashboard": kpi_dashboard,
+    "06_correlation_matrix": correlation_matrix,
+}
+
+
+# ---- Fingerprints and manifest ----
+
+def _hash_input(value):
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        frame = value.to_frame() if isinstance(value, pd.Series) else value
+        header = repr((list(map(str, frame.columns)), list(map(str, frame.dtypes)), frame.index.names))
+        return header.encode() + pd.util.hash_pandas_object(frame, index=True).to_numpy().tobytes()
+    return repr(value).encode()
+
+
+def fingerprint(name, inputs, style=STYLE):
+    """Hash of a chart's input tables, style parameters and drawing code."""
+    h = hashlib.sha256()
+    h.update(name.encode())
+    h.update(inspect.getsource(CHARTS[name]).encode())
+    h.update(repr(sorted(style.items())).encode())
+    h.update(matplotlib.__version__.encode())
+    for key in sorted(inputs):
+        h.update(key.encode())
+        h.update(_hash_input(inputs[key]))
+    return h.hexdigest()
+
+
+def _load_manifest(output_dir):
+    path = os.path.join(output_dir, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def _save_manifest(output_dir, manifest):
+    path = os.path.join(output_dir, MANIFEST_NAME)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def _file_digest(path):
+    if not os.path.exists(path):
+        return None
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def render_chart(name, inputs, path, style=STYLE):
+    """Render one chart to `path` (runs inside a worker process)."""
+    apply_style(style)
+    CHARTS[name](**inputs)
+    plt.tight_layout()
+    plt.savefig(path, bbox_inches="tight")
+    plt.close("all")
+    return name
+
+
+def render_dashboards(charts, output_dir, workers=None, force=False, style=STYLE):
+    """Render {chart name: input tables} concurrently, skipping unchanged charts.
+
+    Returns {chart name: "rendered" | "unchanged"} in chart order.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    manifest = _load_manifest(output_dir)
+    status, pending = {}, {}
+    for name, inputs in charts.items():
+        path = os.path.join(output_dir, f"{name}.png")
+        digest = fingerprint(name, inputs, style)
+        entry = manifest.get(name, {})
+        if not force and entry.get("inputs") == digest and entry.get("png") == _file_digest(path):
+            status[name] = "unchanged"
+        else:
+            pending[name] = (inputs, path, digest)
+    if pending:
+        with ProcessPoolExecutor(max_workers=workers or min(len(pending), os.cpu_count() or 1)) as pool:
+            futures = {name: pool.submit(render_chart, name, inputs, path, style)
+                       for name, (inputs, path, _) in pending.items()}
+            for name, future in futures.items():
+                future.result()
+                inputs, path, digest = pending[name]
+                manifest[name] = {"inputs": digest, "png": _file_digest(path)}
+                status[name] = "rendered"
+        _save_manifest(output_dir, manifest)
+    return {name: status[name] for name in charts}
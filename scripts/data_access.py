@@ -0,0 +1,134 @@
+"""
+Typed, columnar access to the campaign dataset.
+
+The CSV is parsed once with an explicit schema (dimensions as categoricals, counts as
+int64, money/rates as float64) and written to an uncompressed Arrow IPC file next to
+it, with the dimensions dictionary-encoded. The cache records the source CSV's size
+and mtime and is rebuilt only when those change. Reads open the cache memory-mapped
+and materialize only the requested columns:
+
+    dataset = CampaignDataset()
+    kpis = dataset.load(["impressions", "clicks", "deal_status"])
+
+pandas is imported only when a CSV is parsed or a DataFrame is requested, so callers
+that work on the Arrow table directly start quickly.
+"""
+
+import os
+
+import pyarrow as pa
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_CSV = os.path.join(PROJECT_DIR, "data", "ad_sales_data.csv")
+CACHE_DIR_NAME = ".cache"
+
+DIMENSIONS = ["advertiser", "industry", "account_tier", "sales_rep", "ad_format", "platform",
+              "quarter", "month", "deal_status", "payment_status"]
+
+SCHEMA = {
+    "campaign_id": "int64",
+    "advertiser": "category",
+    "industry": "category",
+    "account_tier": "category",
+    "sales_rep": "category",
+    "ad_format": "category",
+    "platform": "category",
+    "quarter": "category",
+    "month": "category",
+    "impressions": "int64",
+    "clicks": "int64",
+    "ctr": "float64",
+    "cpm": "float64",
+    "booked_revenue": "float64",
+    "budget": "float64",
+    "actual_revenue": "float64",
+    "delivery_rate": "float64",
+    "cost_of_sale": "float64",
+    "gross_margin": "float64",
+    "margin_pct": "float64",
+    "deal_status": "category",
+    "payment_status": "category",
+}
+COLUMNS = list(SCHEMA)
+
+_SOURCE_SIZE = b"source_size"
+_SOURCE_MTIME = b"source_mtime_ns"
+
+
+def read_csv_typed(path, columns=None, **kwargs):
+    """pd.read_csv with the explicit schema; categoricals get sorted categories.
+
+    With `chunksize`, returns an iterator of typed chunks instead of one frame.
+    """
+    import pandas as pd
+
+    usecols = list(columns) if columns is not None else COLUMNS
+    result = pd.read_csv(path, usecols=usecols, dtype={c: SCHEMA[c] for c in usecols}, **kwargs)
+    if isinstance(result, pd.DataFrame):
+        return result[usecols]
+    return (chunk[usecols] for chunk in result)
+
+
+def _source_stamp(csv_path):
+    st = os.stat(csv_path)
+    return {_SOURCE_SIZE: str(st.st_size).encode(), _SOURCE_MTIME: str(st.st_mtime_ns).encode()}
+
+
+class CampaignDataset:
+    """The campaign CSV plus its memory-mapped Arrow cache."""
+
+    def __init__(self, csv_path=DEFAULT_CSV, cache_path=None):
+        self.csv_path = csv_path
+        if cache_path is None:
+            base = os.path.splitext(os.path.basename(csv_path))[0]
+            cache_path = os.path.join(os.path.dirname(csv_path), CACHE_DIR_NAME, base + ".arrow")
+        self.cache_path = cache_path
+
+    def is_fresh(self):
+        """True when the cache exists and was built from the current CSV."""
+        if not os.path.exists(self.cache_path):
+            return False
+        with pa.memory_map(self.cache_path) as source:
+            metadata = pa.ipc.open_file(source).schema.metadata or {}
+        stamp = _source_stamp(self.csv_path)
+        return all(metadata.get(k) == v for k, v in stamp.items())
+
+    def build(self):
+        """Parse the CSV with the schema and (re)write the Arrow cache atomically."""
+        df = read_csv_typed(self.csv_path)
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        table = table.replace_schema_metadata({**(table.schema.metadata or {}), **_source_stamp(self.csv_path)})
+        os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+        tmp_path = self.cache_path + ".tmp"
+        with pa.OSFile(tmp_path, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+        os.replace(tmp_path, self.cache_path)
+        return table.num_rows
+
+    def fingerprint(self):
+        """Identity of the current CSV version (path, size, mtime), for keying derived results."""
+        stamp = _source_stamp(self.csv_path)
+        return f"{os.path.abspath(self.csv_path)}:{stamp[_SOURCE_SIZE].decode()}:{stamp[_SOURCE_MTIME].decode()}"
+
+    def ensure(self):
+        if not self.is_fresh():
+            self.build()
+        return self.cache_path
+
+    def table(self, columns=None):
+        """Memory-mapped Arrow table restricted to `columns` (no copy until converted)."""
+        self.ensure()
+        source = pa.memory_map(self.cache_path)
+        table = pa.ipc.open_file(source).read_all()
+        return table if columns is None else table.select(list(columns))
+
+    def load(self, columns=None):
+        """Typed DataFrame with only `columns`; dictionary columns come back as categoricals."""
+        return self.table(columns).to_pandas()
+
+    @property
+    def num_rows(self):
+        self.ensure()
+        with pa.memory_map(self.cache_path) as source:
+            reader = pa.ipc.open_file(source)
+            return sum(reader.get_batch(i).num_rows for i in range(reader.num_record_batches))
@@ -0,0 +1,318 @@
+"""
+Batch forecasts of actual revenue and budget variance for every series at once.
+
+A series is one advertiser x ad_format x platform combination (a few hundred at the
+project size, thousands as advertisers and formats grow). The rows are summed into a
+dense series x period panel with np.bincount; periods come from the generator's
+quarter ("Q4 2025") and month ("Oct") fields, monthly or quarterly. A period with no
+campaigns is a real zero, so every series shares the same time axis and one design
+matrix: each model is fitted to all series in a single np.linalg.lstsq call with one
+right-hand side per series, not a loop.
+
+Models:
+  level     mean of the series
+  trend     intercept + slope
+  seasonal  trend on seasonally adjusted values; the seasonal index (one factor per
+            month or quarter of the year) is pooled across all series, from the total's
+            ratio to its own linear trend. Seasons never observed get a factor of 1.
+  budget    the plan as the revenue forecast; future budgets are projected as the
+            level of each series' budget
+
+`auto` picks whichever of these had the lowest error in the backtest, the budget
+included, so no model is used when it forecasts worse than the plan.
+
+Forecasts are clipped at zero. The backtest holds out the last periods, fits on the
+rest, and scores each model's revenue forecast against what happened, alongside the
+budget (the plan, known in advance) used as a forecast of the same revenue:
+
+    panel = SeriesPanel.from_frame(df)
+    scores = backtest(panel, holdout=3)
+    forecast(panel, horizon=3, model=choose_model(scores))
+
+    python scripts/forecasting.py --horizon 3 --backtest 3 --check
+"""
+
+import argparse
+import sys
+
+import numpy as np
+import pandas as pd
+
+from data_access import DEFAULT_CSV, CampaignDataset
+
+SERIES_KEYS = ["advertiser", "ad_format", "platform"]
+FORECAST_COLUMNS = SERIES_KEYS + ["quarter", "month", "actual_revenue", "budget"]
+MODELS = ("level", "trend", "seasonal")
+FORECASTS = MODELS + ("budget",)
+FREQUENCIES = {"month": 12, "quarter": 4}
+MONTHS = ["Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
+
+
+def _parse_quarters(labels):
+    parts = pd.Series(labels, dtype="string").str.extract(r"^Q([1-4])\s+(\d{4})$")
+    if parts.isna().any().any():
+        raise ValueError(f"Cannot parse quarter {labels[parts.isna().any(axis=1).to_numpy()][0]!r}; "
+                         f"expected e.g. 'Q4 2025'")
+    return parts[1].astype(int).to_numpy(), parts[0].astype(int).to_numpy() - 1
+
+
+def period_index(quarter, month=None, freq="month"):
+    """Absolute period number of each row (year * 12 + month, or year * 4 + quarter).
+
+    Only the distinct labels are parsed, so this is fast on categoricals and long columns.
+    """
+    if freq not in FREQUENCIES:
+        raise ValueError(f"Unknown frequency {freq!r}; expected one of {tuple(FREQUENCIES)}")
+    codes, labels = pd.factorize(pd.Series(quarter))
+    if (codes < 0).any():
+        raise ValueError("Missing quarter in some rows")
+    year, q = (a[codes] for a in _parse_quarters(np.asarray(labels, dtype=object)))
+    if freq == "quarter":
+        return year * 4 + q
+    codes, labels = pd.factorize(pd.Series(month))
+    lookup = {name: i for i, name in enumerate(MONTHS)}
+    unknown = [label for label in labels if label not in lookup]
+    if unknown or (codes < 0).any():
+        raise ValueError(f"Cannot parse month {unknown[0] if unknown else None!r}")
+    m = np.array([lookup[label] for label in labels], dtype=np.int64)[codes]
+    if (m // 3 != q).any():
+        raise ValueError("Month does not belong to its quarter in some rows")
+    return year * 12 + m
+
+
+def period_label(period, freq="month"):
+    if freq == "quarter":
+        return f"Q{period % 4 + 1} {period // 4}"
+    return f"{period // 12}-{period % 12 + 1:02d}"
+
+
+class SeriesPanel:
+    """Per-series sums of each metric on a dense, gap-free period axis."""
+
+    def __init__(self, keys, periods, values, freq="month"):
+        self.keys = keys
+        self.periods = np.asarray(periods)
+        self.values = values
+        self.freq = freq
+
+    @classmethod
+    def from_frame(cls, df, keys=SERIES_KEYS, metrics=("actual_revenue", "budget"), freq="month"):
+        period = period_index(df["quarter"], df["month"] if freq == "month" else None, freq)
+        codes, uniques = zip(*(pd.factorize(df[k], sort=True) for k in keys))
+        valid = np.logical_and.reduce([c >= 0 for c in codes])
+        combined = np.ravel_multi_index([c[valid] for c in codes], [len(u) for u in uniques])
+        series_ids, series = np.unique(combined, return_inverse=True)
+        key_codes = np.unravel_index(series_ids, [len(u) for u in uniques])
+        key_frame = pd.DataFrame({k: np.asarray(u)[c] for k, u, c in zip(keys, uniques, key_codes)})
+        period = period[valid]
+        first = period.min()
+        n_periods = int(period.max() - first + 1)
+        cell = series * n_periods + (period - first)
+        size = len(series_ids) * n_periods
+        values = {m: np.bincount(cell, weights=df[m].to_numpy(dtype=np.float64)[valid], minlength=size)
+                  .reshape(len(series_ids), n_periods) for m in metrics}
+        return cls(key_frame, np.arange(first, first + n_periods), values, freq)
+
+    @property
+    def n_series(self):
+        return len(self.keys)
+
+    def labels(self, periods=None):
+        return [period_label(int(p), self.freq) for p in (self.periods if periods is None else periods)]
+
+    def head(self, n_periods):
+        """The same series restricted to the first `n_periods` periods (backtest training window)."""
+        return SeriesPanel(self.keys, self.periods[:n_periods],
+                           {m: v[:, :n_periods] for m, v in self.values.items()}, self.freq)
+
+    def tail(self, n_periods):
+        """The same series restricted to the last `n_periods` periods (none for 0)."""
+        start = len(self.periods) - n_periods
+        return SeriesPanel(self.keys, self.periods[start:],
+                           {m: v[:, start:] for m, v in self.values.items()}, self.freq)
+
+
+# ---- Batched fitting ----
+
+def _design(t, model):
+    return np.ones((len(t), 1)) if model == "level" else np.column_stack([np.ones(len(t)), t])
+
+
+def seasonal_index(values, periods, n_seasons):
+    """Pooled multiplicative factor per season: the total's ratio to its linear trend, averaged
+    per season and normalized to mean 1 over the observed seasons (unobserved seasons: 1)."""
+    total = values.sum(axis=0)
+    t = np.arange(len(periods), dtype=np.float64)
+    X = _design(t, "trend")
+    trend = X @ np.linalg.lstsq(X, total, rcond=None)[0]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        ratio = np.where(trend > 0, total / trend, np.nan)
+    season = periods % n_seasons
+    sums = np.bincount(season, weights=np.nan_to_num(ratio), minlength=n_seasons)
+    counts = np.bincount(season, weights=~np.isnan(ratio), minlength=n_seasons)
+    index = np.ones(n_seasons)
+    observed = counts > 0
+    index[observed] = sums[observed] / counts[observed]
+    index[observed] /= index[observed].mean()
+    return np.where(index > 0, index, 1.0)
+
+
+def fit(values, model="trend"):
+    """Coefficients of `model` for every row of `values` (series x periods) in one lstsq call."""
+    if model not in MODELS:
+        raise ValueError(f"Unknown model {model!r}; expected one of {MODELS}")
+    t = np.arange(values.shape[1], dtype=np.float64)
+    return np.linalg.lstsq(_design(t, model), values.T, rcond=None)[0].T
+
+
+def forecast_values(values, periods, horizon, model="seasonal", freq="month"):
+    """(series x horizon) forecasts for the `horizon` periods after the panel."""
+    n_seasons = FREQUENCIES[freq]
+    t_future = np.arange(values.shape[1], values.shape[1] + horizon, dtype=np.float64)
+    future = periods[-1] + 1 + np.arange(horizon)
+    if model == "seasonal":
+        index = seasonal_index(values, periods, n_seasons)
+        coef = fit(values / index[periods % n_seasons], "trend")
+        out = (coef @ _design(t_future, "trend").T) * index[future % n_seasons]
+    else:
+        out = fit(values, model) @ _design(t_future, model).T
+    return np.maximum(out, 0.0)
+
+
+def forecast(panel, horizon=3, model="seasonal"):
+    """Long frame: one row per series and future period with forecast revenue, budget and variance."""
+    future = panel.periods[-1] + 1 + np.arange(horizon)
+    if model == "budget":
+        budget = forecast_values(panel.values["budget"], panel.periods, horizon, "level", panel.freq)
+        revenue = budget.copy()
+    else:
+        revenue = forecast_values(panel.values["actual_revenue"], panel.periods, horizon, model, panel.freq)
+        budget = forecast_values(panel.values["budget"], panel.periods, horizon, model, panel.freq)
+    out = panel.keys.loc[np.repeat(np.arange(panel.n_series), horizon)].reset_index(drop=True)
+    out["period"] = np.tile(panel.labels(future), panel.n_series)
+    out["forecast_revenue"] = revenue.ravel()
+    out["forecast_budget"] = budget.ravel()
+    with np.errstate(invalid="ignore", divide="ignore"):
+        out["variance_pct"] = np.where(budget.ravel() > 0, (revenue.ravel() - budget.ravel()) / budget.ravel() * 100,
+                                       np.nan)
+    return out
+
+
+# ---- Backtest ----
+
+def score(predicted, actual):
+    """Error of a (series x periods) forecast against the realized revenue."""
+    error = predicted - actual
+    total = np.abs(actual).sum()
+    return {
+        "mae": float(np.abs(error).mean()),
+        "rmse": float(np.sqrt((error ** 2).mean())),
+        "wape_pct": float(np.abs(error).sum() / total * 100) if total else np.nan,
+        "bias_pct": float(error.sum() / total * 100) if total else np.nan,
+        "total_error_pct": float((predicted.sum() - actual.sum()) / actual.sum() * 100) if total else np.nan,
+    }
+
+
+def backtest_holdout(n_periods, horizon):
+    """Periods held out to backtest a `horizon`-period forecast: the horizon, capped so that at
+    least half of the history is left to fit on (0 when there is too little history)."""
+    return min(horizon, n_periods // 2)
+
+
+def backtest(panel, holdout=3, models=MODELS):
+    """Fit on all but the last `holdout` periods and score every model's revenue forecast on them.
+
+    The "budget" row scores the budget column of the held-out periods as the forecast, so
+    each model's skill_pct is its WAPE improvement over forecasting revenue by the plan.
+    """
+    if holdout >= len(panel.periods):
+        raise ValueError(f"Backtest needs more than {holdout} periods; the panel has {len(panel.periods)}")
+    train, test = panel.head(len(panel.periods) - holdout), panel.tail(holdout)
+    actual = test.values["actual_revenue"]
+    rows = {"budget": score(test.values["budget"], actual)}
+    for model in models:
+        predicted = forecast_values(train.values["actual_revenue"], train.periods, holdout, model, panel.freq)
+        rows[model] = score(predicted, actual)
+    scores = pd.DataFrame.from_dict(rows, orient="index")
+    scores["skill_pct"] = (1 - scores["wape_pct"] / scores.loc["budget", "wape_pct"]) * 100
+    scores.index.name = "forecast"
+    return scores
+
+
+def choose_model(scores):
+    """The forecast with the lowest backtest WAPE ("budget" when no model beats the plan, or
+    without a backtest)."""
+    if scores is None:
+        return "budget"
+    return scores["wape_pct"].idxmin()
+
+
+def caveat(scores, model):
+    """The backtest figures of `model` next to the best-scoring forecast's, if that is another one."""
+    best = choose_model(scores)
+    if model == best:
+        return None
+    return (f"in the backtest the {model} forecast had WAPE {scores.loc[model, 'wape_pct']:.1f}% "
+            f"(skill {scores.loc[model, 'skill_pct']:+.1f}% vs the budget), the {best} forecast "
+            f"{scores.loc[best, 'wape_pct']:.1f}%")
+
+
+def check(panel, model="trend"):
+    """Max absolute difference between the batched coefficients and a per-series np.polyfit loop."""
+    values = panel.values["actual_revenue"]
+    t = np.arange(values.shape[1])
+    batched = fit(values, model)
+    degree = 0 if model == "level" else 1
+    looped = np.array([np.polyfit(t, row, degree)[::-1] for row in values])
+    return float(np.max(np.abs(batched - looped)) / max(np.max(np.abs(looped)), 1e-300))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batch revenue and budget-variance forecasts per series.")
+    parser.add_argument("--csv", default=DEFAULT_CSV)
+    parser.add_argument("--freq", choices=list(FREQUENCIES), default="month")
+    parser.add_argument("--model", choices=("auto",) + FORECASTS, default="auto",
+                        help="Forecast to use; auto picks the lowest backtest error (default)")
+    parser.add_argument("--horizon", type=int, default=3, help="Periods to forecast")
+    parser.add_argument("--top", type=int, default=10, help="Series to list (largest forecast revenue)")
+    parser.add_argument("--backtest", type=int, metavar="PERIODS", help="Score the models on the last PERIODS")
+    parser.add_argument("--check", action="store_true", help="Compare batched fits with a per-series loop")
+    args = parser.parse_args()
+    if args.horizon < 1:
+        parser.error("--horizon must be at least 1")
+
+    panel = SeriesPanel.from_frame(CampaignDataset(args.csv).load(FORECAST_COLUMNS), freq=args.freq)
+    print(f"{panel.n_series:,} series x {len(panel.periods)} periods ({panel.labels()[0]} to {panel.labels()[-1]})")
+    holdout = args.backtest or backtest_holdout(len(panel.periods), args.horizon)
+    scores = backtest(panel, holdout) if holdout else None
+    model = choose_model(scores) if args.model == "auto" else args.model
+    if args.model == "auto":
+        print(f"Model: {model} (lowest WAPE in a {holdout}-period backtest)" if scores is not None
+              else "Model: budget (too little history to backtest)")
+    result = forecast(panel, args.horizon, model)
+    totals = result.groupby("period", sort=False)[["forecast_revenue", "forecast_budget"]].sum()
+    print(f"\nForecast ({model}), all series:")
+    for period, row in totals.iterrows():
+        print(f"  {period}: revenue ${row['forecast_revenue']:,.0f}  budget ${row['forecast_budget']:,.0f}  "
+              f"variance {(row['forecast_revenue'] - row['forecast_budget']) / row['forecast_budget'] * 100:+.1f}%")
+    by_series = result.groupby(SERIES_KEYS, sort=False)[["forecast_revenue", "forecast_budget"]].sum()
+    print(f"\nTop {args.top} series by forecast revenue over {args.horizon} periods:")
+    print(by_series.nlargest(args.top, "forecast_revenue").round(0).to_string())
+
+    if args.backtest is not None and not 1 <= args.backtest < len(panel.periods):
+        parser.error(f"--backtest must be between 1 and {len(panel.periods) - 1} periods for this panel")
+    if args.backtest:
+        print(f"\nBacktest on the last {args.backtest} periods:")
+        print(scores.round(2).to_string())
+        warning = caveat(scores, model)
+        if warning:
+            print(f"\nNote: {warning}.")
+    if args.check:
+        worst = max(check(panel, model) for model in ("level", "trend"))
+        print(f"\nMax relative difference from per-series np.polyfit: {worst:.2e}")
+        if worst > 1e-9:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
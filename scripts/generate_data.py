@@ -2,25 +2,43 @@
 Generate simulated Ad Sales Revenue dataset (2,400 rows)
 for Ad Sales Revenue Analytics project.
 Simulates advertising campaign data merged from Sales CRM, Ad Platform, and Finance systems.
+
+Two modes:
+  python scripts/generate_data.py
+      Original 2,400-row dataset (global seed 42) -> data/ad_sales_data.csv
+  python scripts/generate_data.py --rows 100000000 --chunk-size 1000000 --workers 8 --out-dir data/scale
+      Chunked, parallel generator for load testing. Each chunk draws from its own
+      numpy Generator (SeedSequence spawn key = chunk index), so output is identical
+      for any worker count. Chunks are written as numbered CSV partitions as they are
+      produced; peak memory is bounded by chunk size x workers.
 """
 
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
 import numpy as np
 import pandas as pd
 
-np.random.seed(42)
-n = 2400
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_CSV = os.path.join(PROJECT_DIR, "data", "ad_sales_data.csv")
 
-# ---- SOURCE 1: Campaign & Client Info (Sales CRM) ----
-campaign_ids = range(5001, 5001 + n)
+FIRST_CAMPAIGN_ID = 5001
 
-advertisers = np.random.choice(
-    ["Nike", "Samsung", "Coca-Cola", "Toyota", "Netflix", "Spotify", "Adobe",
-     "Microsoft", "PepsiCo", "Procter & Gamble", "Unilever", "Meta", "Apple",
-     "Disney", "Warner Bros", "Sony", "EA Games", "Riot Games", "Red Bull", "Intel"],
-    n
-)
+COLUMNS = [
+    "campaign_id", "advertiser", "industry", "account_tier", "sales_rep", "ad_format",
+    "platform", "quarter", "month", "impressions", "clicks", "ctr", "cpm", "booked_revenue",
+    "budget", "actual_revenue", "delivery_rate", "cost_of_sale", "gross_margin", "margin_pct",
+    "deal_status", "payment_status",
+]
 
-industry = {
+ADVERTISERS = [
+    "Nike", "Samsung", "Coca-Cola", "Toyota", "Netflix", "Spotify", "Adobe",
+    "Microsoft", "PepsiCo", "Procter & Gamble", "Unilever", "Meta", "Apple",
+    "Disney", "Warner Bros", "Sony", "EA Games", "Riot Games", "Red Bull", "Intel",
+]
+INDUSTRY = {
     "Nike": "Retail", "Samsung": "Technology", "Coca-Cola": "CPG", "Toyota": "Automotive",
     "Netflix": "Entertainment", "Spotify": "Entertainment", "Adobe": "Technology",
     "Microsoft": "Technology", "PepsiCo": "CPG", "Procter & Gamble": "CPG",
@@ -28,114 +46,262 @@ industry = {
     "Disney": "Entertainment", "Warner Bros": "Entertainment", "Sony": "Technology",
     "EA Games": "Gaming", "Riot Games": "Gaming", "Red Bull": "CPG", "Intel": "Technology",
 }
-industries = [industry[a] for a in advertisers]
-
-account_tier = np.random.choice(["Enterprise", "Mid-Market", "Growth"], n, p=[0.30, 0.45, 0.25])
-
-sales_rep = np.random.choice(
-    ["Sarah K.", "James L.", "Maria G.", "David R.", "Priya S.", "Alex T."], n
-)
-
-# ---- SOURCE 2: Campaign Performance (Ad Platform) ----
-ad_format = np.random.choice(
-    ["Video Pre-Roll", "Display Banner", "Homepage Takeover", "Sponsored Stream",
-     "Interactive Overlay", "Audio Ad"], n, p=[0.30, 0.20, 0.10, 0.20, 0.10, 0.10]
-)
-
-platform = np.random.choice(["Desktop", "Mobile", "CTV", "Multi-Platform"], n, p=[0.25, 0.35, 0.15, 0.25])
-
-quarter = np.random.choice(["Q1 2025", "Q2 2025", "Q3 2025", "Q4 2025"], n, p=[0.20, 0.25, 0.25, 0.30])
-month_map = {
+ACCOUNT_TIERS = ["Enterprise", "Mid-Market", "Growth"]
+ACCOUNT_TIER_P = [0.30, 0.45, 0.25]
+SALES_REPS = ["Sarah K.", "James L.", "Maria G.", "David R.", "Priya S.", "Alex T."]
+AD_FORMATS = ["Video Pre-Roll", "Display Banner", "Homepage Takeover", "Sponsored Stream",
+              "Interactive Overlay", "Audio Ad"]
+AD_FORMAT_P = [0.30, 0.20, 0.10, 0.20, 0.10, 0.10]
+PLATFORMS = ["Desktop", "Mobile", "CTV", "Multi-Platform"]
+PLATFORM_P = [0.25, 0.35, 0.15, 0.25]
+QUARTERS = ["Q1 2025", "Q2 2025", "Q3 2025", "Q4 2025"]
+QUARTER_P = [0.20, 0.25, 0.25, 0.30]
+MONTH_MAP = {
     "Q1 2025": ["Jan", "Feb", "Mar"],
     "Q2 2025": ["Apr", "May", "Jun"],
     "Q3 2025": ["Jul", "Aug", "Sep"],
     "Q4 2025": ["Oct", "Nov", "Dec"],
 }
-months = [np.random.choice(month_map[q]) for q in quarter]
-
-impressions = np.random.lognormal(mean=12, sigma=0.8, size=n).astype(int)
-impressions = np.clip(impressions, 50000, 10000000)
-
-# CTR influenced by ad format
-base_ctr = np.random.normal(0.015, 0.005, n)
-ctr_boost = np.where(ad_format == "Video Pre-Roll", 0.008, 0) + \
-            np.where(ad_format == "Homepage Takeover", 0.012, 0) + \
-            np.where(ad_format == "Sponsored Stream", 0.010, 0) + \
-            np.where(ad_format == "Interactive Overlay", 0.006, 0)
-ctr = np.clip(base_ctr + ctr_boost, 0.002, 0.06).round(4)
-clicks = (impressions * ctr).astype(int)
-
-# CPM influenced by format and tier
-base_cpm = np.random.normal(18, 5, n)
-cpm_adj = np.where(ad_format == "Homepage Takeover", 15, 0) + \
-          np.where(ad_format == "Video Pre-Roll", 8, 0) + \
-          np.where(ad_format == "Sponsored Stream", 10, 0) + \
-          np.where(account_tier == "Enterprise", 3, 0) + \
-          np.where(quarter == "Q4 2025", 5, 0)
-cpm = np.clip(base_cpm + cpm_adj, 5, 55).round(2)
-
-# ---- SOURCE 3: Financial Data (Finance System) ----
-# Booked revenue = impressions * CPM / 1000
-booked_revenue = (impressions * cpm / 1000).round(2)
-
-# Budget (planned revenue - slightly different from actual)
-budget_variance_pct = np.random.normal(0, 0.12, n)
-budget = (booked_revenue / (1 + budget_variance_pct)).round(2)
-
-# Actual revenue recognized (may differ from booked due to delivery)
-delivery_rate = np.clip(np.random.normal(0.92, 0.08, n), 0.60, 1.05).round(3)
-actual_revenue = (booked_revenue * delivery_rate).round(2)
-
-# Cost of sale
-cost_pct = np.clip(np.random.normal(0.35, 0.10, n), 0.15, 0.65).round(3)
-cost_of_sale = (actual_revenue * cost_pct).round(2)
-
-# Gross margin
-gross_margin = (actual_revenue - cost_of_sale).round(2)
-margin_pct = np.where(actual_revenue > 0, (gross_margin / actual_revenue * 100).round(1), 0)
-
-# Deal status
-deal_status = np.random.choice(["Closed Won", "Closed Won", "Closed Won", "In Flight", "Renewal Pending"], n, p=[0.50, 0.05, 0.05, 0.25, 0.15])
-
-# Payment status
-payment_status = np.where(
-    deal_status == "In Flight", "Pending",
-    np.random.choice(["Received", "Invoiced", "Overdue"], n, p=[0.55, 0.30, 0.15])
-)
-
-# ---- BUILD DATAFRAME ----
-df = pd.DataFrame({
-    "campaign_id": campaign_ids,
-    "advertiser": advertisers,
-    "industry": industries,
-    "account_tier": account_tier,
-    "sales_rep": sales_rep,
-    "ad_format": ad_format,
-    "platform": platform,
-    "quarter": quarter,
-    "month": months,
-    "impressions": impressions,
-    "clicks": clicks,
-    "ctr": ctr,
-    "cpm": cpm,
-    "booked_revenue": booked_revenue,
-    "budget": budget,
-    "actual_revenue": actual_revenue,
-    "delivery_rate": delivery_rate,
-    "cost_of_sale": cost_of_sale,
-    "gross_margin": gross_margin,
-    "margin_pct": margin_pct,
-    "deal_status": deal_status,
-    "payment_status": payment_status,
-})
-
-# Save
-df.to_csv("C:/Users/Deepanshi/Desktop/ad-sales-revenue-analytics/data/ad_sales_data.csv", index=False)
-print(f"Dataset created: {len(df)} campaigns")
-print(f"\nIndustries:\n{df['industry'].value_counts()}")
-print(f"\nAd Formats:\n{df['ad_format'].value_counts()}")
-print(f"\nTotal Booked Revenue: ${df['booked_revenue'].sum():,.2f}")
-print(f"Total Actual Revenue: ${df['actual_revenue'].sum():,.2f}")
-print(f"Total Budget: ${df['budget'].sum():,.2f}")
-print(f"Avg Margin %: {df['margin_pct'].mean():.1f}%")
-print(f"Avg CPM: ${df['cpm'].mean():.2f}")
+MONTHS = [m for q in QUARTERS for m in MONTH_MAP[q]]
+DEAL_STATUSES = ["Closed Won", "In Flight", "Renewal Pending"]
+DEAL_STATUS_P = [0.60, 0.25, 0.15]
+PAYMENT_STATUSES = ["Received", "Invoiced", "Overdue", "Pending"]
+PAYMENT_STATUS_P = [0.55, 0.30, 0.15]
+
+# Per-format / per-tier adjustments as lookup arrays (indexed by code)
+CTR_BOOST = np.array([0.008, 0, 0.012, 0.010, 0.006, 0])
+CPM_FORMAT_ADJ = np.array([8, 0, 15, 10, 0, 0])
+CPM_TIER_ADJ = np.array([3, 0, 0])
+CPM_QUARTER_ADJ = np.array([0, 0, 0, 5])
+INDUSTRIES = list(dict.fromkeys(INDUSTRY.values()))
+INDUSTRY_CODES = np.array([INDUSTRIES.index(INDUSTRY[a]) for a in ADVERTISERS])
+
+
+def generate_legacy():
+    """Original 2,400-row dataset. Draw order is kept so output matches data/ad_sales_data.csv."""
+    np.random.seed(42)
+    n = 2400
+
+    # ---- SOURCE 1: Campaign & Client Info (Sales CRM) ----
+    campaign_ids = range(FIRST_CAMPAIGN_ID, FIRST_CAMPAIGN_ID + n)
+    advertisers = np.random.choice(ADVERTISERS, n)
+    industries = [INDUSTRY[a] for a in advertisers]
+    account_tier = np.random.choice(ACCOUNT_TIERS, n, p=ACCOUNT_TIER_P)
+    sales_rep = np.random.choice(SALES_REPS, n)
+
+    # ---- SOURCE 2: Campaign Performance (Ad Platform) ----
+    ad_format = np.random.choice(AD_FORMATS, n, p=AD_FORMAT_P)
+    platform = np.random.choice(PLATFORMS, n, p=PLATFORM_P)
+    quarter = np.random.choice(QUARTERS, n, p=QUARTER_P)
+    months = [np.random.choice(MONTH_MAP[q]) for q in quarter]
+
+    impressions = np.random.lognormal(mean=12, sigma=0.8, size=n).astype(int)
+    impressions = np.clip(impressions, 50000, 10000000)
+
+    # CTR influenced by ad format
+    base_ctr = np.random.normal(0.015, 0.005, n)
+    ctr_boost = np.where(ad_format == "Video Pre-Roll", 0.008, 0) + \
+                np.where(ad_format == "Homepage Takeover", 0.012, 0) + \
+                np.where(ad_format == "Sponsored Stream", 0.010, 0) + \
+                np.where(ad_format == "Interactive Overlay", 0.006, 0)
+    ctr = np.clip(base_ctr + ctr_boost, 0.002, 0.06).round(4)
+    clicks = (impressions * ctr).astype(int)
+
+    # CPM influenced by format and tier
+    base_cpm = np.random.normal(18, 5, n)
+    cpm_adj = np.where(ad_format == "Homepage Takeover", 15, 0) + \
+              np.where(ad_format == "Video Pre-Roll", 8, 0) + \
+              np.where(ad_format == "Sponsored Stream", 10, 0) + \
+              np.where(account_tier == "Enterprise", 3, 0) + \
+              np.where(quarter == "Q4 2025", 5, 0)
+    cpm = np.clip(base_cpm + cpm_adj, 5, 55).round(2)
+
+    # ---- SOURCE 3: Financial Data (Finance System) ----
+    # Booked revenue = impressions * CPM / 1000
+    booked_revenue = (impressions * cpm / 1000).round(2)
+
+    # Budget (planned revenue - slightly different from actual)
+    budget_variance_pct = np.random.normal(0, 0.12, n)
+    budget = (booked_revenue / (1 + budget_variance_pct)).round(2)
+
+    # Actual revenue recognized (may differ from booked due to delivery)
+    delivery_rate = np.clip(np.random.normal(0.92, 0.08, n), 0.60, 1.05).round(3)
+    actual_revenue = (booked_revenue * delivery_rate).round(2)
+
+    # Cost of sale
+    cost_pct = np.clip(np.random.normal(0.35, 0.10, n), 0.15, 0.65).round(3)
+    cost_of_sale = (actual_revenue * cost_pct).round(2)
+
+    # Gross margin
+    gross_margin = (actual_revenue - cost_of_sale).round(2)
+    margin_pct = np.where(actual_revenue > 0, (gross_margin / actual_revenue * 100).round(1), 0)
+
+    # Deal status
+    deal_status = np.random.choice(["Closed Won", "Closed Won", "Closed Won", "In Flight", "Renewal Pending"], n, p=[0.50, 0.05, 0.05, 0.25, 0.15])
+
+    # Payment status
+    payment_status = np.where(
+        deal_status == "In Flight", "Pending",
+        np.random.choice(["Received", "Invoiced", "Overdue"], n, p=[0.55, 0.30, 0.15])
+    )
+
+    # ---- BUILD DATAFRAME ----
+    return pd.DataFrame({
+        "campaign_id": campaign_ids,
+        "advertiser": advertisers,
+        "industry": industries,
+        "account_tier": account_tier,
+        "sales_rep": sales_rep,
+        "ad_format": ad_format,
+        "platform": platform,
+        "quarter": quarter,
+        "month": months,
+        "impressions": impressions,
+        "clicks": clicks,
+        "ctr": ctr,
+        "cpm": cpm,
+        "booked_revenue": booked_revenue,
+        "budget": budget,
+        "actual_revenue": actual_revenue,
+        "delivery_rate": delivery_rate,
+        "cost_of_sale": cost_of_sale,
+        "gross_margin": gross_margin,
+        "margin_pct": margin_pct,
+        "deal_status": deal_status,
+        "payment_status": payment_status,
+    })
+
+
+def generate_chunk(seed, chunk_index, chunk_size, total_rows):
+    """Generate one chunk of the scaled dataset with its own Generator stream.
+
+    The stream depends only on (seed, chunk_index), never on which worker runs it.
+    All categorical lookups are integer-code indexing into label arrays.
+    """
+    start = chunk_index * chunk_size
+    n = min(chunk_size, total_rows - start)
+    rng = np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(chunk_index,)))
+
+    # ---- SOURCE 1: Campaign & Client Info (Sales CRM) ----
+    campaign_ids = np.arange(FIRST_CAMPAIGN_ID + start, FIRST_CAMPAIGN_ID + start + n, dtype=np.int64)
+    adv = rng.integers(0, len(ADVERTISERS), n)
+    tier = rng.choice(len(ACCOUNT_TIERS), n, p=ACCOUNT_TIER_P)
+    rep = rng.integers(0, len(SALES_REPS), n)
+
+    # ---- SOURCE 2: Campaign Performance (Ad Platform) ----
+    fmt = rng.choice(len(AD_FORMATS), n, p=AD_FORMAT_P)
+    plat = rng.choice(len(PLATFORMS), n, p=PLATFORM_P)
+    qtr = rng.choice(len(QUARTERS), n, p=QUARTER_P)
+    month = qtr * 3 + rng.integers(0, 3, n)
+
+    impressions = np.clip(rng.lognormal(mean=12, sigma=0.8, size=n).astype(np.int64), 50000, 10000000)
+
+    ctr = np.clip(rng.normal(0.015, 0.005, n) + CTR_BOOST[fmt], 0.002, 0.06).round(4)
+    clicks = (impressions * ctr).astype(np.int64)
+
+    cpm_adj = CPM_FORMAT_ADJ[fmt] + CPM_TIER_ADJ[tier] + CPM_QUARTER_ADJ[qtr]
+    cpm = np.clip(rng.normal(18, 5, n) + cpm_adj, 5, 55).round(2)
+
+    # ---- SOURCE 3: Financial Data (Finance System) ----
+    booked_revenue = (impressions * cpm / 1000).round(2)
+    budget = (booked_revenue / (1 + rng.normal(0, 0.12, n))).round(2)
+    delivery_rate = np.clip(rng.normal(0.92, 0.08, n), 0.60, 1.05).round(3)
+    actual_revenue = (booked_revenue * delivery_rate).round(2)
+    cost_pct = np.clip(rng.normal(0.35, 0.10, n), 0.15, 0.65).round(3)
+    cost_of_sale = (actual_revenue * cost_pct).round(2)
+    gross_margin = (actual_revenue - cost_of_sale).round(2)
+    margin_pct = np.divide(gross_margin * 100, actual_revenue, out=np.zeros(n), where=actual_revenue > 0).round(1)
+
+    deal = rng.choice(len(DEAL_STATUSES), n, p=DEAL_STATUS_P)
+    pay = np.where(deal == DEAL_STATUSES.index("In Flight"), PAYMENT_STATUSES.index("Pending"),
+                   rng.choice(3, n, p=PAYMENT_STATUS_P))
+
+    return pd.DataFrame({
+        "campaign_id": campaign_ids,
+        "advertiser": np.asarray(ADVERTISERS, dtype=object)[adv],
+        "industry": np.asarray(INDUSTRIES, dtype=object)[INDUSTRY_CODES[adv]],
+        "account_tier": np.asarray(ACCOUNT_TIERS, dtype=object)[tier],
+        "sales_rep": np.asarray(SALES_REPS, dtype=object)[rep],
+        "ad_format": np.asarray(AD_FORMATS, dtype=object)[fmt],
+        "platform": np.asarray(PLATFORMS, dtype=object)[plat],
+        "quarter": np.asarray(QUARTERS, dtype=object)[qtr],
+        "month": np.asarray(MONTHS, dtype=object)[month],
+        "impressions": impressions,
+        "clicks": clicks,
+        "ctr": ctr,
+        "cpm": cpm,
+        "booked_revenue": booked_revenue,
+        "budget": budget,
+        "actual_revenue": actual_revenue,
+        "delivery_rate": delivery_rate,
+        "cost_of_sale": cost_of_sale,
+        "gross_margin": gross_margin,
+        "margin_pct": margin_pct,
+        "deal_status": np.asarray(DEAL_STATUSES, dtype=object)[deal],
+        "payment_status": np.asarray(PAYMENT_STATUSES, dtype=object)[pay],
+    }, columns=COLUMNS)
+
+
+def _write_chunk(args):
+    seed, chunk_index, chunk_size, total_rows, out_dir = args
+    df = generate_chunk(seed, chunk_index, chunk_size, total_rows)
+    path = os.path.join(out_dir, f"part-{chunk_index:05d}.csv")
+    df.to_csv(path, index=False)
+    return chunk_index, len(df), df["actual_revenue"].sum(), df["budget"].sum()
+
+
+def generate_partitioned(rows, out_dir, chunk_size=1_000_000, workers=None, seed=42):
+    """Write `rows` campaigns to out_dir/part-NNNNN.csv using a process pool.
+
+    Returns (rows_written, total_actual_revenue, total_budget).
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    n_chunks = -(-rows // chunk_size)
+    tasks = ((seed, i, chunk_size, rows, out_dir) for i in range(n_chunks))
+    written, total_actual, total_budget = 0, 0.0, 0.0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for chunk_index, n, actual, budget in pool.map(_write_chunk, tasks):
+            written += n
+            total_actual += actual
+            total_budget += budget
+            print(f"  part-{chunk_index:05d}.csv  {n:>12,} rows  ({written:,}/{rows:,})")
+    return written, total_actual, total_budget
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate the simulated ad sales dataset.")
+    parser.add_argument("--rows", type=int, default=None,
+                        help="Scaled mode: total campaigns to generate (omit for the original 2,400-row dataset)")
+    parser.add_argument("--chunk-size", type=int, default=1_000_000, help="Rows per chunk / output partition")
+    parser.add_argument("--workers", type=int, default=None, help="Process pool size (default: CPU count)")
+    parser.add_argument("--seed", type=int, default=42, help="Root seed for per-chunk Generator streams")
+    parser.add_argument("--out-dir", default=os.path.join(PROJECT_DIR, "data", "scale"),
+                        help="Directory for part-NNNNN.csv partitions in scaled mode")
+    args = parser.parse_args()
+
+    if args.rows is None:
+        df = generate_legacy()
+        df.to_csv(DEFAULT_CSV, index=False)
+        print(f"Dataset created: {len(df)} campaigns")
+        print(f"\nIndustries:\n{df['industry'].value_counts()}")
+        print(f"\nAd Formats:\n{df['ad_format'].value_counts()}")
+        print(f"\nTotal Booked Revenue: ${df['booked_revenue'].sum():,.2f}")
+        print(f"Total Actual Revenue: ${df['actual_revenue'].sum():,.2f}")
+        print(f"Total Budget: ${df['budget'].sum():,.2f}")
+        print(f"Avg Margin %: {df['margin_pct'].mean():.1f}%")
+        print(f"Avg CPM: ${df['cpm'].mean():.2f}")
+        return
+
+    start = time.perf_counter()
+    print(f"Generating {args.rows:,} campaigns in chunks of {args.chunk_size:,} -> {args.out_dir}")
+    written, total_actual, total_budget = generate_partitioned(
+        args.rows, args.out_dir, chunk_size=args.chunk_size, workers=args.workers, seed=args.seed
+    )
+    elapsed = time.perf_counter() - start
+    print(f"\nDataset created: {written:,} campaigns in {elapsed:.1f}s ({written / elapsed:,.0f} rows/s)")
+    print(f"Total Actual Revenue: ${total_actual:,.2f}")
+    print(f"Total Budget: ${total_budget:,.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,475 @@
+"""
+Ingestion of the three source extracts and their join on campaign_id.
+
+The dataset is a merge of three systems, each exporting its own file keyed by
+campaign_id:
+
+    crm.csv          Sales CRM: advertiser, industry, account_tier, sales_rep, deal_status
+    ad_platform.csv  Ad Platform: ad_format, platform, quarter, month, impressions, clicks, ctr, cpm
+    finance.csv      Finance: booked_revenue, budget, actual_revenue, delivery_rate,
+                     cost_of_sale, gross_margin, margin_pct, payment_status
+
+The extracts are parsed with pyarrow (typed, multi-threaded) on one thread per source
+and joined with one of two strategies:
+
+  hash   Reads the three extracts whole, builds a hash index of the Ad Platform and
+         Finance keys and probes it with the CRM rows. Fastest; memory grows with the
+         data. Output is in CRM file order.
+  merge  Streaming sort-merge join. Each extract is read in chunks that are sorted on
+         campaign_id and spilled as runs to a temporary directory; the runs of all three
+         sources are then merged in key order a window at a time (a window holds every
+         row below the smallest key still buffered by any run, so each key's rows are
+         complete in it), joined and appended to the output. Memory is bounded by
+         `chunksize` while sorting and by runs x `batch_rows` while merging. Output is
+         sorted on campaign_id.
+
+Both keep the first row of a key that repeats within a source (in file order), emit
+only keys present in all three sources, and report the rows read, the duplicate
+rows/keys per source and the orphaned keys (present in some sources but not all), with
+a sample of the smallest ids of each. The merged file has the project CSV's columns.
+
+    python scripts/ingest.py split --csv data/ad_sales_data.csv --orphans 0.01 --duplicates 0.01
+    python scripts/ingest.py join --strategy merge --out data/scale/merged.csv --check
+"""
+
+import argparse
+import functools
+import json
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.csv as pacsv
+
+from data_access import COLUMNS, DEFAULT_CSV, PROJECT_DIR, SCHEMA
+
+KEY = "campaign_id"
+SOURCES = {
+    "crm": [KEY, "advertiser", "industry", "account_tier", "sales_rep", "deal_status"],
+    "ad_platform": [KEY, "ad_format", "platform", "quarter", "month", "impressions", "clicks", "ctr", "cpm"],
+    "finance": [KEY, "booked_revenue", "budget", "actual_revenue", "delivery_rate", "cost_of_sale",
+                "gross_margin", "margin_pct", "payment_status"],
+}
+STRATEGIES = ("hash", "merge")
+DEFAULT_SOURCES_DIR = os.path.join(PROJECT_DIR, "data", "scale", "sources")
+SAMPLE_SIZE = 5
+
+_ARROW_TYPES = {"int64": pa.int64(), "float64": pa.float64(), "category": pa.string()}
+
+
+def source_path(sources_dir, name):
+    return os.path.join(sources_dir, f"{name}.csv")
+
+
+def _convert_options(columns):
+    return pacsv.ConvertOptions(column_types={c: _ARROW_TYPES[SCHEMA[c]] for c in columns},
+                                include_columns=columns)
+
+
+def read_source(path, columns):
+    """One whole extract as an Arrow table."""
+    return pacsv.read_csv(path, convert_options=_convert_options(columns))
+
+
+def iter_source(path, columns, chunksize):
+    """An extract as Arrow tables of about `chunksize` rows, in file order."""
+    reader = pacsv.open_csv(path, convert_options=_convert_options(columns))
+    pending, rows = [], 0
+    for batch in reader:
+        pending.append(batch)
+        rows += batch.num_rows
+        if rows >= chunksize:
+            yield pa.Table.from_batches(pending)
+            pending, rows = [], 0
+    if pending:
+        yield pa.Table.from_batches(pending)
+
+
+def _assemble(parts):
+    """Merged table (project column order) from row-aligned per-source tables."""
+    columns = {}
+    for name, table in parts.items():
+        for column in SOURCES[name]:
+            columns.setdefault(column, table.column(column))
+    return pa.table({c: columns[c] for c in COLUMNS})
+
+
+class JoinReport:
+    """Rows read, duplicates and orphans of a join; reports of disjoint key ranges add up."""
+
+    def __init__(self):
+        self.rows = dict.fromkeys(SOURCES, 0)
+        self.duplicate_rows = dict.fromkeys(SOURCES, 0)   # rows dropped as repeats of an earlier key
+        self.duplicate_keys = dict.fromkeys(SOURCES, 0)   # keys with more than one row
+        self.missing = dict.fromkeys(SOURCES, 0)          # orphaned keys absent from each source
+        self.orphans = 0
+        self.merged = 0
+        # Order-independent digest of the output, to compare strategies without sorting
+        self.checksums = {"campaign_id": 0, "impressions": 0, "actual_revenue_cents": 0}
+        self.orphan_sample = []
+        self.duplicate_sample = []
+
+    def add_orphans(self, ids):
+        self.orphans += len(ids)
+        self.orphan_sample = sorted(self.orphan_sample + np.sort(ids)[:SAMPLE_SIZE].tolist())[:SAMPLE_SIZE]
+
+    def add_duplicates(self, name, dropped_rows, ids):
+        self.duplicate_rows[name] += int(dropped_rows)
+        self.duplicate_keys[name] += len(ids)
+        sample = sorted(set(self.duplicate_sample) | set(np.sort(ids)[:SAMPLE_SIZE].tolist()))
+        self.duplicate_sample = sample[:SAMPLE_SIZE]
+
+    def add_merged(self, table):
+        self.merged += table.num_rows
+        self.checksums["campaign_id"] += int(table.column(KEY).to_numpy().sum())
+        self.checksums["impressions"] += int(table.column("impressions").to_numpy().sum())
+        cents = np.rint(table.column("actual_revenue").to_numpy() * 100).astype(np.int64)
+        self.checksums["actual_revenue_cents"] += int(cents.sum())
+
+    def as_dict(self):
+        return dict(vars(self))
+
+    def lines(self):
+        lines = [f"{'Source':<12} {'Rows':>14} {'Dup rows':>10} {'Dup keys':>10} {'Missing keys':>13}"]
+        for name in SOURCES:
+            lines.append(f"{name:<12} {self.rows[name]:>14,} {self.duplicate_rows[name]:>10,} "
+                         f"{self.duplicate_keys[name]:>10,} {self.missing[name]:>13,}")
+        lines.append(f"Merged campaigns: {self.merged:,}   Orphaned keys: {self.orphans:,}")
+        if self.orphan_sample:
+            lines.append(f"  orphaned ids, e.g.: {', '.join(map(str, self.orphan_sample))}")
+        if self.duplicate_sample:
+            lines.append(f"  duplicated ids, e.g.: {', '.join(map(str, self.duplicate_sample))}")
+        return lines
+
+
+# ---- Hash join ----
+
+def _first_rows(name, table, report):
+    """`table` without repeated keys (first row kept) and its key array."""
+    import pandas as pd
+
+    ids = table.column(KEY).to_numpy()
+    repeated = pd.Series(ids).duplicated().to_numpy()
+    if repeated.any():
+        report.add_duplicates(name, repeated.sum(), pd.unique(ids[repeated]))
+        table = table.filter(pa.array(~repeated))
+        ids = ids[~repeated]
+    return table, ids
+
+
+def hash_join(tables, report=None):
+    """Inner join of whole per-source tables: hash indexes on Ad Platform and Finance, probed by CRM."""
+    import pandas as pd
+
+    report = report or JoinReport()
+    tables, ids = dict(tables), {}
+    for name in SOURCES:
+        report.rows[name] += tables[name].num_rows
+        tables[name], ids[name] = _first_rows(name, tables[name], report)
+
+    index = {name: pd.Index(ids[name]) for name in SOURCES}
+    ad = index["ad_platform"].get_indexer(ids["crm"])
+    fin = index["finance"].get_indexer(ids["crm"])
+    matched = (ad >= 0) & (fin >= 0)
+
+    # Orphans: CRM keys without a match, then Ad Platform keys not in the CRM, then
+    # Finance keys in neither; each orphaned key is counted once
+    crm_orphans = ~matched
+    report.missing["ad_platform"] += int((crm_orphans & (ad < 0)).sum())
+    report.missing["finance"] += int((crm_orphans & (fin < 0)).sum())
+    ad_only = ids["ad_platform"][index["crm"].get_indexer(ids["ad_platform"]) < 0]
+    fin_only = ids["finance"][(index["crm"].get_indexer(ids["finance"]) < 0)
+                              & (index["ad_platform"].get_indexer(ids["finance"]) < 0)]
+    report.missing["crm"] += len(ad_only) + len(fin_only)
+    report.missing["finance"] += int((index["finance"].get_indexer(ad_only) < 0).sum())
+    report.missing["ad_platform"] += len(fin_only)
+    report.add_orphans(np.concatenate([ids["crm"][crm_orphans], ad_only, fin_only]))
+
+    rows = np.flatnonzero(matched)
+    merged = _assemble({
+        "crm": tables["crm"].take(pa.array(rows)),
+        "ad_platform": tables["ad_platform"].take(pa.array(ad[rows])),
+        "finance": tables["finance"].take(pa.array(fin[rows])),
+    })
+    report.add_merged(merged)
+    return merged, report
+
+
+def read_sources(sources_dir):
+    """The three extracts read concurrently, one thread each."""
+    with ThreadPoolExecutor(max_workers=len(SOURCES)) as pool:
+        futures = {name: pool.submit(read_source, source_path(sources_dir, name), columns)
+                   for name, columns in SOURCES.items()}
+        return {name: future.result() for name, future in futures.items()}
+
+
+# ---- Streaming sort-merge join ----
+
+def _sorted_on_key(table):
+    order = np.argsort(table.column(KEY).to_numpy(), kind="stable")
+    return table.take(pa.array(order))
+
+
+def spill_sorted_runs(path, columns, run_dir, prefix, chunksize=1_000_000, batch_rows=16_384):
+    """Sort an extract chunk by chunk and write each chunk as an Arrow run file; returns the paths."""
+    paths = []
+    for i, chunk in enumerate(iter_source(path, columns, chunksize)):
+        run_path = os.path.join(run_dir, f"{prefix}-{i:05d}.arrow")
+        chunk = _sorted_on_key(chunk)
+        with pa.OSFile(run_path, "wb") as sink, pa.ipc.new_file(sink, chunk.schema) as writer:
+            writer.write_table(chunk, max_chunksize=batch_rows)
+        paths.append(run_path)
+    return paths
+
+
+def _iter_run(path):
+    """Record batches of a run file, read one at a time."""
+    with pa.OSFile(path) as source:
+        reader = pa.ipc.open_file(source)
+        for i in range(reader.num_record_batches):
+            batch = reader.get_batch(i)
+            yield pa.Table.from_batches([batch]), batch.column(KEY).to_numpy()
+
+
+def merge_windows(streams):
+    """Merge key-sorted streams of (table, keys) a window at a time.
+
+    Yields one table per stream holding its rows with keys below the smallest last key
+    buffered by a stream that is not exhausted; no later row can have such a key, so
+    every key's rows (in all streams) arrive in a single window.
+    """
+    buffers = [None] * len(streams)
+    live = [True] * len(streams)
+
+    def pull(i):
+        for table, keys in streams[i]:
+            if len(keys):
+                if buffers[i] is None or not len(buffers[i][1]):
+                    buffers[i] = (table, keys)
+                else:
+                    buffers[i] = (pa.concat_tables([buffers[i][0], table]), np.concatenate([buffers[i][1], keys]))
+                return
+        live[i] = False
+
+    for i in range(len(streams)):
+        pull(i)
+    while True:
+        for i in range(len(streams)):
+            if live[i] and not len(buffers[i][1]):
+                pull(i)
+        bounds = [buffers[i][1][-1] for i in range(len(streams)) if live[i]]
+        bound = min(bounds) if bounds else None
+        cuts = [0 if b is None else len(b[1]) if bound is None else int(np.searchsorted(b[1], bound))
+                for b in buffers]
+        if bound is not None and not any(cuts):
+            # Every buffered key equals the bound: read further until a larger key shows up
+            for i in range(len(streams)):
+                if live[i] and buffers[i][1][-1] == bound:
+                    pull(i)
+            continue
+        window = []
+        for i, cut in enumerate(cuts):
+            if buffers[i] is None:
+                window.append(None)
+                continue
+            table, keys = buffers[i]
+            window.append(table.slice(0, cut))
+            buffers[i] = (table.slice(cut), keys[cut:])
+        yield window
+        if bound is None:
+            return
+
+
+def _join_sorted(tables, report):
+    """Inner join of key-sorted per-source tables in which every key's rows are complete."""
+    firsts, ids = {}, {}
+    for name, table in tables.items():
+        keys = table.column(KEY).to_numpy()
+        report.rows[name] += len(keys)
+        first = np.ones(len(keys), dtype=bool)
+        first[1:] = keys[1:] != keys[:-1]
+        firsts[name] = np.flatnonzero(first)
+        ids[name] = keys[firsts[name]]
+        if len(firsts[name]) < len(keys):
+            sizes = np.diff(np.append(firsts[name], len(keys)))
+            report.add_duplicates(name, len(keys) - len(firsts[name]), ids[name][sizes > 1])
+
+    common = functools.reduce(lambda a, b: np.intersect1d(a, b, assume_unique=True), ids.values())
+    everything = functools.reduce(np.union1d, ids.values())
+    orphans = np.setdiff1d(everything, common, assume_unique=True)
+    if len(orphans):
+        report.add_orphans(orphans)
+        for name in SOURCES:
+            report.missing[name] += len(np.setdiff1d(orphans, ids[name], assume_unique=True))
+    merged = _assemble({name: tables[name].take(pa.array(firsts[name][np.searchsorted(ids[name], common)]))
+                        for name in SOURCES})
+    report.add_merged(merged)
+    return merged
+
+
+def merge_join(sources_dir, write, report=None, chunksize=1_000_000, batch_rows=16_384, tmp_dir=None):
+    """Streaming sort-merge join of the extracts; `write(table)` receives the output in key order."""
+    report = report or JoinReport()
+    with tempfile.TemporaryDirectory(prefix="ingest-runs-", dir=tmp_dir) as run_dir:
+        with ThreadPoolExecutor(max_workers=len(SOURCES)) as pool:
+            futures = {name: pool.submit(spill_sorted_runs, source_path(sources_dir, name), columns, run_dir,
+                                         name, chunksize, batch_rows)
+                       for name, columns in SOURCES.items()}
+            runs = [(name, path) for name, future in futures.items() for path in future.result()]
+        empty = {name: pa.table({c: pa.array([], _ARROW_TYPES[SCHEMA[c]]) for c in columns})
+                 for name, columns in SOURCES.items()}
+        for window in merge_windows([_iter_run(path) for _, path in runs]):
+            parts = {name: [] for name in SOURCES}
+            for (name, _), table in zip(runs, window):
+                if table is not None and table.num_rows:
+                    parts[name].append(table)
+            if not any(parts.values()):
+                continue
+            # Runs of one source are in file order, so a stable sort keeps the first row of each key first
+            tables = {name: _sorted_on_key(pa.concat_tables(parts[name])) if parts[name] else empty[name]
+                      for name in SOURCES}
+            write(_join_sorted(tables, report))
+    return report
+
+
+# ---- Driver ----
+
+def ingest(sources_dir=DEFAULT_SOURCES_DIR, out_path=None, strategy="merge", chunksize=1_000_000):
+    """Join the extracts in `sources_dir` and write the merged CSV to `out_path`; returns the report."""
+    out_path = out_path or os.path.join(sources_dir, "merged.csv")
+    tmp_path = out_path + ".tmp"
+    if strategy == "hash":
+        merged, report = hash_join(read_sources(sources_dir))
+        pacsv.write_csv(merged, tmp_path)
+    elif strategy == "merge":
+        with pacsv.CSVWriter(tmp_path, pa.schema([(c, _ARROW_TYPES[SCHEMA[c]]) for c in COLUMNS])) as writer:
+            report = merge_join(sources_dir, writer.write_table, chunksize=chunksize,
+                                tmp_dir=os.path.dirname(os.path.abspath(out_path)))
+    else:
+        raise ValueError(f"Unknown join strategy {strategy!r}; expected one of {STRATEGIES}")
+    os.replace(tmp_path, out_path)
+    return report
+
+
+def split_sources(csv_path, sources_dir, orphans=0.0, duplicates=0.0, shuffle=True, seed=42, chunksize=1_000_000):
+    """Write the three extracts of a merged CSV, chunk by chunk.
+
+    Each chunk's rows are shuffled independently per source (the extracts are not in key
+    order), a fraction `orphans` of the campaigns is left out of one randomly chosen
+    source and a fraction `duplicates` is exported twice by one source. Returns the rows
+    written per source.
+    """
+    os.makedirs(sources_dir, exist_ok=True)
+    written = dict.fromkeys(SOURCES, 0)
+    writers = {}
+    try:
+        for i, chunk in enumerate(iter_source(csv_path, COLUMNS, chunksize)):
+            rng = np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(i,)))
+            n = chunk.num_rows
+            drop_from = np.where(rng.random(n) < orphans, rng.integers(0, len(SOURCES), n), -1)
+            repeat_in = np.where(rng.random(n) < duplicates, rng.integers(0, len(SOURCES), n), -1)
+            for s, (name, columns) in enumerate(SOURCES.items()):
+                rows = np.flatnonzero(drop_from != s)
+                rows = np.concatenate([rows, np.flatnonzero((repeat_in == s) & (drop_from != s))])
+                if shuffle:
+                    rng.shuffle(rows)
+                table = chunk.select(columns).take(pa.array(rows))
+                if name not in writers:
+                    writers[name] = pacsv.CSVWriter(source_path(sources_dir, name), table.schema)
+                writers[name].write_table(table)
+                written[name] += table.num_rows
+    finally:
+        for writer in writers.values():
+            writer.close()
+    return written
+
+
+def compare_with_reference(merged_path, reference_csv, report):
+    """Check a merged file against the CSV the extracts were split from.
+
+    Every merged row must equal the reference row with its campaign_id, and every
+    reference campaign missing from the output must have been reported as an orphan.
+    """
+    merged = read_source(merged_path, COLUMNS)
+    merged = _sorted_on_key(merged)
+    reference = _sorted_on_key(read_source(reference_csv, COLUMNS))
+    ref_ids = reference.column(KEY).to_numpy()
+    ids = merged.column(KEY).to_numpy()
+    positions = np.minimum(np.searchsorted(ref_ids, ids), len(ref_ids) - 1)
+    found = bool(np.array_equal(ref_ids[positions], ids))
+    return {
+        "unique keys": len(np.unique(ids)) == len(ids) == report.merged,
+        "rows match": found and reference.take(pa.array(positions)).equals(merged),
+        "orphans": report.orphans == len(ref_ids) - len(ids),
+    }
+
+
+def _peak_rss_mb():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Split, ingest and join the source extracts.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    split = commands.add_parser("split", help="Write the three extracts of a merged CSV")
+    split.add_argument("--csv", default=DEFAULT_CSV)
+    split.add_argument("--out-dir", default=DEFAULT_SOURCES_DIR)
+    split.add_argument("--orphans", type=float, default=0.0, help="Fraction of campaigns left out of one source")
+    split.add_argument("--duplicates", type=float, default=0.0, help="Fraction of campaigns exported twice")
+    split.add_argument("--no-shuffle", action="store_true", help="Keep every extract in key order")
+    split.add_argument("--seed", type=int, default=42)
+    split.add_argument("--chunksize", type=int, default=1_000_000)
+
+    join = commands.add_parser("join", help="Join the extracts on campaign_id")
+    join.add_argument("--sources", default=DEFAULT_SOURCES_DIR, help="Directory with crm/ad_platform/finance.csv")
+    join.add_argument("--out", default=None, help="Merged CSV (default: merged.csv in the sources directory)")
+    join.add_argument("--strategy", choices=STRATEGIES, default="merge")
+    join.add_argument("--chunksize", type=int, default=1_000_000, help="Rows per sorted run (merge strategy)")
+    join.add_argument("--check", nargs="?", const=DEFAULT_CSV, default=None, metavar="CSV",
+                      help="Compare the output with the CSV the extracts were split from")
+    join.add_argument("--json", action="store_true", help="Print the report and timings as one JSON line")
+    args = parser.parse_args()
+
+    if args.command == "split":
+        written = split_sources(args.csv, args.out_dir, args.orphans, args.duplicates, not args.no_shuffle,
+                                args.seed, args.chunksize)
+        for name, rows in written.items():
+            print(f"  {source_path(args.out_dir, name)}  {rows:>14,} rows")
+        return
+
+    start = time.perf_counter()
+    out_path = args.out or os.path.join(args.sources, "merged.csv")
+    report = ingest(args.sources, out_path, args.strategy, args.chunksize)
+    wall = time.perf_counter() - start
+    input_bytes = sum(os.path.getsize(source_path(args.sources, name)) for name in SOURCES)
+    if args.json:
+        print(json.dumps({"strategy": args.strategy, "wall_s": wall, "input_bytes": input_bytes,
+                          "peak_rss_mb": _peak_rss_mb(), "report": report.as_dict()}))
+    else:
+        rows = sum(report.rows.values())
+        print(f"{args.strategy} join -> {out_path} in {wall:.2f}s "
+              f"({rows / wall:,.0f} source rows/s, {input_bytes / wall / 1e6:,.1f} MB/s)")
+        print("\n".join(report.lines()))
+    if args.check:
+        checks = compare_with_reference(out_path, args.check, report)
+        if not args.json:
+            print(f"\nCheck against {args.check}:")
+            for name, ok in checks.items():
+                print(f"  {name:<12} {'ok' if ok else 'FAIL'}")
+        if not all(checks.values()):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Headline KPIs computed directly on an Arrow table with pyarrow.compute.
+
+Used by the `kpis` command of ad_sales_analysis.py, which must start fast: this module
+imports neither pandas nor numpy-heavy analysis code.
+"""
+
+import pyarrow.compute as pc
+
+
+def _sum(table, column):
+    return pc.sum(table.column(column)).as_py()
+
+
+def _mean(table, column):
+    return pc.mean(table.column(column)).as_py()
+
+
+def _values(table, column):
+    """Column with dictionary encoding resolved to plain values."""
+    col = table.column(column)
+    return col.cast(col.type.value_type) if hasattr(col.type, "value_type") else col
+
+
+def _share(table, column, value):
+    """Percentage of rows where `column == value`.
+
+    Uses value_counts rather than pc.equal: turning a Python str into an Arrow scalar
+    imports pandas, which would cost more than the whole computation.
+    """
+    counts = {row["values"]: row["counts"] for row in pc.value_counts(table.column(column)).to_pylist()}
+    return counts.get(value, 0) / table.num_rows * 100
+
+
+def compute_kpis(table):
+    """The KPIs printed by sections 1 and 5 of the analysis, from a (memory-mapped) Arrow table."""
+    total_actual = _sum(table, "actual_revenue")
+    total_budget = _sum(table, "budget")
+    total_impressions = _sum(table, "impressions")
+    total_clicks = _sum(table, "clicks")
+    return {
+        "campaigns": table.num_rows,
+        "advertisers": pc.count_distinct(_values(table, "advertiser")).as_py(),
+        "total_booked": _sum(table, "booked_revenue"),
+        "total_actual": total_actual,
+        "total_budget": total_budget,
+        "total_margin": _sum(table, "gross_margin"),
+        "budget_variance_pct": (total_actual - total_budget) / total_budget * 100,
+        "revenue_per_campaign": _mean(table, "actual_revenue"),
+        "avg_margin_pct": _mean(table, "margin_pct"),
+        "avg_cpm": _mean(table, "cpm"),
+        "overall_ctr": total_clicks / total_impressions * 100,
+        "avg_delivery": _mean(table, "delivery_rate") * 100,
+        "win_rate": _share(table, "deal_status", "Closed Won"),
+        "overdue_pct": _share(table, "payment_status", "Overdue"),
+        "total_impressions": total_impressions,
+        "total_clicks": total_clicks,
+    }
@@ -0,0 +1,219 @@
+"""
+Incrementally maintained rollups for daily append/update workloads.
+
+The quarterly, industry, tier, format, rep and platform rollups are persisted in a
+SQLite file together with each campaign's contributing columns, keyed by
+campaign_id. A delta batch (upserted rows plus deleted campaign_ids) is applied by
+looking up the old contribution of every touched campaign, subtracting it, adding
+the new one, and replacing the stored row - all in one transaction. Refresh cost is
+proportional to the delta, not the table.
+
+    python scripts/materialized.py build
+    python scripts/materialized.py apply delta.csv        # rows with an optional `op` column
+    python scripts/materialized.py show quarter
+    python scripts/materialized.py verify                 # compare with a full recompute
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+
+import numpy as np
+import pandas as pd
+
+from data_access import DEFAULT_CSV, SCHEMA, CampaignDataset, read_csv_typed
+
+DEFAULT_DB = os.path.join(os.path.dirname(DEFAULT_CSV), ".cache", "rollups.sqlite")
+
+ROLLUP_DIMENSIONS = ["quarter", "industry", "account_tier", "ad_format", "sales_rep", "platform"]
+SUM_MEASURES = ["booked_revenue", "actual_revenue", "budget", "gross_margin",
+                "margin_pct", "cpm", "ctr", "delivery_rate"]
+FLAG_MEASURES = {"closed_won": ("deal_status", "Closed Won"), "overdue": ("payment_status", "Overdue")}
+ROW_COLUMNS = ["campaign_id"] + ROLLUP_DIMENSIONS + SUM_MEASURES + ["deal_status", "payment_status"]
+MEASURES = ["campaigns"] + SUM_MEASURES + list(FLAG_MEASURES)
+
+
+def _contributions(rows, sign):
+    """Per-(dimension, value) measure totals of `rows`, multiplied by `sign`."""
+    if rows.empty:
+        return pd.DataFrame(columns=["dimension", "value"] + MEASURES)
+    values = rows[SUM_MEASURES].astype(np.float64).copy()
+    values["campaigns"] = 1
+    for flag, (column, label) in FLAG_MEASURES.items():
+        values[flag] = (rows[column].astype(object) == label).astype(np.int64)
+    parts = []
+    for dim in ROLLUP_DIMENSIONS:
+        part = values.groupby(rows[dim].astype(object).to_numpy()).sum()[MEASURES]
+        part.insert(0, "value", part.index)
+        part.insert(0, "dimension", dim)
+        parts.append(part)
+    out = pd.concat(parts, ignore_index=True)
+    out[MEASURES] = out[MEASURES] * sign
+    return out
+
+
+class MaterializedRollups:
+    """Persisted rollups plus per-campaign contributions in one SQLite file."""
+
+    def __init__(self, path=DEFAULT_DB):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self._create_schema()
+
+    def close(self):
+        self.conn.close()
+
+    def _create_schema(self):
+        row_cols = ", ".join(
+            f"{c} {'INTEGER PRIMARY KEY' if c == 'campaign_id' else 'REAL' if SCHEMA[c] == 'float64' else 'TEXT'}"
+            for c in ROW_COLUMNS
+        )
+        measure_cols = ", ".join(f"{m} {'REAL' if m in SUM_MEASURES else 'INTEGER'} NOT NULL" for m in MEASURES)
+        self.conn.executescript(f"""
+            CREATE TABLE IF NOT EXISTS campaigns ({row_cols});
+            CREATE TABLE IF NOT EXISTS rollups (
+                dimension TEXT NOT NULL, value TEXT NOT NULL, {measure_cols},
+                PRIMARY KEY (dimension, value)
+            );
+        """)
+
+    def rebuild(self, df):
+        """Drop everything and materialize from a full frame."""
+        rows = df[ROW_COLUMNS]
+        with self.conn:
+            self.conn.execute("DELETE FROM campaigns")
+            self.conn.execute("DELETE FROM rollups")
+            self._insert_rows(rows)
+            self._add(_contributions(rows, 1))
+        return len(rows)
+
+    def _insert_rows(self, rows):
+        placeholders = ", ".join("?" * len(ROW_COLUMNS))
+        records = rows.astype(object).where(rows.notna(), None).itertuples(index=False, name=None)
+        self.conn.executemany(f"INSERT INTO campaigns ({', '.join(ROW_COLUMNS)}) VALUES ({placeholders})", records)
+
+    def _add(self, contrib):
+        if contrib.empty:
+            return
+        totals = contrib.groupby(["dimension", "value"], sort=False)[MEASURES].sum().reset_index()
+        cols = ", ".join(["dimension", "value"] + MEASURES)
+        updates = ", ".join(f"{m} = {m} + excluded.{m}" for m in MEASURES)
+        self.conn.executemany(
+            f"INSERT INTO rollups ({cols}) VALUES ({', '.join('?' * (len(MEASURES) + 2))}) "
+            f"ON CONFLICT (dimension, value) DO UPDATE SET {updates}",
+            totals.astype(object).itertuples(index=False, name=None),
+        )
+        self.conn.execute("DELETE FROM rollups WHERE campaigns = 0")
+
+    def _existing(self, campaign_ids):
+        """Stored rows for the given ids, via a temp-table join on the primary key."""
+        self.conn.execute("CREATE TEMP TABLE IF NOT EXISTS delta_ids (campaign_id INTEGER PRIMARY KEY)")
+        self.conn.execute("DELETE FROM delta_ids")
+        self.conn.executemany("INSERT OR IGNORE INTO delta_ids VALUES (?)", ((int(i),) for i in campaign_ids))
+        return pd.read_sql_query(
+            f"SELECT {', '.join('c.' + c for c in ROW_COLUMNS)} FROM campaigns c JOIN delta_ids USING (campaign_id)",
+            self.conn,
+        )
+
+    def apply_delta(self, upserts=None, deletes=()):
+        """Apply inserted/updated rows (`upserts`, full schema) and deleted campaign_ids.
+
+        Returns counts of inserted, updated and deleted campaigns.
+        """
+        upserts = pd.DataFrame(columns=ROW_COLUMNS) if upserts is None else upserts[ROW_COLUMNS]
+        if upserts["campaign_id"].duplicated().any():
+            raise ValueError("Delta batch has duplicate campaign_id values among upserts")
+        upsert_ids = set(upserts["campaign_id"].astype(np.int64))
+        delete_ids = {int(i) for i in deletes}
+        if upsert_ids & delete_ids:
+            raise ValueError("A campaign_id cannot be both upserted and deleted in one batch")
+
+        with self.conn:
+            old = self._existing(upsert_ids | delete_ids)
+            old_ids = set(old["campaign_id"])
+            self._add(pd.concat([_contributions(old, -1), _contributions(upserts, 1)], ignore_index=True))
+            self.conn.executemany("DELETE FROM campaigns WHERE campaign_id = ?", ((i,) for i in old_ids))
+            self._insert_rows(upserts)
+        return {
+            "inserted": len(upsert_ids - old_ids),
+            "updated": len(upsert_ids & old_ids),
+            "deleted": len(delete_ids & old_ids),
+            "missing_deletes": len(delete_ids - old_ids),
+        }
+
+    def rollup(self, dimension):
+        """One materialized rollup with the same totals/means the analysis prints."""
+        df = pd.read_sql_query(
+            f"SELECT value, {', '.join(MEASURES)} FROM rollups WHERE dimension = ? ORDER BY value",
+            self.conn, params=(dimension,), index_col="value",
+        )
+        df.index.name = dimension
+        for m in ["margin_pct", "cpm", "ctr", "delivery_rate"]:
+            df[f"avg_{m}"] = df[m] / df["campaigns"]
+        df["variance_pct"] = (df["actual_revenue"] - df["budget"]) / df["budget"] * 100
+        df["win_rate"] = df["closed_won"] / df["campaigns"] * 100
+        df["overdue_pct"] = df["overdue"] / df["campaigns"] * 100
+        return df
+
+    def count(self):
+        return self.conn.execute("SELECT COUNT(*) FROM campaigns").fetchone()[0]
+
+
+def read_delta(path):
+    """Delta CSV: full-schema rows with an optional `op` column (insert/update/delete)."""
+    delta = pd.read_csv(path)
+    op = delta.pop("op").str.lower() if "op" in delta else pd.Series("upsert", index=delta.index)
+    deletes = delta.loc[op == "delete", "campaign_id"].tolist()
+    upserts = delta.loc[op != "delete"].astype({c: SCHEMA[c] for c in ROW_COLUMNS if SCHEMA[c] != "category"})
+    return upserts, deletes
+
+
+def verify(store, df, rtol=1e-9):
+    """Compare every materialized rollup with a full recompute over `df`."""
+    expected = _contributions(df[ROW_COLUMNS], 1).set_index(["dimension", "value"]).sort_index()
+    ok = True
+    for dim in ROLLUP_DIMENSIONS:
+        got = store.rollup(dim)[MEASURES].astype(np.float64)
+        exp = expected.loc[dim][MEASURES].astype(np.float64)
+        same = got.index.equals(exp.index) and np.allclose(got.to_numpy(), exp.to_numpy(), rtol=rtol, atol=1e-6)
+        print(f"  {dim:<14} {'ok' if same else 'MISMATCH'}")
+        ok &= same
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Incrementally maintained ad sales rollups.")
+    parser.add_argument("--db", default=DEFAULT_DB)
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="Materialize from the full dataset")
+    build.add_argument("--csv", default=DEFAULT_CSV)
+    apply = sub.add_parser("apply", help="Apply a delta CSV keyed by campaign_id")
+    apply.add_argument("delta")
+    show = sub.add_parser("show", help="Print one rollup")
+    show.add_argument("dimension", choices=ROLLUP_DIMENSIONS)
+    check = sub.add_parser("verify", help="Compare with a full recompute from a CSV")
+    check.add_argument("--csv", default=DEFAULT_CSV)
+    args = parser.parse_args()
+
+    store = MaterializedRollups(args.db)
+    try:
+        if args.command == "build":
+            n = store.rebuild(CampaignDataset(args.csv).load(ROW_COLUMNS))
+            print(f"Materialized rollups for {n:,} campaigns -> {args.db}")
+        elif args.command == "apply":
+            upserts, deletes = read_delta(args.delta)
+            result = store.apply_delta(upserts, deletes)
+            print(f"Applied delta: {result} ({store.count():,} campaigns stored)")
+        elif args.command == "show":
+            print(store.rollup(args.dimension).round(2).to_string())
+        elif args.command == "verify":
+            if not verify(store, read_csv_typed(args.csv, columns=ROW_COLUMNS)):
+                sys.exit(1)
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+"""
+Dependency-aware stage runner with on-disk memoization.
+
+A pipeline is a set of named stages. Each stage is a function that declares the
+stages it reads (`inputs`, passed to it as keyword arguments), the run parameters its
+result depends on (`params`) and any helper modules whose code it relies on
+(`modules`); its output is stored under its own name. Since a stage can only name
+stages registered before it, the graph is acyclic by construction. Data files a
+stage reads besides the dataset (a query file, say) are declared as `files`.
+
+Before anything runs, every requested stage gets a key: a hash of the dataset
+fingerprint, the stage's source code, the source of its modules, its parameter values
+and the keys of its inputs. A key therefore changes exactly when the data, the stage
+or anything upstream of it changes. A stage whose key has a result in the cache
+directory is loaded from there and its inputs are not visited at all; the others run
+on a thread pool as soon as their inputs are ready, so independent stages (the cube,
+the KPI scan, the correlation pass, ...) run concurrently. Each stage keeps only its
+`keep` most recently used results on disk (a few, so switching between option sets
+stays cached); older ones are deleted when a new result is stored. Only the standard
+library is imported.
+
+    pipeline = Pipeline()
+
+    @pipeline.stage(params=("engine",), modules=("rollups",))
+    def cube(ctx): ...
+
+    @pipeline.stage(inputs=("cube",))
+    def rev_by_q(ctx, cube): ...
+
+    results = pipeline.run(["rev_by_q"], ctx, params=vars(args), fingerprint=dataset.fingerprint(),
+                           cache_dir="data/.cache/stages")
+"""
+
+import glob
+import hashlib
+import os
+import pickle
+
+from profiling import PROFILER
+
+_MISS = object()
+
+
+class Stage:
+    """One node of the pipeline: `func(ctx, **inputs)` and what its result depends on."""
+
+    def __init__(self, name, func, inputs=(), params=(), modules=(), files=(), cache=True):
+        self.name = name
+        self.func = func
+        self.inputs = tuple(inputs)
+        self.params = tuple(params)
+        self.modules = tuple(modules)
+        self.files = tuple(files)
+        self.cache = cache
+        self._code_digest = None
+
+    def code_digest(self):
+        """Hash of the stage function's source, its declared modules and its files."""
+        if self._code_digest is None:
+            import importlib.util
+            import inspect
+
+            h = hashlib.sha256(inspect.getsource(self.func).encode())
+            paths = [importlib.util.find_spec(module).origin for module in self.modules] + list(self.files)
+            for path in paths:
+                with open(path, "rb") as f:
+                    h.update(f.read())
+            self._code_digest = h.hexdigest()
+        return self._code_digest
+
+
+class Pipeline:
+    """Registry of stages plus the scheduler that resolves, loads and runs them."""
+
+    def __init__(self, keep=4):
+        self.stages = {}
+        self.status = {}
+        self.keep = keep
+
+    def stage(self, name=None, inputs=(), params=(), modules=(), files=(), cache=True):
+        """Decorator registering a stage (named after the function by default)."""
+        def register(func):
+            label = name or func.__name__
+            unknown = [i for i in inputs if i not in self.stages]
+            if unknown:
+                raise ValueError(f"Stage {label!r} reads unknown stages {unknown}")
+            if label in self.stages:
+                raise ValueError(f"Stage {label!r} is already registered")
+            self.stages[label] = Stage(label, func, inputs, params, modules, files, cache)
+            return func
+        return register
+
+    def upstream(self, targets):
+        """`targets` and every stage they depend on, in dependency order."""
+        order = []
+
+        def visit(name):
+            if name not in order:
+                for i in self.stages[name].inputs:
+                    visit(i)
+                order.append(name)
+        for name in targets:
+            visit(name)
+        return order
+
+    def keys(self, targets, params, fingerprint):
+        """Cache key of every stage `targets` depend on."""
+        keys = {}
+        for name in self.upstream(targets):
+            stage = self.stages[name]
+            h = hashlib.sha256()
+            for part in (fingerprint, name, stage.code_digest(), repr([(p, params.get(p)) for p in stage.params])):
+                h.update(part.encode())
+                h.update(b"\0")
+            for i in stage.inputs:
+                h.update(keys[i].encode())
+            keys[name] = h.hexdigest()
+        return keys
+
+    # ---- Cache files ----
+    @staticmethod
+    def _path(cache_dir, name, key):
+        return os.path.join(cache_dir, f"{name}-{key[:20]}.pkl")
+
+    def _load(self, cache_dir, name, key):
+        path = self._path(cache_dir, name, key)
+        if not os.path.exists(path):
+            return _MISS
+        with PROFILER.span(f"stage {name} (cached)"):
+            try:
+                with open(path, "rb") as f:
+                    value = pickle.load(f)
+                os.utime(path)  # Most recently used: the last to be pruned
+                return value
+            except Exception:
+                # Truncated or written by incompatible library versions: recompute
+                return _MISS
+
+    def _store(self, cache_dir, name, key, value):
+        os.makedirs(cache_dir, exist_ok=True)
+        path = self._path(cache_dir, name, key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+        self._prune(cache_dir, name)
+
+    def _prune(self, cache_dir, name):
+        """Delete all but the `keep` most recently used results of stage `name`."""
+        paths = glob.glob(os.path.join(cache_dir, f"{name}-{'[0-9a-f]' * 20}.pkl"))
+        if len(paths) <= self.keep:
+            return
+        used = {}
+        for path in paths:
+            try:
+                used[path] = os.stat(path).st_mtime_ns
+            except OSError:
+                pass  # Removed by a concurrent run
+        for path in sorted(used, key=used.get, reverse=True)[self.keep:]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass  # Already removed by a concurrent run
+
+    @staticmethod
+    def _compute(stage, ctx, inputs, parent=None):
+        with PROFILER.span(f"stage {stage.name}", parent=parent):
+            return stage.func(ctx, **inputs)
+
+    # ---- Scheduling ----
+    def run(self, targets, ctx, params=None, fingerprint="", cache_dir=None, workers=None, done=None):
+        """Results of `targets` (and of the stages that had to run for them) by name.
+
+        `done` holds results already available in memory; they are neither loaded nor
+        recomputed. Without `cache_dir` nothing is read from or written to disk.
+        `self.status` records for each stage whether it was "cached" or "computed".
+        """
+        from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+        params = params or {}
+        results = dict(done or {})
+        keys = self.keys([t for t in targets if t not in results], params, fingerprint)
+        pending = {}
+
+        def visit(name):
+            if name in results or name in pending:
+                return
+            stage = self.stages[name]
+            if cache_dir and stage.cache:
+                value = self._load(cache_dir, name, keys[name])
+                if value is not _MISS:
+                    results[name] = value
+                    self.status[name] = "cached"
+                    return
+            pending[name] = stage
+            for i in stage.inputs:
+                visit(i)
+        for name in targets:
+            visit(name)
+
+        if not pending:
+            return results
+        # Stage spans run on the pool's threads but belong under the caller's span
+        parent = PROFILER.current()
+        with PROFILER.concurrent(), ThreadPoolExecutor(max_workers=workers) as pool:
+            running = {}
+            while pending or running:
+                for name, stage in list(pending.items()):
+                    if all(i in results for i in stage.inputs):
+                        del pending[name]
+                        inputs = {i: results[i] for i in stage.inputs}
+                        running[pool.submit(self._compute, stage, ctx, inputs, parent)] = stage
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    stage = running.pop(future)
+                    results[stage.name] = future.result()
+                    self.status[stage.name] = "computed"
+                    if cache_dir and stage.cache:
+                        self._store(cache_dir, stage.name, keys[stage.name], results[stage.name])
+        return results
@@ -0,0 +1,313 @@
+"""
+Lightweight instrumentation for the analysis pipeline.
+
+Spans wrap each section and sub-step (a load, the cube build, the t-test, the chart
+rendering, ...) and record wall time, CPU time, rows processed and memory: the
+process RSS when the span ends and the RSS high-water mark reached inside it. CPU
+time is the span's own thread's; outermost spans also record the CPU of the whole
+process, which includes the worker threads their steps ran on. On Linux the
+kernel's high-water mark is reset at every span start (/proc/self/clear_refs), so
+each span gets its own peak; spans nest and a span's peak includes its children.
+The reset is process-wide, so inside `concurrent()` (while spans run on several
+threads at once) it is skipped and those spans report the process peak, labelled
+"process" in their `rss_peak_scope`; so is every span where the reset is not
+supported. With `python_heap=True` tracemalloc also records the Python heap
+(current and peak per span, the same rules applying) - precise, but it slows
+allocation-heavy code such as imports several times over, so it is opt-in.
+
+A span opened on a worker thread starts a new stack; pass the span it belongs to as
+`parent` (from `current()` on the submitting thread) to keep the hierarchy.
+
+The result is written as a JSON report and as a Chrome trace (chrome://tracing,
+https://ui.perfetto.dev).
+
+Disabled by default: `span()` then returns a shared no-op context manager and
+`traced` functions call straight through, so the instrumented code pays one
+attribute check per call. Only the standard library is imported.
+
+    from profiling import PROFILER, traced
+
+    @traced("build cube")
+    def build(): ...
+
+    PROFILER.enable()
+    with PROFILER.span("load", rows=len(df)):
+        ...
+    PROFILER.write_report("profile.json")
+    PROFILER.write_trace("trace.json")
+"""
+
+import contextlib
+import functools
+import json
+import os
+import threading
+import time
+
+MB = 1024 * 1024
+
+
+def _rss_mb():
+    """Current and peak resident set size in MB (Linux /proc; None elsewhere)."""
+    try:
+        with open("/proc/self/status") as f:
+            fields = dict(line.split(":", 1) for line in f if line.startswith(("VmRSS", "VmHWM")))
+        return int(fields["VmRSS"].split()[0]) / 1024, int(fields["VmHWM"].split()[0]) / 1024
+    except (OSError, KeyError, ValueError):
+        return None, None
+
+
+def _reset_rss_peak():
+    """Reset the kernel's RSS high-water mark to the current RSS; False if unsupported."""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+class _NullSpan:
+    """Returned by span() while profiling is disabled."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def add_rows(self, n):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    def __init__(self, profiler, name, rows, parent=None):
+        self.profiler = profiler
+        self.name = name
+        self.rows = rows
+        self.parent_span = parent
+        self.child_rss_peak = 0.0
+        self.child_py_peak = 0
+
+    def add_rows(self, n):
+        self.rows = (self.rows or 0) + int(n)
+
+    def __enter__(self):
+        profiler = self.profiler
+        stack = profiler._stack()
+        parent = stack[-1] if stack else self.parent_span
+        # Peaks are only reset while no other thread has spans open: the reset is process-wide
+        self.isolated = not profiler._concurrent
+        if self.isolated:
+            # Fold the peaks reached so far into the parent before resetting them for this span
+            if stack:
+                stack[-1].child_rss_peak = max(stack[-1].child_rss_peak, _rss_mb()[1] or 0.0)
+                if profiler.python_heap:
+                    stack[-1].child_py_peak = max(stack[-1].child_py_peak,
+                                                  profiler._tracemalloc.get_traced_memory()[1])
+            if profiler.per_span_rss_peak:
+                _reset_rss_peak()
+            if profiler.python_heap:
+                profiler._tracemalloc.reset_peak()
+        self.parent = parent.name if parent else None
+        self.depth = parent.depth + 1 if parent else 0
+        stack.append(self)
+        self.cpu_start = time.thread_time()
+        self.process_cpu_start = time.process_time()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        wall = time.perf_counter() - self.start
+        cpu = time.thread_time() - self.cpu_start
+        profiler = self.profiler
+        rss, rss_peak = _rss_mb()
+        if rss_peak is not None:
+            rss_peak = max(rss_peak, self.child_rss_peak)
+        record = {
+            "name": self.name,
+            "parent": self.parent,
+            "depth": self.depth,
+            "thread": threading.get_ident(),
+            "start_s": self.start - profiler.origin,
+            "wall_s": wall,
+            "cpu_s": cpu,
+            "rows": self.rows,
+            "rss_mb": rss,
+            "rss_peak_mb": rss_peak,
+            "rss_peak_scope": "span" if profiler.per_span_rss_peak and self.isolated else "process",
+            "error": exc[0].__name__ if exc and exc[0] is not None else None,
+        }
+        if self.parent is None:
+            record["process_cpu_s"] = time.process_time() - self.process_cpu_start
+        if profiler.python_heap:
+            current, peak = profiler._tracemalloc.get_traced_memory()
+            record["py_current_mb"] = current / MB
+            record["py_peak_mb"] = max(peak, self.child_py_peak) / MB
+        stack = profiler._stack()
+        stack.pop()
+        if stack:
+            stack[-1].child_rss_peak = max(stack[-1].child_rss_peak, rss_peak or 0.0)
+            stack[-1].child_py_peak = max(stack[-1].child_py_peak, int(record.get("py_peak_mb", 0) * MB))
+        profiler._record(record)
+        return False
+
+
+class Profiler:
+    """Collects spans from every thread while enabled."""
+
+    def __init__(self):
+        self.enabled = False
+        self.python_heap = False
+        self.per_span_rss_peak = False
+        self.spans = []
+        self.origin = time.perf_counter()
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._concurrent = 0
+        self._tracemalloc = None
+
+    def enable(self, python_heap=False):
+        """Start recording; `python_heap` adds tracemalloc heap figures (slow)."""
+        if python_heap:
+            import tracemalloc
+
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            self._tracemalloc = tracemalloc
+        self.python_heap = python_heap
+        self.per_span_rss_peak = _reset_rss_peak()
+        self.spans = []
+        self.origin = time.perf_counter()
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+        if self.python_heap and self._tracemalloc.is_tracing():
+            self._tracemalloc.stop()
+        self.python_heap = False
+
+    def _stack(self):
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def _record(self, span):
+        with self._lock:
+            self.spans.append(span)
+
+    def span(self, name, rows=None, parent=None):
+        """Context manager timing one step; `rows` (or `add_rows` inside) counts rows processed.
+        `parent` is the enclosing span when this one is opened on another thread."""
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name, rows, parent)
+
+    def current(self):
+        """Innermost open span of this thread (None if there is none or profiling is off)."""
+        stack = self._stack() if self.enabled else None
+        return stack[-1] if stack else None
+
+    @contextlib.contextmanager
+    def concurrent(self):
+        """Mark a block where spans run on several threads at once (a thread pool): peaks are
+        not reset inside it, and the spans opened in it report process-wide peaks."""
+        with self._lock:
+            self._concurrent += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._concurrent -= 1
+
+    def add_rows(self, n):
+        """Attribute `n` processed rows to the innermost open span of this thread."""
+        if self.enabled and self._stack():
+            self._stack()[-1].add_rows(n)
+
+    def traced(self, name=None):
+        """Decorator running the function inside a span (named after it by default)."""
+        def decorate(func):
+            label = name or func.__name__
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                with self.span(label):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorate
+
+    # ---- Output ----
+    def report(self):
+        spans = sorted(self.spans, key=lambda s: s["start_s"])
+        # Outermost spans carry the process CPU, worker threads included; nested spans only their own
+        # thread's, so the run's total is summed over the outermost ones
+        top = [s for s in spans if s["depth"] == 0]
+        report = {
+            "pid": os.getpid(),
+            "total_wall_s": sum(s["wall_s"] for s in top),
+            "total_cpu_s": sum(s["process_cpu_s"] for s in top),
+            "rss_peak_mb": max((s["rss_peak_mb"] or 0.0 for s in spans), default=0.0),
+            "rss_peak_scope": "span" if self.per_span_rss_peak else "process",
+            "spans": spans,
+        }
+        if self.python_heap:
+            report["py_peak_mb"] = max((s["py_peak_mb"] for s in spans), default=0.0)
+        return report
+
+    def chrome_trace(self):
+        """Trace Event Format: one complete ("X") event per span plus memory counters."""
+        pid = os.getpid()
+        events = []
+        for s in sorted(self.spans, key=lambda s: s["start_s"]):
+            ts = s["start_s"] * 1e6
+            args = {k: s[k] for k in ("cpu_s", "process_cpu_s", "rows", "rss_mb", "rss_peak_mb", "py_current_mb", "py_peak_mb", "error")
+                    if s.get(k) is not None}
+            events.append({"name": s["name"], "cat": "analysis", "ph": "X", "ts": ts, "dur": s["wall_s"] * 1e6,
+                           "pid": pid, "tid": s["thread"], "args": args})
+            memory = {k: s[k] for k in ("rss_mb", "py_current_mb") if s.get(k) is not None}
+            if memory:
+                events.append({"name": "memory", "ph": "C", "ts": ts + s["wall_s"] * 1e6, "pid": pid, "args": memory})
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def write_report(self, path):
+        with open(path, "w") as f:
+            json.dump(self.report(), f, indent=2)
+
+    def write_trace(self, path):
+        with open(path, "w") as f:
+            json.dump(self.chrome_trace(), f)
+
+    def summary(self):
+        """Indented text table of the spans, in start order."""
+        def mb(value):
+            return f"{value:.0f}MB" if value is not None else ""
+
+        heap = self.python_heap
+        lines = [f"{'Step':<40} {'Wall':>9} {'CPU':>9} {'Rows':>12} {'RSS':>8} {'Peak RSS':>9}"
+                 + (f" {'Py peak':>9}" if heap else "")]
+        shared = False
+        for s in sorted(self.spans, key=lambda s: s["start_s"]):
+            rows = f"{s['rows']:,}" if s["rows"] is not None else ""
+            # Process CPU for outermost spans; a process-wide peak inside a span is starred
+            cpu = s.get("process_cpu_s", s["cpu_s"])
+            peak = mb(s["rss_peak_mb"]) + ("*" if s["rss_peak_scope"] == "process" and self.per_span_rss_peak else "")
+            shared = shared or peak.endswith("*")
+            lines.append(f"{'  ' * s['depth'] + s['name']:<40} {s['wall_s']:>8.3f}s {cpu:>8.3f}s "
+                         f"{rows:>12} {mb(s['rss_mb']):>8} {peak:>9}"
+                         + (f" {s['py_peak_mb']:>7.1f}MB" if heap else ""))
+        if shared:
+            lines.append("* process-wide peak: the span ran concurrently with others")
+        return "\n".join(lines)
+
+
+PROFILER = Profiler()
+span = PROFILER.span
+traced = PROFILER.traced
+add_rows = PROFILER.add_rows
@@ -0,0 +1,195 @@
+"""
+Single-scan grouping-sets engine for the ad sales rollups.
+
+Every dimension is factorized once into integer codes, the codes are combined into
+one dense cell key, and each metric is summed per cell with a single np.bincount.
+The result is a small base cube (quarter x month x industry x tier x format x rep x
+platform); every GROUP BY / GROUPING SETS / CUBE rollup the analysis needs is then
+read off the cube by summing over the axes that are not grouped, without touching
+the rows again.
+
+Each cell also keeps M2 (sum of squared deviations from the cell mean), so variances
+roll up and merge exactly with Chan's parallel formula. Cubes built from separate
+chunks or shards combine with `merge`, which aligns their label dictionaries.
+
+    cube = RollupCube.from_frame(df)
+    rev_by_q = cube.agg("quarter", actual=("actual_revenue", "sum"),
+                        campaigns=("campaign_id", "count"))
+"""
+
+from itertools import combinations
+
+import numpy as np
+import pandas as pd
+
+DIMENSIONS = ["quarter", "month", "industry", "account_tier", "ad_format", "sales_rep", "platform"]
+METRICS = ["actual_revenue", "budget", "booked_revenue", "gross_margin", "margin_pct",
+           "cpm", "ctr", "delivery_rate"]
+AGG_FUNCS = ("sum", "count", "mean", "var", "std")
+
+
+class RollupCube:
+    """Per-cell counts, metric sums and M2 over the full cross product of `dims`."""
+
+    def __init__(self, dims, labels, metrics, counts, sums, m2=None):
+        self.dims = list(dims)
+        self.labels = [list(l) for l in labels]
+        self.metrics = list(metrics)
+        self.counts = counts
+        self.sums = sums
+        self.m2 = np.zeros_like(sums) if m2 is None else m2
+
+    @property
+    def shape(self):
+        return tuple(len(l) for l in self.labels)
+
+    @classmethod
+    def empty(cls, dims=DIMENSIONS, metrics=METRICS):
+        shape = (0,) * len(dims)
+        return cls(dims, [[] for _ in dims], metrics, np.zeros(shape, np.int64),
+                   np.zeros(shape + (len(metrics),)))
+
+    @classmethod
+    def from_frame(cls, df, dims=DIMENSIONS, metrics=METRICS):
+        """Build the cube from one scan of `df`. Rows with a missing dimension are dropped, as in groupby."""
+        codes, labels = [], []
+        for d in dims:
+            c, uniques = pd.factorize(df[d], sort=True)
+            codes.append(c)
+            labels.append(list(uniques))
+        shape = tuple(len(l) for l in labels)
+        valid = np.logical_and.reduce([c >= 0 for c in codes]) if codes else np.ones(len(df), bool)
+        if not valid.all():
+            codes = [c[valid] for c in codes]
+        key = np.ravel_multi_index(codes, shape) if codes else np.zeros(int(valid.sum()), np.intp)
+        size = int(np.prod(shape))
+        counts = np.bincount(key, minlength=size)
+        safe_counts = np.maximum(counts, 1)
+        sums = np.empty((size, len(metrics)))
+        m2 = np.empty((size, len(metrics)))
+        for j, m in enumerate(metrics):
+            values = df[m].to_numpy(dtype=np.float64)
+            if not valid.all():
+                values = values[valid]
+            sums[:, j] = np.bincount(key, weights=values, minlength=size)
+            deviation = values - (sums[:, j] / safe_counts)[key]
+            m2[:, j] = np.bincount(key, weights=deviation * deviation, minlength=size)
+        full = shape + (len(metrics),)
+        return cls(dims, labels, metrics, counts.reshape(shape), sums.reshape(full), m2.reshape(full))
+
+    def _aligned(self, labels):
+        """Counts/sums/M2 re-indexed onto `labels` (a superset of self.labels per dim)."""
+        shape = tuple(len(l) for l in labels)
+        positions = [np.searchsorted(np.asarray(new, dtype=object), np.asarray(old, dtype=object))
+                     if old else np.zeros(0, np.intp)
+                     for new, old in zip(labels, self.labels)]
+        counts = np.zeros(shape, np.int64)
+        sums = np.zeros(shape + (len(self.metrics),))
+        m2 = np.zeros_like(sums)
+        if self.counts.size:
+            idx = np.ix_(*positions)
+            counts[idx] = self.counts
+            sums[idx] = self.sums
+            m2[idx] = self.m2
+        return counts, sums, m2
+
+    def merge(self, other):
+        """Combine two cubes over the same dims/metrics (e.g. from different chunks or shards)."""
+        if other.dims != self.dims or other.metrics != self.metrics:
+            raise ValueError("Cannot merge cubes with different dimensions or metrics")
+        if self.labels == other.labels:
+            a = (self.counts, self.sums, self.m2)
+            b = (other.counts, other.sums, other.m2)
+            labels = self.labels
+        else:
+            labels = [sorted(set(x) | set(y)) for x, y in zip(self.labels, other.labels)]
+            a, b = self._aligned(labels), other._aligned(labels)
+        counts = a[0] + b[0]
+        sums = a[1] + b[1]
+        na = a[0][..., None].astype(np.float64)
+        nb = b[0][..., None].astype(np.float64)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            delta = np.where((na > 0) & (nb > 0), b[1] / nb - a[1] / na, 0.0)
+            cross = np.where(counts[..., None] > 0, delta * delta * na * nb / counts[..., None], 0.0)
+        return RollupCube(self.dims, labels, self.metrics, counts, sums, a[2] + b[2] + cross)
+
+    def _axes(self, by):
+        by = [by] if isinstance(by, str) else list(by)
+        unknown = [d for d in by if d not in self.dims]
+        if unknown:
+            raise KeyError(f"Not a cube dimension: {unknown} (cube has {self.dims})")
+        return by, [self.dims.index(d) for d in by]
+
+    def _reduce(self, by):
+        """Counts, sums and M2 rolled up to `by`, axes in the order given, empty groups removed."""
+        by, axes = self._axes(by)
+        drop = tuple(i for i in range(len(self.dims)) if i not in axes)
+        counts = self.counts.sum(axis=drop, keepdims=True)
+        sums = self.sums.sum(axis=drop, keepdims=True)
+        # Chan: M2 of a union = sum of cell M2 + sum of n_i * (mean_i - mean)^2
+        n_cells = np.maximum(self.counts, 1)[..., None]
+        n_group = np.maximum(counts, 1)[..., None]
+        spread = self.counts[..., None] * (self.sums / n_cells - sums / n_group) ** 2
+        m2 = (self.m2 + spread).sum(axis=drop, keepdims=True)
+        counts = counts.squeeze(axis=drop)
+        sums = sums.squeeze(axis=drop)
+        m2 = m2.squeeze(axis=drop)
+        # remaining axes are in cube order; reorder to the requested order
+        order = tuple(np.argsort(np.argsort(axes)))
+        counts = np.transpose(counts, order).reshape(-1)
+        sums = np.transpose(sums, order + (len(order),)).reshape(-1, len(self.metrics))
+        m2 = np.transpose(m2, order + (len(order),)).reshape(-1, len(self.metrics))
+        keep = counts > 0
+        return self._group_index(by, axes)[keep], counts[keep], sums[keep], m2[keep]
+
+    def _group_index(self, by, axes):
+        """Index of every group of a rollup to `by` (all label combinations, in the requested order)."""
+        if not by:
+            return pd.Index(["All"])
+        index = pd.MultiIndex.from_product([self.labels[a] for a in axes], names=by)
+        return index.get_level_values(0) if len(by) == 1 else index
+
+    def rollup(self, by):
+        """All metrics for one grouping set: count plus <metric>_sum/_mean/_var columns."""
+        index, counts, sums, m2 = self._reduce(by)
+        out = {"count": counts}
+        with np.errstate(invalid="ignore", divide="ignore"):
+            for j, m in enumerate(self.metrics):
+                out[f"{m}_sum"] = sums[:, j]
+                out[f"{m}_mean"] = sums[:, j] / counts
+                out[f"{m}_var"] = np.where(counts > 1, m2[:, j] / (counts - 1), np.nan)
+        return pd.DataFrame(out, index=index)
+
+    def agg(self, by, **named):
+        """Named aggregation like `df.groupby(by).agg(name=(column, func))`.
+
+        func is one of sum/count/mean/var/std; var and std use ddof=1 like pandas.
+        """
+        index, counts, sums, m2 = self._reduce(by)
+        out = {}
+        for name, (column, func) in named.items():
+            if func not in AGG_FUNCS:
+                raise ValueError(f"Unsupported aggregation {func!r}; expected one of {AGG_FUNCS}")
+            if func == "count":
+                out[name] = counts
+                continue
+            if column not in self.metrics:
+                raise KeyError(f"Metric {column!r} was not accumulated (cube has {self.metrics})")
+            j = self.metrics.index(column)
+            if func == "sum":
+                out[name] = sums[:, j]
+            elif func == "mean":
+                out[name] = sums[:, j] / counts
+            else:
+                with np.errstate(invalid="ignore", divide="ignore"):
+                    var = np.where(counts > 1, m2[:, j] / (counts - 1), np.nan)
+                out[name] = var if func == "var" else np.sqrt(var)
+        return pd.DataFrame(out, index=index)
+
+    def grouping_sets(self, *sets):
+        """GROUPING SETS: {tuple(dims): rollup DataFrame} for each requested set."""
+        return {tuple([s] if isinstance(s, str) else s): self.rollup(s) for s in sets}
+
+    def cube(self, dims):
+        """CUBE: every subset of `dims`, from the grand total () up to the full set."""
+        return self.grouping_sets(*(c for r in range(len(dims) + 1) for c in combinations(dims, r)))
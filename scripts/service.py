@@ -0,0 +1,379 @@
+"""
+Local analytics service: the campaign data loaded once, queries answered over HTTP.
+
+A dashboard refresh no longer pays for a cold process, the imports and the load: the
+service keeps the typed frame in memory and answers the analysis queries as JSON on
+localhost. Every query accepts filters on any dimension, `?quarter=Q4 2025&account_tier=
+Enterprise,Growth` (values of one dimension are ORed, dimensions are ANDed):
+
+    GET  /kpis                      headline KPIs (section 5 / the kpis command)
+    GET  /rollup?by=quarter,industry&metrics=actual_revenue,budget&funcs=sum,mean
+    GET  /variance?by=sales_rep     actual vs budget and variance % per group
+    GET  /top?k=10&by=industry&rank_by=gross_margin
+    GET  /sql?query=4               a query of ad_sales_queries.sql (1-7), computed with pandas
+    GET  /dimensions                the labels of every dimension
+    GET  /health                    rows, data generation, cache statistics
+    POST /reload[?force=1]          reload the data if the CSV changed (always with force)
+
+Results are kept, already serialized, in a bounded LRU cache keyed by the data
+generation, the path and the normalized parameters; a reload bumps the generation and
+empties the cache, and a result computed from the old data is never stored. Identical
+queries that miss at the same time are computed once; the X-Cache header says whether
+a response was a hit, a miss, or "coalesced" (it waited for the same query in flight).
+Requests run on their own threads and read an immutable snapshot of the data, so a
+reload never blocks or disturbs them.
+
+    python scripts/service.py --port 8765
+    curl 'http://127.0.0.1:8765/rollup?by=sales_rep&quarter=Q4%202025&payment_status=Overdue'
+"""
+
+import argparse
+import json
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+
+from data_access import DEFAULT_CSV, DIMENSIONS, SCHEMA, CampaignDataset
+from rollups import AGG_FUNCS, RollupCube
+from topk import RANK_METRICS, TOPK_COLUMNS, TOPK_GROUPS, TopK
+
+NUMERIC = [c for c, dtype in SCHEMA.items() if dtype != "category"]
+QUERY_PATHS = ("/kpis", "/rollup", "/variance", "/top", "/sql")
+
+
+class BadRequest(ValueError):
+    """A query the service cannot answer (reported as HTTP 400)."""
+
+
+class ResultCache:
+    """Bounded LRU of query results; concurrent misses on one key are computed once."""
+
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self._entries = OrderedDict()
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, key, compute, keep=lambda: True):
+        """(value, "hit" | "miss" | "coalesced"). A coalesced request waited for another
+        thread's computation of the same key, so it pays miss latency without computing.
+        `keep()` is asked after computing whether the value may be stored."""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key], "hit"
+            future = self._pending.get(key)
+            owner = future is None
+            if owner:
+                future = self._pending[key] = Future()
+                self.misses += 1
+            else:
+                self.coalesced += 1
+        if not owner:
+            return future.result(), "coalesced"
+        try:
+            value = compute()
+        except BaseException as exc:
+            with self._lock:
+                del self._pending[key]
+            future.set_exception(exc)
+            raise
+        with self._lock:
+            del self._pending[key]
+            if keep():
+                self._entries[key] = value
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+        future.set_result(value)
+        return value, "miss"
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses + self.coalesced
+            return {"entries": len(self._entries), "maxsize": self.maxsize, "hits": self.hits,
+                    "misses": self.misses, "coalesced": self.coalesced,
+                    "hit_rate": self.hits / total if total else None}
+
+
+class Snapshot:
+    """One loaded version of the data; never modified after construction."""
+
+    def __init__(self, dataset, generation):
+        self.fingerprint = dataset.fingerprint()
+        self.frame = dataset.load()
+        self.generation = generation
+        self.loaded_at = time.time()
+
+
+# ---- Queries: (frame, params) -> JSON-ready value ----
+
+def _records(df):
+    """DataFrame as a list of row dicts, NaN as null."""
+    df = df.reset_index() if any(name is not None for name in df.index.names) else df
+    return df.astype(object).where(df.notna(), None).to_dict(orient="records")
+
+
+def _one(params, name, default=None, choices=None):
+    values = params.get(name)
+    value = values[-1] if values else default
+    if choices is not None and value not in choices:
+        raise BadRequest(f"{name} must be one of {list(choices)}")
+    return value
+
+
+def _list(params, name, default=(), choices=None):
+    """Comma-separated values of a (repeatable) parameter, each once, in first-seen order."""
+    values = list(dict.fromkeys(v for value in params.get(name, []) for v in value.split(",") if v)) \
+        or list(default)
+    unknown = [v for v in values if choices is not None and v not in choices]
+    if unknown:
+        raise BadRequest(f"Unknown {name} {unknown}; expected some of {list(choices)}")
+    return values
+
+
+def _int(params, name, default, minimum=None):
+    try:
+        value = int(_one(params, name, default))
+    except ValueError:
+        raise BadRequest(f"{name} must be an integer") from None
+    if minimum is not None and value < minimum:
+        raise BadRequest(f"{name} must be at least {minimum}")
+    return value
+
+
+def query_kpis(df, params):
+    n = len(df)
+    total_impressions, total_clicks = int(df["impressions"].sum()), int(df["clicks"].sum())
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return {
+            "campaigns": n,
+            "advertisers": int(df["advertiser"].nunique()),
+            "total_booked": float(df["booked_revenue"].sum()),
+            "total_actual": float(df["actual_revenue"].sum()),
+            "total_budget": float(df["budget"].sum()),
+            "total_margin": float(df["gross_margin"].sum()),
+            "revenue_per_campaign": float(df["actual_revenue"].mean()) if n else None,
+            "avg_margin_pct": float(df["margin_pct"].mean()) if n else None,
+            "avg_cpm": float(df["cpm"].mean()) if n else None,
+            "overall_ctr": total_clicks / total_impressions * 100 if total_impressions else None,
+            "avg_delivery": float(df["delivery_rate"].mean()) * 100 if n else None,
+            "win_rate": float((df["deal_status"] == "Closed Won").mean()) * 100 if n else None,
+            "overdue_pct": float((df["payment_status"] == "Overdue").mean()) * 100 if n else None,
+            "total_impressions": total_impressions,
+            "total_clicks": total_clicks,
+            "deal_counts": {k: int(v) for k, v in df["deal_status"].value_counts().items() if v},
+        }
+
+
+def query_rollup(df, params):
+    """Count plus metric x func columns per group of `by` (the grand total without `by`)."""
+    by = _list(params, "by", choices=DIMENSIONS)
+    metrics = _list(params, "metrics", ["actual_revenue"], choices=NUMERIC)
+    funcs = _list(params, "funcs", ["sum"], choices=AGG_FUNCS)
+    cube = RollupCube.from_frame(df, dims=by, metrics=metrics)
+    named = {"campaigns": ("campaign_id", "count")}
+    named.update({f"{m}_{f}": (m, f) for m in metrics for f in funcs if f != "count"})
+    return _records(cube.agg(by, **named))
+
+
+def query_variance(df, params):
+    """Actual vs budget per group, as the variance section and query 4."""
+    by = _list(params, "by", ["sales_rep"], choices=DIMENSIONS)
+    cube = RollupCube.from_frame(df, dims=by, metrics=["actual_revenue", "budget", "margin_pct"])
+    out = cube.agg(by, campaigns=("campaign_id", "count"), total_actual=("actual_revenue", "sum"),
+                   total_budget=("budget", "sum"), avg_margin=("margin_pct", "mean"))
+    out["variance"] = out["total_actual"] - out["total_budget"]
+    out["variance_pct"] = out["variance"] / out["total_budget"] * 100
+    return _records(out.sort_values("total_actual", ascending=False))
+
+
+def query_top(df, params):
+    top = TopK(_int(params, "k", 10, minimum=1), _one(params, "by", None, (None,) + tuple(TOPK_GROUPS)),
+               _one(params, "rank_by", "actual_revenue", RANK_METRICS))
+    return _records(top.update(df[TOPK_COLUMNS]).result())
+
+
+def query_sql(df, params):
+    from sql_engine import pandas_queries, read_queries
+
+    titles = [title for title, _ in read_queries()]
+    number = _int(params, "query", 1)
+    if not 1 <= number <= len(titles):
+        raise BadRequest(f"query must be between 1 and {len(titles)}")
+    return {"title": titles[number - 1], "rows": _records(pandas_queries(df)[number - 1])}
+
+
+QUERIES = {"/kpis": query_kpis, "/rollup": query_rollup, "/variance": query_variance,
+           "/top": query_top, "/sql": query_sql}
+
+
+class AnalyticsService:
+    """The loaded data, the result cache and query dispatch (independent of HTTP)."""
+
+    def __init__(self, csv_path=DEFAULT_CSV, cache_size=256):
+        self.dataset = CampaignDataset(csv_path)
+        self.cache = ResultCache(cache_size)
+        self.verbose = False
+        self._reload_lock = threading.Lock()
+        self.snapshot = Snapshot(self.dataset, generation=1)
+
+    def reload(self, force=False):
+        """Load the data again if the CSV changed (or `force`); True when a new snapshot was installed."""
+        with self._reload_lock:
+            if not force and self.dataset.fingerprint() == self.snapshot.fingerprint:
+                return False
+            # Built off to the side: queries keep using the old snapshot until the swap
+            snapshot = Snapshot(self.dataset, self.snapshot.generation + 1)
+            self.snapshot = snapshot
+            self.cache.clear()
+            return True
+
+    @staticmethod
+    def filters(params):
+        """{dimension: [values]} from the query parameters that name a dimension."""
+        return {dim: sorted(set(_list(params, dim))) for dim in DIMENSIONS if dim in params}
+
+    @staticmethod
+    def apply_filters(df, filters):
+        if not filters:
+            return df
+        mask = np.ones(len(df), dtype=bool)
+        for dim, values in filters.items():
+            mask &= df[dim].isin(values).to_numpy()
+        return df[mask]
+
+    def answer(self, path, params):
+        """(JSON bytes, cache status) for a query path and its parsed parameters."""
+        query = QUERIES.get(path)
+        if query is None:
+            raise ValueError(f"Unknown query path {path!r}; expected one of {list(QUERIES)}")
+        filters = self.filters(params)
+        options = sorted((k, tuple(v)) for k, v in params.items() if k not in filters)
+        snapshot = self.snapshot
+        key = (snapshot.generation, path, tuple(sorted((k, tuple(v)) for k, v in filters.items())), tuple(options))
+
+        def compute():
+            df = self.apply_filters(snapshot.frame, filters)
+            body = {"query": path.lstrip("/"), "filters": filters, "generation": snapshot.generation,
+                    "result": query(df, params)}
+            return json.dumps(body).encode()
+
+        return self.cache.get_or_compute(key, compute, keep=lambda: self.snapshot is snapshot)
+
+    def dimensions(self):
+        df = self.snapshot.frame
+        return {dim: [str(v) for v in df[dim].cat.categories] for dim in DIMENSIONS}
+
+    def health(self):
+        snapshot = self.snapshot
+        return {"rows": len(snapshot.frame), "generation": snapshot.generation,
+                "csv": self.dataset.csv_path, "loaded_at": snapshot.loaded_at, "cache": self.cache.stats()}
+
+
+def make_handler(service):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _send(self, status, body, cache=None):
+            if not isinstance(body, bytes):
+                body = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            if cache is not None:
+                self.send_header("X-Cache", cache)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            url = urlsplit(self.path)
+            params = parse_qs(url.query)
+            try:
+                if url.path == "/health":
+                    return self._send(200, service.health())
+                if url.path == "/dimensions":
+                    return self._send(200, service.dimensions())
+                if url.path not in QUERIES:
+                    return self._send(404, {"error": f"Unknown path {url.path}", "paths": list(QUERY_PATHS)})
+                body, status = service.answer(url.path, params)
+                self._send(200, body, cache=status)
+            except BadRequest as exc:
+                self._send(400, {"error": str(exc)})
+            except Exception as exc:
+                self._server_error(exc)
+
+        def do_POST(self):
+            url = urlsplit(self.path)
+            if url.path != "/reload":
+                return self._send(404, {"error": f"Unknown path {url.path}"})
+            force = _one(parse_qs(url.query), "force", "0") not in ("0", "false")
+            try:
+                reloaded = service.reload(force)
+            except Exception as exc:
+                # e.g. the CSV was removed: the old snapshot keeps serving
+                return self._server_error(exc)
+            self._send(200, {"reloaded": reloaded, **service.health()})
+
+        def _server_error(self, exc):
+            # A failing request still gets a response; the error is logged even without --verbose
+            BaseHTTPRequestHandler.log_message(self, "%s failed: %r", self.path, exc)
+            self._send(500, {"error": f"{type(exc).__name__}: {exc}"})
+
+        def log_message(self, format, *args):
+            if service.verbose:
+                super().log_message(format, *args)
+
+    return Handler
+
+
+class Server(ThreadingHTTPServer):
+    daemon_threads = True
+    # socketserver's default listen backlog of 5 drops connections under a burst of clients,
+    # which then wait a full second for the TCP retry
+    request_queue_size = 128
+
+
+def serve(service, host="127.0.0.1", port=8765):
+    """Bind the HTTP server (port 0 picks a free one); returns it without serving yet."""
+    return Server((host, port), make_handler(service))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the analysis queries over HTTP on localhost.")
+    parser.add_argument("--csv", default=DEFAULT_CSV)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765, help="0 picks a free port")
+    parser.add_argument("--cache-size", type=int, default=256, help="Results kept in the LRU cache")
+    parser.add_argument("--verbose", action="store_true", help="Log every request to stderr")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    service = AnalyticsService(args.csv, args.cache_size)
+    service.verbose = args.verbose
+    server = serve(service, args.host, args.port)
+    host, port = server.server_address[:2]
+    print(f"Loaded {len(service.snapshot.frame):,} campaigns in {time.perf_counter() - start:.2f}s; "
+          f"serving on http://{host}:{port}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
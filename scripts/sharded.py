@@ -0,0 +1,188 @@
+"""
+Sharded multi-process execution of the analysis aggregates.
+
+The rows of the Arrow cache are split into shards by a hash of campaign_id (even
+shards whatever the ids) or by quarter (each quarter kept whole on one shard). The
+driver assigns every row to a shard once and writes the row positions, grouped by
+shard, to a memory-mapped .npy file. Each worker process opens that file and the
+Arrow cache memory-mapped, gathers its rows chunk by chunk and folds them into a
+StreamingAnalysis: the rollup cube, the KPI counters (impressions, clicks, Closed Won
+and Overdue counts), the distinct advertisers and the co-moments. Only paths and
+shard bounds are sent to the workers and only the small partial states come back;
+they are merged in shard order. Counts and counters are exact; float sums differ from
+the single-process path only in the order of addition (well below the printed
+precision).
+
+    state = run_sharded(CampaignDataset().ensure(), shards=4)
+
+    python scripts/sharded.py --shards 4 --check
+"""
+
+import argparse
+import functools
+import multiprocessing
+import os
+import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pyarrow as pa
+
+from data_access import DEFAULT_CSV, CampaignDataset
+from sketches import SKETCH_COLUMNS, SketchCube
+from streaming import STREAM_COLUMNS, StreamingAnalysis, compare_with_frame
+from topk import TOPK_COLUMNS, TopK
+
+SHARD_KEYS = ("campaign_id", "quarter")
+# Fibonacci hashing constant (2^64 / golden ratio): consecutive ids spread over all shards
+_HASH_MULTIPLIER = np.uint64(0x9E3779B97F4A7C15)
+
+
+def _open_table(cache_path):
+    """The Arrow cache, memory-mapped (columns are read from the page cache, not copied)."""
+    return pa.ipc.open_file(pa.memory_map(cache_path)).read_all()
+
+
+def shard_of_rows(table, by="campaign_id", shards=4):
+    """Shard number of every row: hash of campaign_id, or the quarter's position modulo `shards`."""
+    if by == "campaign_id":
+        ids = table.column("campaign_id").to_numpy().astype(np.uint64)
+        with np.errstate(over="ignore"):
+            return ((ids * _HASH_MULTIPLIER) >> np.uint64(32)) % np.uint64(shards)
+    if by == "quarter":
+        import pandas as pd
+
+        codes, _ = pd.factorize(table.column("quarter").to_pandas(), sort=True)
+        # Rows without a quarter still count towards the KPIs; they go to shard 0
+        return np.where(codes < 0, 0, codes % shards)
+    raise ValueError(f"Unknown shard key {by!r}; expected one of {SHARD_KEYS}")
+
+
+def _pool_context():
+    # The analysis calls this from pipeline threads, and forking a threaded process is
+    # unsafe; the fork server starts workers from a clean single-threaded process that
+    # has imported the heavy libraries once. (It does not see our sys.path, so the
+    # project modules are imported by each worker; they are light.)
+    if "forkserver" not in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("spawn")
+    context = multiprocessing.get_context("forkserver")
+    context.set_forkserver_preload(["numpy", "pandas", "pyarrow"])
+    return context
+
+
+def _fold_shard(cache_path, positions_path, start, stop, columns, fold, chunksize):
+    """Worker: fold the rows at positions[start:stop] into one partial result, a chunk at a time."""
+    positions = np.load(positions_path, mmap_mode="r")
+    table = _open_table(cache_path).select(columns)
+    partial = None
+    for lo in range(start, stop, chunksize):
+        chunk = table.take(pa.array(positions[lo:min(lo + chunksize, stop)])).to_pandas()
+        partial = fold(partial, chunk)
+    return partial
+
+
+def map_shards(cache_path, fold, columns, by="campaign_id", shards=None, workers=None, chunksize=1_000_000):
+    """`fold(partial or None, chunk) -> partial` over every shard in a process pool.
+
+    Returns the partial results in shard order (empty shards are skipped).
+    """
+    shards = shards or os.cpu_count() or 1
+    table = _open_table(cache_path)
+    shard = shard_of_rows(table, by, shards)
+    # Positions grouped by shard, ascending within each shard (so rows keep their order)
+    positions = np.argsort(shard, kind="stable")
+    bounds = np.searchsorted(shard[positions], np.arange(shards + 1))
+    del table, shard
+    with tempfile.TemporaryDirectory(prefix="shards-") as tmp:
+        positions_path = os.path.join(tmp, "positions.npy")
+        np.save(positions_path, positions)
+        del positions
+        tasks = [(bounds[i], bounds[i + 1]) for i in range(shards) if bounds[i + 1] > bounds[i]]
+        with ProcessPoolExecutor(max_workers=workers or min(len(tasks), os.cpu_count() or 1),
+                                 mp_context=_pool_context()) as pool:
+            futures = [pool.submit(_fold_shard, cache_path, positions_path, int(start), int(stop),
+                                   columns, fold, chunksize) for start, stop in tasks]
+            return [future.result() for future in futures]
+
+
+# ---- Folds (module level so the workers can unpickle them) ----
+
+def fold_analysis(state, chunk):
+    return (state or StreamingAnalysis()).update(chunk)
+
+
+def fold_topk(k, by, metric, top, chunk):
+    return (top or TopK(k, by, metric)).update(chunk)
+
+
+def fold_sketches(sketches, chunk):
+    return (sketches or SketchCube.empty()).update(chunk)
+
+
+def run_sharded(cache_path=None, shards=None, by="campaign_id", workers=None, chunksize=1_000_000):
+    """StreamingAnalysis of the whole dataset, computed shard by shard in parallel."""
+    cache_path = cache_path or CampaignDataset().ensure()
+    partials = map_shards(cache_path, fold_analysis, STREAM_COLUMNS, by, shards, workers, chunksize)
+    return functools.reduce(StreamingAnalysis.merge, partials, StreamingAnalysis())
+
+
+def sharded_top(cache_path, k=10, by=None, metric="actual_revenue", shards=None, shard_by="campaign_id",
+                workers=None, chunksize=1_000_000):
+    """Per-group top-k campaigns from per-shard top-k states (same frame as TopK.result)."""
+    fold = functools.partial(fold_topk, k, by, metric)
+    partials = map_shards(cache_path, fold, TOPK_COLUMNS, shard_by, shards, workers, chunksize)
+    return functools.reduce(TopK.merge, partials, TopK(k, by, metric)).result()
+
+
+def sharded_sketches(cache_path, shards=None, shard_by="campaign_id", workers=None, chunksize=1_000_000):
+    """Distinct-count and quantile sketches merged from per-shard sketch cubes."""
+    partials = map_shards(cache_path, fold_sketches, SKETCH_COLUMNS, shard_by, shards, workers, chunksize)
+    return functools.reduce(SketchCube.merge, partials, SketchCube.empty())
+
+
+def compare_states(state, reference):
+    """Exact checks of the counters between two states (the float results are checked separately)."""
+    return {
+        "rows": state.n == reference.n,
+        "impressions": state.total_impressions == reference.total_impressions,
+        "clicks": state.total_clicks == reference.total_clicks,
+        "deal_status": state.deal_counts == reference.deal_counts,
+        "payment_status": state.payment_counts == reference.payment_counts,
+        "advertisers": state.advertisers == reference.advertisers,
+        "cube_counts": bool(np.array_equal(state.cube.counts, reference.cube.counts)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compute the analysis aggregates in parallel shards.")
+    parser.add_argument("--csv", default=DEFAULT_CSV)
+    parser.add_argument("--shards", type=int, default=os.cpu_count())
+    parser.add_argument("--by", choices=SHARD_KEYS, default="campaign_id", help="Shard key")
+    parser.add_argument("--workers", type=int, default=None, help="Processes (default: one per shard, up to the CPUs)")
+    parser.add_argument("--chunksize", type=int, default=1_000_000, help="Rows gathered at a time per worker")
+    parser.add_argument("--check", action="store_true", help="Compare with the single-process path")
+    args = parser.parse_args()
+
+    dataset = CampaignDataset(args.csv)
+    state = run_sharded(dataset.ensure(), args.shards, args.by, args.workers, args.chunksize)
+    kpis = state.kpis()
+    print(f"{state.n:,} campaigns in {args.shards} shards by {args.by}")
+    print(f"  Total Actual Revenue:  ${state.totals()['actual']:,.2f}")
+    print(f"  Win Rate: {kpis['win_rate']:.1f}%  Overdue: {kpis['overdue_pct']:.1f}%  CTR: {kpis['overall_ctr']:.2f}%")
+
+    if args.check:
+        df = dataset.load(STREAM_COLUMNS)
+        exact = compare_states(state, StreamingAnalysis().update(df))
+        close = compare_with_frame(state, df)
+        print("\nCheck against the single-process path:")
+        for name, ok in exact.items():
+            print(f"  {name:<15} {'identical' if ok else 'DIFFERENT'}")
+        for name, (diff, ok) in close.items():
+            print(f"  {name:<15} max rel diff {diff:.2e} {'ok' if ok else 'FAIL'}")
+        if not all(exact.values()) or not all(ok for _, ok in close.values()):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
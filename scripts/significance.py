@@ -0,0 +1,154 @@
+"""
+Batched segment significance tests from per-group sufficient statistics.
+
+Generalizes the section 6 Enterprise vs Growth t-test to every pair of groups in
+every segment dimension, for several metrics at once. The inputs are per-group n,
+mean and variance (n, mean and M2) read off a rollup engine - the RollupCube built in
+memory, the merged cube of a streamed or sharded run, or the SQLite engine - so the
+cost depends on the number of groups, not rows. All pairs of a dimension are formed
+with one upper-triangle index and tested together with Welch's unequal-variance
+t-test; p-values are then adjusted across the whole family (Holm by default, or
+Benjamini-Hochberg).
+
+    tests = segment_tests(cube)
+    tests[tests["significant"]]
+
+    python scripts/significance.py --metric actual_revenue --check
+"""
+
+import argparse
+import sys
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+from data_access import DEFAULT_CSV, CampaignDataset
+from rollups import DIMENSIONS, METRICS, RollupCube
+
+SEGMENT_DIMENSIONS = ["account_tier", "ad_format", "platform", "industry", "sales_rep"]
+TEST_METRICS = ["actual_revenue", "margin_pct", "cpm", "delivery_rate"]
+CORRECTIONS = ("holm", "fdr_bh", "bonferroni", "none")
+
+
+def welch_ttest(n_a, mean_a, var_a, n_b, mean_b, var_b):
+    """Welch's t statistic, Welch-Satterthwaite degrees of freedom and two-sided p-value,
+    elementwise over arrays of group statistics (var with ddof=1)."""
+    se2_a, se2_b = var_a / n_a, var_b / n_b
+    se2 = se2_a + se2_b
+    with np.errstate(invalid="ignore", divide="ignore"):
+        t_stat = (mean_a - mean_b) / np.sqrt(se2)
+        dof = se2 ** 2 / (se2_a ** 2 / (n_a - 1) + se2_b ** 2 / (n_b - 1))
+    p_val = 2 * stats.t.sf(np.abs(t_stat), dof)
+    return t_stat, dof, p_val
+
+
+def adjust_pvalues(p_vals, method="holm"):
+    """Multiple-comparison adjusted p-values (NaNs are left out of the family)."""
+    if method not in CORRECTIONS:
+        raise ValueError(f"Unknown correction {method!r}; expected one of {CORRECTIONS}")
+    p_vals = np.asarray(p_vals, dtype=np.float64)
+    adjusted = np.full_like(p_vals, np.nan)
+    valid = ~np.isnan(p_vals)
+    p = p_vals[valid]
+    m = len(p)
+    if method == "none" or m == 0:
+        adjusted[valid] = p
+        return adjusted
+    if method == "bonferroni":
+        adjusted[valid] = np.minimum(p * m, 1.0)
+        return adjusted
+    order = np.argsort(p)
+    ranked = p[order]
+    if method == "holm":
+        # step-down: max over i' <= i of (m - i' + 1) p_(i')
+        stepped = np.maximum.accumulate(ranked * (m - np.arange(m)))
+    else:
+        # Benjamini-Hochberg step-up: min over i' >= i of m p_(i') / i'
+        stepped = np.minimum.accumulate((ranked * m / np.arange(1, m + 1))[::-1])[::-1]
+    out = np.empty(m)
+    out[order] = np.minimum(stepped, 1.0)
+    adjusted[valid] = out
+    return adjusted
+
+
+def group_stats(engine, dim, metric):
+    """Per-group n, mean and sample variance of `metric` by `dim` from a rollup engine."""
+    return engine.agg(dim, n=(metric, "count"), mean=(metric, "mean"), var=(metric, "var"))
+
+
+def pairwise_welch(groups):
+    """Welch tests for every pair of rows of a frame with n/mean/var columns."""
+    i, j = np.triu_indices(len(groups), k=1)
+    n = groups["n"].to_numpy(dtype=np.float64)
+    mean = groups["mean"].to_numpy(dtype=np.float64)
+    var = groups["var"].to_numpy(dtype=np.float64)
+    t_stat, dof, p_val = welch_ttest(n[i], mean[i], var[i], n[j], mean[j], var[j])
+    labels = groups.index.to_numpy()
+    return pd.DataFrame({
+        "group_a": labels[i], "group_b": labels[j],
+        "n_a": n[i].astype(np.int64), "n_b": n[j].astype(np.int64),
+        "mean_a": mean[i], "mean_b": mean[j], "diff": mean[i] - mean[j],
+        "t_stat": t_stat, "df": dof, "p_val": p_val,
+    })
+
+
+def segment_tests(engine, dims=SEGMENT_DIMENSIONS, metrics=TEST_METRICS, correction="holm", alpha=0.05):
+    """All pairwise Welch tests for `metrics` across `dims`, adjusted as one family.
+
+    Returns one row per (dimension, metric, pair) with raw and adjusted p-values.
+    """
+    parts = []
+    for dim in dims:
+        for metric in metrics:
+            part = pairwise_welch(group_stats(engine, dim, metric))
+            part.insert(0, "metric", metric)
+            part.insert(0, "dimension", dim)
+            parts.append(part)
+    tests = pd.concat(parts, ignore_index=True)
+    tests["p_adj"] = adjust_pvalues(tests["p_val"], correction)
+    tests["significant"] = tests["p_adj"] < alpha
+    return tests
+
+
+def check(tests, df, rtol=1e-9):
+    """Max relative difference of t and p from scipy.stats.ttest_ind(equal_var=False) on raw rows."""
+    worst = 0.0
+    for row in tests.itertuples(index=False):
+        a = df.loc[df[row.dimension] == row.group_a, row.metric]
+        b = df.loc[df[row.dimension] == row.group_b, row.metric]
+        t_stat, p_val = stats.ttest_ind(a, b, equal_var=False)
+        for got, exp in ((row.t_stat, t_stat), (row.p_val, p_val)):
+            worst = max(worst, abs(got - exp) / max(abs(exp), 1e-300))
+    return worst
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pairwise Welch t-tests across ad sales segments.")
+    parser.add_argument("--csv", default=DEFAULT_CSV)
+    parser.add_argument("--dims", nargs="+", default=SEGMENT_DIMENSIONS)
+    parser.add_argument("--metric", dest="metrics", action="append", help="Repeatable (default: all test metrics)")
+    parser.add_argument("--correction", choices=CORRECTIONS, default="holm")
+    parser.add_argument("--alpha", type=float, default=0.05)
+    parser.add_argument("--all", action="store_true", help="Print every pair, not only significant ones")
+    parser.add_argument("--check", action="store_true", help="Compare every test with scipy on the raw rows")
+    args = parser.parse_args()
+
+    dataset = CampaignDataset(args.csv)
+    df = dataset.load(DIMENSIONS + METRICS)
+    tests = segment_tests(RollupCube.from_frame(df), args.dims, args.metrics or TEST_METRICS,
+                          args.correction, args.alpha)
+    shown = tests if args.all else tests[tests["significant"]]
+    print(f"{len(tests)} pairwise tests, {int(tests['significant'].sum())} significant "
+          f"at alpha={args.alpha} after {args.correction} correction")
+    if len(shown):
+        print(shown.to_string(index=False, float_format=lambda v: f"{v:.4g}"))
+    if args.check:
+        worst = check(tests, df)
+        print(f"\nMax relative difference from scipy.stats.ttest_ind(equal_var=False): {worst:.2e}")
+        if worst > 1e-6:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
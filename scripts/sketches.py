@@ -0,0 +1,447 @@
+"""
+Mergeable sketches for distinct counts and percentiles, per rollup cell.
+
+RollupCube answers sums, means and variances, which add up across cells; distinct
+counts and percentiles do not, and keeping the raw values grows with the rows. A
+SketchCube keeps two fixed-size sketches for every cell of a small cube (quarter x
+industry x tier x format x rep by default), so any rollup of those
+dimensions is answered by merging cells, and cubes from chunks or shards combine with
+`merge`, as the RollupCube does:
+
+HyperLogLog registers count the distinct values of a column (advertiser). Each value
+is hashed to 64 bits; the low p bits pick one of 2^p one-byte registers per cell and
+the register keeps the largest 1 + trailing-zero count of the remaining bits seen.
+Merging is the register-wise max, so a union over cells, chunks or shards is exactly
+the sketch of the union (the same registers as one pass). Counts are read with Ertl's
+improved estimator, which needs no bias tables and is unbiased from a handful of
+values up to billions. Relative standard error is 1.04 / sqrt(2^p): 2.3% at the
+default p = 11 (2 KiB per cell), 1.6% at p = 12; about 95% of estimates fall within
+twice that, and counts below a few hundred are close to exact.
+
+A t-digest per metric (cpm, actual_revenue, delivery_rate) keeps weighted centroids
+sorted by mean. Centroids are merged while they fit in one unit of the k1 scale
+k(q) = delta / (2 pi) * asin(2q - 1), so clusters are large around the median and
+shrink towards the tails; a digest holds at most delta / 2 + 1 centroids whatever
+the rows, plus the exact minimum and maximum. Merging concatenates the centroids and
+compresses again; all digests of a cube are compressed together in a few vectorized
+passes. A quantile is interpolated between centroid midpoints, so its rank error is
+at most about one cluster, 2 pi sqrt(q (1 - q)) / delta: 1.6% of rows at the median,
+0.94% at p90 and 0.31% at p99 for the default delta = 200. Typical errors are ten
+times smaller (see benchmarks/bench_sketches.py).
+
+    sketches = SketchCube.from_frame(df)            # or .update(chunk) per chunk
+    sketches.agg(["sales_rep", "quarter"], advertisers=("advertiser", "nunique"),
+                 p99_cpm=("cpm", "p99"))
+
+    python scripts/sketches.py --by account_tier --chunksize 500 --check
+"""
+
+import argparse
+import sys
+
+import numpy as np
+import pandas as pd
+
+from data_access import DEFAULT_CSV, CampaignDataset
+
+SKETCH_DIMENSIONS = ["quarter", "industry", "account_tier", "ad_format", "sales_rep"]
+QUANTILE_METRICS = ["cpm", "actual_revenue", "delivery_rate"]
+DISTINCT_COLUMNS = ["advertiser"]
+SKETCH_COLUMNS = list(dict.fromkeys(SKETCH_DIMENSIONS + QUANTILE_METRICS + DISTINCT_COLUMNS))
+QUANTILES = (0.5, 0.9, 0.99)
+PRECISION = 11
+DELTA = 200
+
+
+# ---- HyperLogLog ----
+
+def hash64(series):
+    """(hashes, present): deterministic 64-bit hashes of a column, the same in every process.
+
+    Integer columns are hashed directly; other values are factorized first, so each
+    distinct label is hashed once.
+    """
+    values = series.to_numpy()
+    if values.dtype.kind in "iu":
+        return pd.util.hash_array(values), np.ones(len(values), bool)
+    codes, uniques = pd.factorize(series)
+    hashes = pd.util.hash_array(np.asarray(uniques, dtype=object))
+    return np.where(codes >= 0, hashes[np.maximum(codes, 0)], np.uint64(0)), codes >= 0
+
+
+def _register_ranks(hashes, p):
+    """(register index, rank) of each hash: low p bits, then 1 + trailing zeros of the rest."""
+    index = (hashes & np.uint64((1 << p) - 1)).astype(np.intp)
+    rest = hashes >> np.uint64(p)
+    lowest = rest & (~rest + np.uint64(1))  # isolates the lowest set bit: an exact power of two
+    with np.errstate(divide="ignore"):
+        zeros = np.rint(np.log2(lowest.astype(np.float64)))
+    rank = np.where(rest == 0, 64 - p + 1, zeros + 1)
+    return index, rank.astype(np.uint8)
+
+
+def _sigma(x):
+    out, y = x.copy(), 1.0
+    for _ in range(64):
+        x = x * x
+        out += x * y
+        y *= 2.0
+    return out
+
+
+def _tau(x):
+    inner = (x > 0) & (x < 1)
+    x = np.where(inner, x, 0.5)
+    out, y = 1.0 - x, 1.0
+    for _ in range(64):
+        x = np.sqrt(x)
+        y *= 0.5
+        out -= (1.0 - x) ** 2 * y
+    return np.where(inner, out / 3.0, 0.0)
+
+
+def hll_estimate(registers):
+    """Distinct-count estimate for each row of a (groups, 2^p) register matrix (Ertl 2017)."""
+    groups, m = registers.shape
+    p = m.bit_length() - 1
+    q = 64 - p
+    flat = (np.arange(groups)[:, None] * (q + 2) + registers).ravel()
+    hist = np.bincount(flat, minlength=groups * (q + 2)).reshape(groups, q + 2).astype(np.float64)
+    z = m * _tau(1.0 - hist[:, q + 1] / m)
+    for k in range(q, 0, -1):
+        z = 0.5 * (z + hist[:, k])
+    empty = hist[:, 0] == m
+    z = z + m * _sigma(np.where(empty, 0.0, hist[:, 0] / m))
+    with np.errstate(divide="ignore"):
+        return np.where(empty, 0.0, m * m / (2 * np.log(2)) / z)
+
+
+# ---- t-digest ----
+
+def compress(keys, means, weights, delta=DELTA):
+    """Merge centroids per key (one digest per key) so each cluster spans about one unit
+    of the k1 scale. Returns (keys, means, weights) sorted by key, then mean."""
+    # By mean, then a stable sort by key: a radix sort when the keys fit in int16 (few
+    # cells), several times faster than np.lexsort
+    order = np.argsort(means)
+    narrow = np.int16 if not len(keys) or keys.max() < 2 ** 15 else keys.dtype
+    order = order[np.argsort(keys[order].astype(narrow), kind="stable")]
+    keys, means, weights = keys[order], means[order], weights[order]
+    if not len(keys):
+        return keys, means, weights
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    sizes = np.diff(np.r_[starts, len(keys)])
+    cum = np.cumsum(weights)
+    before = np.repeat((cum - weights)[starts], sizes)
+    total = np.repeat(np.add.reduceat(weights, starts), sizes)
+    q = (cum - weights / 2 - before) / total
+    bucket = np.floor(delta / (2 * np.pi) * np.arcsin(np.clip(2 * q - 1, -1.0, 1.0)))
+    firsts = np.flatnonzero(np.r_[True, (keys[1:] != keys[:-1]) | (bucket[1:] != bucket[:-1])])
+    merged = np.add.reduceat(weights, firsts)
+    return keys[firsts], np.add.reduceat(weights * means, firsts) / merged, merged
+
+
+def digest_quantiles(means, weights, lo, hi, qs):
+    """Quantiles `qs` of one digest: linear between centroid midpoints, then to the min/max."""
+    if not len(means):
+        return np.full(len(qs), np.nan)
+    total = weights.sum()
+    positions = np.concatenate(([0.0], np.cumsum(weights) - weights / 2, [total]))
+    values = np.concatenate(([lo], means, [hi]))
+    return np.interp(np.asarray(qs) * total, positions, values)
+
+
+def parse_quantile(func):
+    """'median' -> 0.5, 'p99' -> 0.99, 'p99.9' -> 0.999 (None if func is not a quantile)."""
+    if func == "median":
+        return 0.5
+    if func.startswith("p"):
+        try:
+            q = float(func[1:]) / 100
+        except ValueError:
+            return None
+        return q if 0 <= q <= 1 else None
+    return None
+
+
+class SketchCube:
+    """Per-cell row counts, HLL registers per distinct column and a t-digest per metric."""
+
+    def __init__(self, dims, labels, counts, registers, digests, bounds,
+                 metrics=QUANTILE_METRICS, distinct=DISTINCT_COLUMNS, precision=PRECISION, delta=DELTA):
+        self.dims = list(dims)
+        self.labels = [list(l) for l in labels]
+        self.counts = counts
+        self.registers = registers    # {column: uint8 array, shape + (2^p,)}
+        self.digests = digests        # {metric: (cell keys, means, weights)}, compressed per cell
+        self.bounds = bounds          # {metric: (min, max) arrays of the cube's shape}
+        self.metrics = list(metrics)
+        self.distinct = list(distinct)
+        self.precision = precision
+        self.delta = delta
+
+    @property
+    def shape(self):
+        return tuple(len(l) for l in self.labels)
+
+    @property
+    def config(self):
+        return self.dims, self.metrics, self.distinct, self.precision, self.delta
+
+    @property
+    def nbytes(self):
+        """Size of the sketch state (independent of the rows once every cell is populated)."""
+        return (self.counts.nbytes + sum(r.nbytes for r in self.registers.values())
+                + sum(a.nbytes for d in self.digests.values() for a in d)
+                + sum(a.nbytes for b in self.bounds.values() for a in b))
+
+    @classmethod
+    def empty(cls, dims=SKETCH_DIMENSIONS, metrics=QUANTILE_METRICS, distinct=DISTINCT_COLUMNS,
+              precision=PRECISION, delta=DELTA):
+        shape = (0,) * len(dims)
+        registers = {c: np.zeros(shape + (1 << precision,), np.uint8) for c in distinct}
+        digests = {m: (np.zeros(0, np.intp), np.zeros(0), np.zeros(0)) for m in metrics}
+        bounds = {m: (np.zeros(shape), np.zeros(shape)) for m in metrics}
+        return cls(dims, [[] for _ in dims], np.zeros(shape, np.int64), registers, digests, bounds,
+                   metrics, distinct, precision, delta)
+
+    @classmethod
+    def from_frame(cls, df, dims=SKETCH_DIMENSIONS, metrics=QUANTILE_METRICS, distinct=DISTINCT_COLUMNS,
+                   precision=PRECISION, delta=DELTA):
+        """Sketch one scan of `df`. Rows with a missing dimension are dropped, as in groupby."""
+        codes, labels = [], []
+        for d in dims:
+            c, uniques = pd.factorize(df[d], sort=True)
+            codes.append(c)
+            labels.append(list(uniques))
+        shape = tuple(len(l) for l in labels)
+        size = int(np.prod(shape))
+        valid = np.logical_and.reduce([c >= 0 for c in codes])
+        key = np.ravel_multi_index([c[valid] for c in codes], shape)
+        counts = np.bincount(key, minlength=size).reshape(shape)
+
+        m = 1 << precision
+        registers = {}
+        for column in distinct:
+            hashes, present = hash64(df[column])
+            keep = present[valid]
+            index, rank = _register_ranks(hashes[valid][keep], precision)
+            flat = np.zeros(size * m, np.uint8)
+            np.maximum.at(flat, key[keep] * m + index, rank)
+            registers[column] = flat.reshape(shape + (m,))
+
+        digests, bounds = {}, {}
+        for metric in metrics:
+            values = df[metric].to_numpy(dtype=np.float64)[valid]
+            keep = ~np.isnan(values)
+            cells, values = key[keep], values[keep]
+            digests[metric] = compress(cells, values, np.ones(len(values)), delta)
+            lo = np.full(size, np.inf)
+            hi = np.full(size, -np.inf)
+            np.minimum.at(lo, cells, values)
+            np.maximum.at(hi, cells, values)
+            bounds[metric] = (lo.reshape(shape), hi.reshape(shape))
+        return cls(dims, labels, counts, registers, digests, bounds, metrics, distinct, precision, delta)
+
+    def update(self, chunk):
+        """Fold in a DataFrame chunk."""
+        merged = self.merge(SketchCube.from_frame(chunk, *self.config))
+        self.labels, self.counts = merged.labels, merged.counts
+        self.registers, self.digests, self.bounds = merged.registers, merged.digests, merged.bounds
+        return self
+
+    def _aligned(self, labels):
+        """The state re-indexed onto `labels` (a superset of self.labels per dim)."""
+        shape = tuple(len(l) for l in labels)
+        positions = [np.searchsorted(np.asarray(new, dtype=object), np.asarray(old, dtype=object))
+                     if old else np.zeros(0, np.intp)
+                     for new, old in zip(labels, self.labels)]
+        counts = np.zeros(shape, np.int64)
+        registers = {c: np.zeros(shape + r.shape[-1:], np.uint8) for c, r in self.registers.items()}
+        bounds = {m: (np.full(shape, np.inf), np.full(shape, -np.inf)) for m in self.metrics}
+        digests = {}
+        if self.counts.size:
+            idx = np.ix_(*positions)
+            counts[idx] = self.counts
+            for c, r in self.registers.items():
+                registers[c][idx] = r
+            for m, (lo, hi) in self.bounds.items():
+                bounds[m][0][idx] = lo
+                bounds[m][1][idx] = hi
+        for m, (keys, means, weights) in self.digests.items():
+            cells = np.unravel_index(keys, self.shape) if len(keys) else [keys] * len(shape)
+            keys = np.ravel_multi_index([p[c] for p, c in zip(positions, cells)], shape)
+            digests[m] = (keys, means, weights)
+        return labels, counts, registers, digests, bounds
+
+    def merge(self, other):
+        """Combine two sketch cubes over the same configuration (e.g. from chunks or shards)."""
+        if other.config != self.config:
+            raise ValueError("Cannot merge sketch cubes with different dimensions, columns or precision")
+        if self.labels == other.labels:
+            a = (self.labels, self.counts, self.registers, self.digests, self.bounds)
+            b = (other.labels, other.counts, other.registers, other.digests, other.bounds)
+        else:
+            labels = [sorted(set(x) | set(y)) for x, y in zip(self.labels, other.labels)]
+            a, b = self._aligned(labels), other._aligned(labels)
+        registers = {c: np.maximum(a[2][c], b[2][c]) for c in self.distinct}
+        digests = {m: compress(*(np.concatenate([x, y]) for x, y in zip(a[3][m], b[3][m])), self.delta)
+                   for m in self.metrics}
+        bounds = {m: (np.fmin(a[4][m][0], b[4][m][0]), np.fmax(a[4][m][1], b[4][m][1])) for m in self.metrics}
+        return SketchCube(self.dims, a[0], a[1] + b[1], registers, digests, bounds, *self.config[1:])
+
+    # ---- Rollups ----
+    def _axes(self, by):
+        by = [by] if isinstance(by, str) else list(by)
+        unknown = [d for d in by if d not in self.dims]
+        if unknown:
+            raise KeyError(f"Not a sketch dimension: {unknown} (sketches have {self.dims})")
+        return by, [self.dims.index(d) for d in by]
+
+    def _rolled(self, array, axes, reduce):
+        """A per-cell array (cube shape + trailing axes) reduced onto `axes`, flattened in that order."""
+        drop = tuple(i for i in range(len(self.dims)) if i not in axes)
+        rolled = reduce(array, axis=drop) if drop else array
+        order = tuple(np.argsort(np.argsort(axes)))
+        trailing = tuple(range(len(axes), rolled.ndim))
+        rolled = np.transpose(rolled, order + trailing)
+        return rolled.reshape((-1,) + rolled.shape[len(axes):])
+
+    def _group_index(self, by, axes):
+        if not by:
+            return pd.Index(["All"])
+        index = pd.MultiIndex.from_product([self.labels[a] for a in axes], names=by)
+        return index.get_level_values(0) if len(by) == 1 else index
+
+    def _counts(self, axes):
+        return self._rolled(self.counts, axes, np.sum)
+
+    def _distinct(self, column, axes):
+        if column not in self.registers:
+            raise KeyError(f"Column {column!r} was not sketched for distinct counts (sketches have {self.distinct})")
+        return hll_estimate(self._rolled(self.registers[column], axes, np.max))
+
+    def _quantiles(self, metric, axes, qs):
+        """(groups, len(qs)) quantiles of `metric` for every group of the rollup, NaN where empty."""
+        if metric not in self.digests:
+            raise KeyError(f"Metric {metric!r} has no digest (sketches have {self.metrics})")
+        keys, means, weights = self.digests[metric]
+        groups = int(np.prod([len(self.labels[a]) for a in axes]))
+        if not axes:
+            keys = np.zeros(len(keys), np.intp)
+        elif len(keys):
+            cells = np.unravel_index(keys, self.shape)
+            keys = np.ravel_multi_index([cells[a] for a in axes], [len(self.labels[a]) for a in axes])
+        keys, means, weights = compress(keys, means, weights, self.delta)
+        lo = self._rolled(self.bounds[metric][0], axes, np.min)
+        hi = self._rolled(self.bounds[metric][1], axes, np.max)
+        out = np.full((groups, len(qs)), np.nan)
+        starts = np.searchsorted(keys, np.arange(groups + 1))
+        for g in np.flatnonzero(np.diff(starts)):
+            part = slice(starts[g], starts[g + 1])
+            out[g] = digest_quantiles(means[part], weights[part], lo[g], hi[g], qs)
+        return out
+
+    def distinct_counts(self, by, column="advertiser"):
+        """Estimated distinct values of `column` per group (empty groups removed)."""
+        return self.agg(by, **{column: (column, "nunique")})[column]
+
+    def quantiles(self, by, metric, qs=QUANTILES):
+        """Estimated quantiles of `metric` per group: one p<nn> column per q."""
+        return self.agg(by, **{f"p{q * 100:g}": (metric, f"p{q * 100:g}") for q in qs})
+
+    def agg(self, by, **named):
+        """Named aggregation like `RollupCube.agg`: func is count, nunique (of a sketched
+        distinct column), median or p<nn> (p90, p99, p99.9) of a sketched metric."""
+        by, axes = self._axes(by)
+        counts = self._counts(axes)
+        keep = counts > 0
+        out = {}
+        quantiles = {}
+        for name, (column, func) in named.items():
+            if func == "count":
+                out[name] = counts
+            elif func == "nunique":
+                out[name] = np.rint(self._distinct(column, axes)).astype(np.int64)
+            elif parse_quantile(func) is not None:
+                quantiles.setdefault(column, []).append((name, parse_quantile(func)))
+                out[name] = None
+            else:
+                raise ValueError(f"Unsupported sketch aggregation {func!r}; expected count, nunique, "
+                                 f"median or p<nn>")
+        for metric, wanted in quantiles.items():
+            values = self._quantiles(metric, axes, [q for _, q in wanted])
+            for j, (name, _) in enumerate(wanted):
+                out[name] = values[:, j]
+        return pd.DataFrame({name: values[keep] for name, values in out.items()},
+                            index=self._group_index(by, axes)[keep])
+
+
+def compare_with_frame(sketches, df, by, qs=QUANTILES):
+    """Errors of the sketched rollup to `by` against the raw rows, one array per check:
+    relative error of each group's distinct count, and rank error of each quantile. The
+    estimate lies between two adjacent order statistics a <= estimate <= b; the rank
+    error is how far q falls outside [rows below a, rows up to b] / n (so an exact
+    quantile, interpolated between order statistics like pandas does, scores 0)."""
+    by = [by] if isinstance(by, str) else list(by)
+    groups = [part for _, part in df.groupby(by, observed=True, sort=True)] if by else [df]
+    errors = {}
+    for column in sketches.distinct:
+        exact = np.array([part[column].nunique() for part in groups], dtype=np.float64)
+        got = sketches.distinct_counts(by, column).to_numpy(dtype=np.float64)
+        errors[f"{column} distinct"] = np.abs(got - exact) / np.maximum(exact, 1)
+    for metric in sketches.metrics:
+        got = sketches.quantiles(by, metric, qs).to_numpy()
+        ordered = [np.sort(part[metric].dropna().to_numpy(dtype=np.float64)) for part in groups]
+        for j, q in enumerate(qs):
+            ranks = np.zeros(len(groups))
+            for g, (values, estimate) in enumerate(zip(ordered, got[:, j])):
+                n = len(values)
+                a = values[max(np.searchsorted(values, estimate, "right") - 1, 0)]
+                b = values[min(np.searchsorted(values, estimate, "left"), n - 1)]
+                below, upto = np.searchsorted(values, a, "left") / n, np.searchsorted(values, b, "right") / n
+                ranks[g] = max(0.0, below - q, q - upto)
+            errors[f"{metric} p{q * 100:g} rank"] = ranks
+    return errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Distinct counts and percentiles from mergeable sketches.")
+    parser.add_argument("--csv", default=DEFAULT_CSV)
+    parser.add_argument("--by", nargs="*", choices=SKETCH_DIMENSIONS, default=["account_tier"],
+                        help="Rollup dimensions (none for the grand total)")
+    parser.add_argument("--precision", type=int, default=PRECISION, help="HLL registers per cell = 2^precision")
+    parser.add_argument("--delta", type=float, default=DELTA, help="t-digest compression")
+    parser.add_argument("--chunksize", type=int, default=1_000_000)
+    parser.add_argument("--check", action="store_true", help="Compare with exact distinct counts and quantiles")
+    args = parser.parse_args()
+
+    df = CampaignDataset(args.csv).load(SKETCH_COLUMNS)
+    sketches = SketchCube.empty(precision=args.precision, delta=args.delta)
+    for start in range(0, len(df), args.chunksize):
+        sketches.update(df.iloc[start:start + args.chunksize])
+    table = sketches.agg(args.by, campaigns=("campaign_id", "count"), advertisers=("advertiser", "nunique"),
+                         **{f"{m}_p{q * 100:g}": (m, f"p{q * 100:g}") for m in QUANTILE_METRICS for q in QUANTILES})
+    print(f"{len(df):,} campaigns sketched in chunks of {args.chunksize:,} ({sketches.nbytes / 1e6:.1f} MB of state)\n")
+    print(table.round(3).to_string())
+
+    if args.check:
+        errors = compare_with_frame(sketches, df, args.by)
+        print(f"\n{'Check':<28} {'Max error':>10} {'Mean':>10}")
+        failed = False
+        for name, values in errors.items():
+            # Four standard errors for the counts, the documented rank bound for the quantiles
+            if name.endswith("distinct"):
+                bound = 4 * 1.04 / np.sqrt(2 ** args.precision)
+            else:
+                q = float(name.split(" p")[1].split()[0]) / 100
+                bound = 2 * np.pi * np.sqrt(q * (1 - q)) / args.delta
+            ok = values.max() <= bound
+            failed |= not ok
+            print(f"{name:<28} {values.max():>10.2e} {values.mean():>10.2e} {'ok' if ok else 'OUT OF BOUND'}")
+        if failed:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
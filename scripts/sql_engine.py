@@ -0,0 +1,315 @@
+"""
+In-process SQL engine for the ad sales data on stdlib sqlite3.
+
+Bulk-loads the `ad_sales` table from the Arrow cache (or straight from a CSV), adds
+indexes on the GROUP BY / ORDER BY columns, and runs scripts/ad_sales_queries.sql.
+The database file lives next to the Arrow cache and records the source CSV's size
+and mtime, so it is reloaded only when the CSV changes. `SQLiteStore.agg` mirrors
+`RollupCube.agg`, which lets ad_sales_analysis.py use it as an alternative engine:
+
+    python scripts/sql_engine.py                # run the query file and print results
+    python scripts/sql_engine.py --check        # compare each query with pandas
+    python notebooks/ad_sales_analysis.py --engine sql
+"""
+
+import argparse
+import csv
+import os
+import re
+import sqlite3
+import sys
+import threading
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from data_access import COLUMNS, DEFAULT_CSV, SCHEMA, CampaignDataset
+
+DEFAULT_DB = os.path.join(os.path.dirname(DEFAULT_CSV), ".cache", "ad_sales_data.sqlite")
+QUERIES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ad_sales_queries.sql")
+TABLE = "ad_sales"
+INDEXED_COLUMNS = ["quarter", "industry", "ad_format", "sales_rep", "account_tier", "payment_status", "actual_revenue"]
+SQL_TYPES = {"int64": "INTEGER", "float64": "REAL", "category": "TEXT"}
+SQL_FUNCS = {"sum": "SUM", "count": "COUNT", "mean": "AVG"}
+
+# Decimal places each output column is ROUNDed to in ad_sales_queries.sql (parity tolerance)
+DECIMALS = {
+    "total_booked": 2, "total_actual": 2, "total_budget": 2, "total_revenue": 2, "total_margin": 2,
+    "avg_revenue": 2, "avg_cpm": 2, "avg_ctr_pct": 2, "revenue": 2, "margin": 2, "ctr_pct": 2,
+    "variance_pct": 1, "avg_margin_pct": 1, "avg_margin": 1, "avg_delivery_pct": 1, "margin_pct": 1,
+}
+
+
+def _csv_stamp(csv_path):
+    st = os.stat(csv_path)
+    return {"source_size": str(st.st_size), "source_mtime_ns": str(st.st_mtime_ns)}
+
+
+def _pylist(array):
+    """Python values of an Arrow array; dictionary columns are decoded through their
+    (small) dictionary with numpy, which is much faster than Array.to_pylist."""
+    if pa.types.is_dictionary(array.type):
+        labels = np.asarray(array.dictionary.to_pylist(), dtype=object)
+        return labels[array.indices.to_numpy(zero_copy_only=False)].tolist()
+    if array.null_count:
+        return array.to_pylist()
+    return array.to_numpy(zero_copy_only=False).tolist()
+
+
+def read_queries(path=QUERIES_PATH):
+    """[(title, sql)] for each statement in the query file, titled by its `-- N. ...` comment."""
+    with open(path) as f:
+        text = f.read()
+    queries = []
+    for statement in text.split(";"):
+        titles = re.findall(r"^--\s*(\d+\..*)$", statement, flags=re.MULTILINE)
+        sql = "\n".join(line for line in statement.splitlines() if not line.lstrip().startswith("--")).strip()
+        if sql:
+            queries.append((titles[-1].strip() if titles else sql.splitlines()[0], sql))
+    return queries
+
+
+class SQLiteStore:
+    """The `ad_sales` table in a SQLite file, indexed for the analysis queries."""
+
+    def __init__(self, path=DEFAULT_DB):
+        self.path = path
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        # Pipeline stages query from several threads; one statement at a time per connection
+        self._lock = threading.Lock()
+
+    def close(self):
+        self.conn.close()
+
+    def __getstate__(self):
+        # Pickles as its path (e.g. a memoized pipeline stage); the data stays in the file
+        if self.path == ":memory:":
+            raise TypeError("An in-memory SQLite store cannot be pickled")
+        return {"path": self.path}
+
+    def __setstate__(self, state):
+        self.__init__(state["path"])
+
+    def stamp(self):
+        return dict(self.conn.execute("SELECT key, value FROM meta").fetchall())
+
+    def is_fresh(self, csv_path):
+        """True when the table was loaded from the current version of `csv_path`."""
+        return bool(self.stamp()) and self.stamp() == _csv_stamp(csv_path)
+
+    def _reset(self):
+        self.conn.execute(f"DROP TABLE IF EXISTS {TABLE}")
+        self.conn.execute("DELETE FROM meta")
+        columns = ", ".join(f"{c} {SQL_TYPES[SCHEMA[c]]}" for c in COLUMNS)
+        self.conn.execute(f"CREATE TABLE {TABLE} ({columns})")
+
+    def _bulk_load(self, batches, stamp):
+        """Insert row batches in one transaction with journaling off, then index."""
+        self.conn.execute("PRAGMA journal_mode = OFF")
+        self.conn.execute("PRAGMA synchronous = OFF")
+        insert = f"INSERT INTO {TABLE} ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})"
+        with self.conn:
+            self._reset()
+            rows = 0
+            for batch in batches:
+                rows += self.conn.executemany(insert, batch).rowcount
+            for column in INDEXED_COLUMNS:
+                self.conn.execute(f"CREATE INDEX idx_{TABLE}_{column} ON {TABLE} ({column})")
+            self.conn.executemany("INSERT INTO meta VALUES (?, ?)", stamp.items())
+        self.conn.execute("ANALYZE")
+        return rows
+
+    def load_table(self, table, stamp=None, batch_rows=100_000):
+        """(Re)load from an Arrow table, e.g. the memory-mapped cache."""
+        table = table.select(COLUMNS)
+
+        def batches():
+            for batch in table.to_batches(max_chunksize=batch_rows):
+                yield zip(*(_pylist(batch.column(c)) for c in COLUMNS))
+
+        return self._bulk_load(batches(), stamp or {})
+
+    def load_csv(self, csv_path, batch_rows=100_000):
+        """(Re)load straight from a CSV with the csv module (no pandas/Arrow parse)."""
+        casts = [int if SCHEMA[c] == "int64" else float if SCHEMA[c] == "float64" else str for c in COLUMNS]
+
+        def batches():
+            with open(csv_path, newline="") as f:
+                reader = csv.reader(f)
+                header = next(reader)
+                positions = [header.index(c) for c in COLUMNS]
+                batch = []
+                for record in reader:
+                    batch.append(tuple(cast(record[i]) for cast, i in zip(casts, positions)))
+                    if len(batch) == batch_rows:
+                        yield batch
+                        batch = []
+                if batch:
+                    yield batch
+
+        return self._bulk_load(batches(), _csv_stamp(csv_path))
+
+    def ensure(self, dataset):
+        """Load from the dataset's Arrow cache unless already loaded from the current CSV."""
+        if not self.is_fresh(dataset.csv_path):
+            self.load_table(dataset.table(), _csv_stamp(dataset.csv_path))
+        return self
+
+    def query(self, sql, params=()):
+        with self._lock:
+            return pd.read_sql_query(sql, self.conn, params=params)
+
+    def run_queries(self, path=QUERIES_PATH):
+        """[(title, result DataFrame)] for every query in the file."""
+        return [(title, self.query(sql)) for title, sql in read_queries(path)]
+
+    def agg(self, by, **named):
+        """Named aggregation with the same interface as `RollupCube.agg`.
+
+        var and std (ddof=1) are two-pass: rows are joined to their group means first,
+        so no sum of squares is formed.
+        """
+        by = [by] if isinstance(by, str) else list(by)
+        exprs, spread, roots = [], [], []
+        for name, (column, func) in named.items():
+            if func in SQL_FUNCS:
+                exprs.append(f"{SQL_FUNCS[func]}({column}) AS {name}")
+            elif func in ("var", "std"):
+                spread.append(column)
+                exprs.append(f"SUM((t.{column} - g.mean_{column}) * (t.{column} - g.mean_{column}))"
+                             f" / (COUNT(t.{column}) - 1) AS {name}")
+                if func == "std":
+                    roots.append(name)
+            else:
+                raise ValueError(f"Unsupported aggregation {func!r}; expected one of "
+                                 f"{tuple(SQL_FUNCS) + ('var', 'std')}")
+        source = f"{TABLE} t"
+        if spread:
+            means = f"SELECT {', '.join(by + [f'AVG({c}) AS mean_{c}' for c in dict.fromkeys(spread)])} FROM {TABLE}"
+            if by:
+                source += f" JOIN ({means} GROUP BY {', '.join(by)}) g USING ({', '.join(by)})"
+            else:
+                source += f" CROSS JOIN ({means}) g"
+        sql = f"SELECT {', '.join(by + exprs)} FROM {source}"
+        if by:
+            sql += f" GROUP BY {', '.join(by)} ORDER BY {', '.join(by)}"
+        with self._lock:
+            out = pd.read_sql_query(sql, self.conn, index_col=by or None)
+        for name in roots:
+            out[name] = np.sqrt(out[name])
+        return out
+
+    def count_distinct(self, *columns):
+        exprs = ", ".join(f"COUNT(DISTINCT {c})" for c in columns)
+        with self._lock:
+            return dict(zip(columns, self.conn.execute(f"SELECT {exprs} FROM {TABLE}").fetchone()))
+
+    def num_rows(self):
+        with self._lock:
+            return self.conn.execute(f"SELECT COUNT(*) FROM {TABLE}").fetchone()[0]
+
+
+# ---- The same seven queries on a DataFrame (parity reference) ----
+
+def _summary(df, by, **named):
+    out = df.groupby(by, observed=True).agg(**named)
+    if "total_actual" in out and "total_budget" in out:
+        out["variance_pct"] = (out["total_actual"] - out["total_budget"]) / out["total_budget"] * 100
+    return out.reset_index()
+
+
+def pandas_queries(df):
+    """Unrounded pandas results for the queries in ad_sales_queries.sql, in file order."""
+    df = df.assign(ctr_pct=df["ctr"] * 100, delivery_pct=df["delivery_rate"] * 100)
+    q1 = _summary(df, "quarter", campaigns=("campaign_id", "count"), total_booked=("booked_revenue", "sum"),
+                  total_actual=("actual_revenue", "sum"), total_budget=("budget", "sum"))
+    q2 = _summary(df, "industry", campaigns=("campaign_id", "count"), total_revenue=("actual_revenue", "sum"),
+                  avg_revenue=("actual_revenue", "mean"), avg_margin_pct=("margin_pct", "mean"),
+                  avg_cpm=("cpm", "mean"))
+    q3 = _summary(df, "ad_format", campaigns=("campaign_id", "count"), avg_cpm=("cpm", "mean"),
+                  avg_ctr_pct=("ctr_pct", "mean"), total_revenue=("actual_revenue", "sum"),
+                  avg_margin=("margin_pct", "mean"), avg_delivery_pct=("delivery_pct", "mean"))
+    q4 = _summary(df, "sales_rep", campaigns=("campaign_id", "count"), total_revenue=("actual_revenue", "sum"),
+                  total_budget=("budget", "sum"), avg_margin=("margin_pct", "mean"),
+                  total_margin=("gross_margin", "sum"))
+    q4["variance_pct"] = (q4["total_revenue"] - q4["total_budget"]) / q4["total_budget"] * 100
+    q5 = _summary(df, "account_tier", campaigns=("campaign_id", "count"), total_revenue=("actual_revenue", "sum"),
+                  avg_revenue=("actual_revenue", "mean"), avg_margin=("margin_pct", "mean"), avg_cpm=("cpm", "mean"))
+    q6 = _summary(df, "payment_status", campaigns=("campaign_id", "count"),
+                  total_revenue=("actual_revenue", "sum"), avg_revenue=("actual_revenue", "mean"))
+    q7 = df.nlargest(20, "actual_revenue").rename(
+        columns={"actual_revenue": "revenue", "gross_margin": "margin"})
+    return [
+        q1.sort_values("quarter"),
+        q2.sort_values("total_revenue", ascending=False),
+        q3.sort_values("avg_cpm", ascending=False),
+        q4.sort_values("total_revenue", ascending=False),
+        q5.sort_values("avg_revenue", ascending=False),
+        q6.sort_values("total_revenue", ascending=False),
+        q7[["campaign_id", "advertiser", "industry", "ad_format", "quarter", "revenue", "margin",
+            "margin_pct", "cpm", "ctr_pct"]],
+    ]
+
+
+def compare_results(sql_result, expected):
+    """True when a SQL result matches the unrounded pandas one: same rows in the same
+    order, and every ROUNDed value within half a unit of its last decimal place."""
+    if set(sql_result.columns) != set(expected.columns) or len(sql_result) != len(expected):
+        return False
+    for column in sql_result.columns:
+        got, exp = sql_result[column].to_numpy(), expected[column].to_numpy()
+        if not pd.api.types.is_numeric_dtype(expected[column]):
+            if not (got.astype(str) == exp.astype(str)).all():
+                return False
+            continue
+        tol = 0.5 * 10.0 ** -DECIMALS[column] if column in DECIMALS else 0.0
+        if not np.all(np.abs(got.astype(np.float64) - exp.astype(np.float64)) <= tol + 1e-9 * np.abs(exp)):
+            return False
+    return True
+
+
+def check_parity(store, df):
+    """Run every query through SQLite and pandas and report per-query agreement."""
+    ok = True
+    for (title, result), expected in zip(store.run_queries(), pandas_queries(df)):
+        same = compare_results(result, expected)
+        print(f"  {title:<50} {'ok' if same else 'MISMATCH'}")
+        ok &= same
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run ad_sales_queries.sql on an indexed SQLite copy of the data.")
+    parser.add_argument("--csv", default=DEFAULT_CSV)
+    parser.add_argument("--db", default=DEFAULT_DB)
+    parser.add_argument("--from-csv", action="store_true", help="Load with the csv module instead of the Arrow cache")
+    parser.add_argument("--reload", action="store_true", help="Reload even if the database is fresh")
+    parser.add_argument("--check", action="store_true", help="Compare every query with pandas")
+    args = parser.parse_args()
+
+    store = SQLiteStore(args.db)
+    try:
+        dataset = CampaignDataset(args.csv)
+        if args.from_csv and (args.reload or not store.is_fresh(args.csv)):
+            store.load_csv(args.csv)
+        elif args.reload:
+            store.load_table(dataset.table(), _csv_stamp(args.csv))
+        else:
+            store.ensure(dataset)
+        if args.check:
+            if not check_parity(store, dataset.load()):
+                sys.exit(1)
+            return
+        for title, result in store.run_queries():
+            print(f"\n-- {title}")
+            print(result.to_string(index=False))
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
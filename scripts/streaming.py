@@ -0,0 +1,214 @@
+"""
+Out-of-core streaming mode for the ad sales analysis.
+
+Reads the campaign data in chunks (CSV, a directory of part-*.csv partitions from
+generate_data.py, or the Arrow cache) and folds each chunk into mergeable partial
+state: a RollupCube (counts, sums, M2 per cell) for every rollup, exact counters for
+the KPIs, the label sets behind the distinct counts, and co-moments for the
+correlation matrix. Memory is bounded by the chunk size; states from different
+chunks, files or processes combine with `merge`.
+
+    python scripts/streaming.py --chunksize 500 --check
+"""
+
+import argparse
+import glob
+import os
+import sys
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+from comoments import CORR_COLUMNS, CoMoments
+from data_access import DEFAULT_CSV, CampaignDataset, read_csv_typed
+from rollups import DIMENSIONS, METRICS, RollupCube
+
+KPI_COLUMNS = ["advertiser", "impressions", "clicks", "deal_status", "payment_status"]
+STREAM_COLUMNS = list(dict.fromkeys(DIMENSIONS + METRICS + KPI_COLUMNS + CORR_COLUMNS))
+
+
+def iter_chunks(source=DEFAULT_CSV, columns=None, chunksize=1_000_000):
+    """Yield typed DataFrame chunks from a CSV file, a partition directory or an .arrow cache."""
+    columns = columns or STREAM_COLUMNS
+    if os.path.isdir(source):
+        paths = sorted(glob.glob(os.path.join(source, "part-*.csv")))
+        if not paths:
+            raise FileNotFoundError(f"No part-*.csv partitions in {source}")
+    else:
+        paths = [source]
+    for path in paths:
+        if path.endswith(".arrow"):
+            import pyarrow as pa
+            with pa.memory_map(path) as mm:
+                table = pa.ipc.open_file(mm).read_all().select(columns)
+                for batch in table.to_batches(max_chunksize=chunksize):
+                    yield batch.to_pandas()
+        else:
+            yield from read_csv_typed(path, columns=columns, chunksize=chunksize)
+
+
+def _observed_counts(series):
+    counts = series.value_counts()
+    return counts[counts > 0].to_dict()
+
+
+class StreamingAnalysis:
+    """Mergeable partial state for every rollup, KPI and statistic the analysis prints."""
+
+    def __init__(self):
+        self.cube = RollupCube.empty()
+        self.n = 0
+        self.total_impressions = 0
+        self.total_clicks = 0
+        self.deal_counts = Counter()
+        self.payment_counts = Counter()
+        self.advertisers = set()
+        self.comoments = CoMoments(CORR_COLUMNS)
+
+    def update(self, chunk):
+        self.cube = self.cube.merge(RollupCube.from_frame(chunk))
+        self.n += len(chunk)
+        self.total_impressions += int(chunk["impressions"].sum())
+        self.total_clicks += int(chunk["clicks"].sum())
+        self.deal_counts.update(_observed_counts(chunk["deal_status"]))
+        self.payment_counts.update(_observed_counts(chunk["payment_status"]))
+        self.advertisers.update(chunk["advertiser"].dropna().unique())
+        self.comoments.update(chunk[CORR_COLUMNS])
+        return self
+
+    def merge(self, other):
+        merged = StreamingAnalysis()
+        merged.cube = self.cube.merge(other.cube)
+        merged.n = self.n + other.n
+        merged.total_impressions = self.total_impressions + other.total_impressions
+        merged.total_clicks = self.total_clicks + other.total_clicks
+        merged.deal_counts = self.deal_counts + other.deal_counts
+        merged.payment_counts = self.payment_counts + other.payment_counts
+        merged.advertisers = self.advertisers | other.advertisers
+        merged.comoments = self.comoments.merge(other.comoments)
+        return merged
+
+    # ---- Results in the shape the analysis script prints ----
+    def nunique(self, dim):
+        if dim == "advertiser":
+            return len(self.advertisers)
+        return len(self.cube.rollup(dim))
+
+    def totals(self):
+        return self.cube.agg(
+            [],
+            booked=("booked_revenue", "sum"),
+            actual=("actual_revenue", "sum"),
+            budget=("budget", "sum"),
+            margin=("gross_margin", "sum"),
+            avg_margin_pct=("margin_pct", "mean"),
+            avg_cpm=("cpm", "mean"),
+            revenue_per_campaign=("actual_revenue", "mean"),
+            avg_delivery=("delivery_rate", "mean"),
+        ).iloc[0]
+
+    def kpis(self):
+        totals = self.totals()
+        return {
+            "total_impressions": self.total_impressions,
+            "total_clicks": self.total_clicks,
+            "overall_ctr": self.total_clicks / self.total_impressions * 100,
+            "revenue_per_campaign": totals["revenue_per_campaign"],
+            "win_rate": self.deal_counts["Closed Won"] / self.n * 100,
+            "overdue_pct": self.payment_counts["Overdue"] / self.n * 100,
+            "avg_delivery": totals["avg_delivery"] * 100,
+        }
+
+    def deal_status_counts(self):
+        return pd.Series(dict(self.deal_counts), name="count").sort_values(ascending=False)
+
+    def tier_ttest(self, a="Enterprise", b="Growth", metric="actual_revenue"):
+        """Student's t-test of `metric` between two account tiers, from the merged cube."""
+        return tier_ttest(self.cube, a, b, metric)
+
+    def corr(self):
+        return self.comoments.corr()
+
+
+def tier_ttest(cube, a="Enterprise", b="Growth", metric="actual_revenue"):
+    """Student's t-test (as stats.ttest_ind) from per-tier n, mean and variance read off a cube."""
+    from scipy import stats
+
+    tiers = cube.agg("account_tier", n=(metric, "count"), mean=(metric, "mean"), std=(metric, "std"))
+    t_stat, p_val = stats.ttest_ind_from_stats(
+        tiers.loc[a, "mean"], tiers.loc[a, "std"], tiers.loc[a, "n"],
+        tiers.loc[b, "mean"], tiers.loc[b, "std"], tiers.loc[b, "n"],
+        equal_var=True,
+    )
+    return {"mean_a": tiers.loc[a, "mean"], "mean_b": tiers.loc[b, "mean"], "t_stat": t_stat, "p_val": p_val}
+
+
+def run_streaming(source=None, chunksize=1_000_000):
+    """Stream `source` (default: the project's Arrow cache) into a StreamingAnalysis."""
+    if source is None:
+        source = CampaignDataset().ensure()
+    state = StreamingAnalysis()
+    for chunk in iter_chunks(source, STREAM_COLUMNS, chunksize):
+        state.update(chunk)
+    return state
+
+
+def compare_with_frame(state, df, rtol=1e-9):
+    """Max relative difference between streamed results and the in-memory pandas path."""
+    from scipy import stats
+
+    checks = {}
+
+    def rel(a, b):
+        a, b = np.asarray(a, dtype=np.float64), np.asarray(b, dtype=np.float64)
+        return float(np.max(np.abs(a - b) / np.maximum(np.abs(b), 1e-12)))
+
+    for dim in ["quarter", "industry", "account_tier", "ad_format", "sales_rep", "platform"]:
+        expected = df.groupby(dim, observed=True).agg(
+            n=("actual_revenue", "count"), s=("actual_revenue", "sum"), b=("budget", "sum"),
+            m=("margin_pct", "mean"), c=("cpm", "mean"), v=("actual_revenue", "var"),
+        )
+        got = state.cube.agg(dim, n=("actual_revenue", "count"), s=("actual_revenue", "sum"),
+                             b=("budget", "sum"), m=("margin_pct", "mean"), c=("cpm", "mean"),
+                             v=("actual_revenue", "var"))
+        checks[dim] = rel(got.to_numpy(), expected.to_numpy())
+    kpis = state.kpis()
+    checks["win_rate"] = rel(kpis["win_rate"], (df["deal_status"] == "Closed Won").mean() * 100)
+    checks["overdue_pct"] = rel(kpis["overdue_pct"], (df["payment_status"] == "Overdue").mean() * 100)
+    checks["overall_ctr"] = rel(kpis["overall_ctr"], df["clicks"].sum() / df["impressions"].sum() * 100)
+    t_stat, p_val = stats.ttest_ind(df[df["account_tier"] == "Enterprise"]["actual_revenue"],
+                                    df[df["account_tier"] == "Growth"]["actual_revenue"])
+    ttest = state.tier_ttest()
+    checks["t_stat"] = rel(ttest["t_stat"], t_stat)
+    checks["p_val"] = rel(ttest["p_val"], p_val)
+    checks["corr"] = rel(state.corr().to_numpy(), df[CORR_COLUMNS].corr().to_numpy())
+    return {name: (diff, diff <= rtol) for name, diff in checks.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stream the campaign data through mergeable aggregates.")
+    parser.add_argument("--source", default=None, help="CSV file, part-*.csv directory or .arrow cache")
+    parser.add_argument("--chunksize", type=int, default=1_000_000)
+    parser.add_argument("--check", action="store_true", help="Compare against the in-memory pandas path")
+    args = parser.parse_args()
+
+    state = run_streaming(args.source, args.chunksize)
+    kpis = state.kpis()
+    print(f"Streamed {state.n:,} campaigns in chunks of {args.chunksize:,}")
+    print(f"  Total Actual Revenue:  ${state.totals()['actual']:,.2f}")
+    print(f"  Win Rate: {kpis['win_rate']:.1f}%  Overdue: {kpis['overdue_pct']:.1f}%  CTR: {kpis['overall_ctr']:.2f}%")
+
+    if args.check:
+        source = args.source or DEFAULT_CSV
+        df = pd.concat(iter_chunks(source, STREAM_COLUMNS, args.chunksize), ignore_index=True)
+        results = compare_with_frame(state, df)
+        print(f"\n{'Check':<15} {'Max rel diff':>14}")
+        for name, (diff, ok) in results.items():
+            print(f"{name:<15} {diff:>14.2e} {'ok' if ok else 'MISMATCH'}")
+        if not all(ok for _, ok in results.values()):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
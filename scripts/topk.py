@@ -0,0 +1,137 @@
+"""
+Per-group top-K campaigns without sorting the table.
+
+Query 7 of ad_sales_queries.sql orders every row to keep 20. Here each chunk is
+reduced with partial selection (np.partition finds the k-th largest value in linear
+time) to at most k candidates per group, and the candidates are merged into the
+running state, which never holds more than k rows per group. Work is O(n) per chunk
+plus O(k log k) per group; memory grows with groups x k, not rows. Ties are broken
+by the smaller campaign_id, so the result does not depend on how rows were chunked.
+
+    top = TopK(k=5, by="industry", metric="gross_margin")
+    for chunk in iter_chunks(source):
+        top.update(chunk)
+    top.result()
+
+    python scripts/topk.py --by sales_rep --metric margin_pct --k 3 --check
+"""
+
+import argparse
+import sys
+
+import numpy as np
+import pandas as pd
+
+from data_access import DEFAULT_CSV, CampaignDataset
+
+TOPK_COLUMNS = ["campaign_id", "advertiser", "industry", "sales_rep", "ad_format", "quarter",
+                "actual_revenue", "gross_margin", "margin_pct"]
+TOPK_GROUPS = ["industry", "sales_rep", "ad_format"]
+RANK_METRICS = ["actual_revenue", "gross_margin", "margin_pct"]
+
+
+def top_positions(values, ids, k):
+    """Positions of the k largest values, best first, ties to the smaller id. NaNs never rank."""
+    candidates = np.flatnonzero(~np.isnan(values))
+    if len(candidates) > k:
+        cut = len(candidates) - k
+        threshold = np.partition(values[candidates], cut)[cut]
+        candidates = candidates[values[candidates] >= threshold]
+    order = np.lexsort((ids[candidates], -values[candidates]))[:k]
+    return candidates[order]
+
+
+class TopK:
+    """Bounded per-group top-K state; update with chunks, combine with merge."""
+
+    def __init__(self, k=10, by=None, metric="actual_revenue", columns=TOPK_COLUMNS):
+        if k < 1:
+            raise ValueError("k must be at least 1")
+        self.k = k
+        self.by = by
+        self.metric = metric
+        self.columns = list(dict.fromkeys(list(columns) + [metric] + ([by] if by else [])))
+        self.groups = {}
+
+    def _select(self, frame):
+        positions = top_positions(frame[self.metric].to_numpy(dtype=np.float64),
+                                  frame["campaign_id"].to_numpy(), self.k)
+        return frame.iloc[positions].reset_index(drop=True)
+
+    def _add(self, label, candidates):
+        held = self.groups.get(label)
+        if held is not None:
+            candidates = self._select(pd.concat([held, candidates], ignore_index=True))
+        self.groups[label] = candidates
+
+    def update(self, chunk):
+        """Fold in a DataFrame chunk (rows with a missing group are skipped, as in groupby)."""
+        chunk = chunk[self.columns]
+        if self.by is None:
+            self._add("All", self._select(chunk))
+            return self
+        codes, labels = pd.factorize(chunk[self.by])
+        for code, label in enumerate(labels):
+            self._add(label, self._select(chunk.iloc[np.flatnonzero(codes == code)]))
+        return self
+
+    def merge(self, other):
+        """Combine two states over the same ranking (e.g. from separate shards)."""
+        if (other.k, other.by, other.metric) != (self.k, self.by, self.metric):
+            raise ValueError("Cannot merge top-K states with different k, grouping or metric")
+        merged = TopK(self.k, self.by, self.metric, self.columns)
+        merged.groups = dict(self.groups)
+        for label, candidates in other.groups.items():
+            merged._add(label, candidates)
+        return merged
+
+    def result(self):
+        """One frame: group label, rank within the group, then the kept columns."""
+        parts = []
+        for label in sorted(self.groups, key=str):
+            part = self.groups[label].copy()
+            part.insert(0, "rank", np.arange(1, len(part) + 1))
+            part.insert(0, "group", label)
+            parts.append(part)
+        if not parts:
+            return pd.DataFrame(columns=["group", "rank"] + self.columns)
+        return pd.concat(parts, ignore_index=True)
+
+
+def expected_top(df, k, by, metric):
+    """Reference result from a full sort, for checking."""
+    ranked = df.dropna(subset=[metric]).sort_values([metric, "campaign_id"], ascending=[False, True], kind="stable")
+    if by is None:
+        return ranked.head(k)
+    return ranked.groupby(by, observed=True, sort=True).head(k).sort_values(
+        [by, metric, "campaign_id"], ascending=[True, False, True], kind="stable")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Top-K campaigns per group by partial selection.")
+    parser.add_argument("--csv", default=DEFAULT_CSV)
+    parser.add_argument("--by", choices=TOPK_GROUPS, default=None, help="Group column (default: overall)")
+    parser.add_argument("--metric", choices=RANK_METRICS, default="actual_revenue")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--chunksize", type=int, default=1_000_000)
+    parser.add_argument("--check", action="store_true", help="Compare with a full sort")
+    args = parser.parse_args()
+    if args.k < 1:
+        parser.error("--k must be at least 1")
+
+    df = CampaignDataset(args.csv).load(TOPK_COLUMNS)
+    top = TopK(args.k, args.by, args.metric)
+    for start in range(0, len(df), args.chunksize):
+        top.update(df.iloc[start:start + args.chunksize])
+    result = top.result()
+    print(result.to_string(index=False))
+    if args.check:
+        expected = expected_top(df, args.k, args.by, args.metric)
+        same = result["campaign_id"].tolist() == expected["campaign_id"].tolist()
+        print(f"\nMatches full sort: {'yes' if same else 'NO'}")
+        if not same:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()